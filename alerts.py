@@ -0,0 +1,173 @@
+import json
+import os
+import config
+
+# Change alerts: instead of re-sending the whole report, the current run is diffed
+# against the previous run's snapshot and only the rule hits are sent.
+#
+# The snapshot is keyed ('sector:XLK', 'stock:XLK:NVDA') and holds, per key, only the
+# discrete fields the rules look at (rank, top-N membership, setup, contraction, RS
+# signs). A poll compares the records key by key and evaluates the rules for the keys
+# whose record changed; nothing is recomputed or rewritten when nothing changed.
+
+
+def _sign(value):
+    if value is None:
+        return None
+    return 1 if value > 0 else -1 if value < 0 else 0
+
+
+def snapshot(model, top_n=None, min_score=None):
+    """
+    Keyed records of a report model: {key: record}.
+    """
+    top_n = top_n if top_n is not None else config.ALERT_TOP_N
+    min_score = min_score if min_score is not None else config.ALERT_MIN_SCORE
+    records = {}
+    for s in model["sectors"]:
+        records[f"sector:{s['ticker']}"] = {
+            "rank": s["rank"],
+            "top": s["rank"] <= top_n,
+            "rs_4w": _sign(s.get("rs_4w")),
+            "rs_12w": _sign(s.get("rs_12w")),
+        }
+    for s in model["stocks"]:
+        records[f"stock:{s['sector']}:{s['ticker']}"] = {
+            "score": s["score"],
+            "setup": s["score"] is not None and s["score"] >= min_score,
+            "contracting": s["contracting"],
+            "rs_4w": _sign(s.get("rs_sector_4w")),
+            "rs_12w": _sign(s.get("rs_sector_12w")),
+        }
+    return records
+
+
+# --- Rules: rule(kind, name, old, new) -> message or None ---
+# kind is 'sector' or 'stock', name the ticker ('XLK:NVDA' for stocks); old / new are
+# the records (None when the key is new / gone).
+
+def _top_enter(kind, name, old, new):
+    if kind == "sector" and new and new["top"] and not (old and old["top"]):
+        return f"📈 {name} 進入前 {config.ALERT_TOP_N} 名 (第 {new['rank']} 名" + (f"，原第 {old['rank']} 名)" if old else ")")
+
+
+def _top_exit(kind, name, old, new):
+    if kind == "sector" and old and old["top"] and not (new and new["top"]):
+        return f"📉 {name} 跌出前 {config.ALERT_TOP_N} 名" + (f" (第 {new['rank']} 名)" if new else "")
+
+
+def _new_setup(kind, name, old, new):
+    if kind == "stock" and new and new["setup"] and not (old and old["setup"]):
+        return f"🆕 {name} 新符合篩選條件 (Score {new['score']})"
+
+
+def _contraction_start(kind, name, old, new):
+    if kind == "stock" and old and new and new["contracting"] and not old["contracting"]:
+        return f"🔥 {name} 開始波動收縮 (Contracting)"
+
+
+def _rs_flip(kind, name, old, new):
+    if not (old and new):
+        return None
+    versus = "SPY" if kind == "sector" else name.split(":")[0]
+    flips = []
+    for field, label in (("rs_4w", "4週"), ("rs_12w", "12週")):
+        if old[field] and new[field] and old[field] != new[field]:
+            flips.append(f"{label} RS vs {versus} {'由負轉正' if new[field] > 0 else '由正轉負'}")
+    if flips:
+        return f"🔄 {name} " + "，".join(flips)
+
+
+RULES = {
+    "top_enter": _top_enter,
+    "top_exit": _top_exit,
+    "new_setup": _new_setup,
+    "contraction_start": _contraction_start,
+    "rs_flip": _rs_flip,
+}
+
+
+class AlertEngine:
+    """
+    Holds the last snapshot (loaded from `path` once) and diffs every new report model
+    against it. Reusing one engine across polls keeps the previous records in memory.
+    """
+    def __init__(self, path=None, rules=None):
+        self.path = path or config.ALERT_SNAPSHOT_PATH
+        self.rules = {name: RULES[name] for name in (rules or config.ALERT_RULES)}
+        self.records = None
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                self.records = json.load(f)["records"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            pass
+
+    @property
+    def has_baseline(self):
+        return self.records is not None
+
+    def update(self, model):
+        """
+        Diffs the model against the previous snapshot. Returns (events, pending):
+        the events ({'rule', 'key', 'message'}, [] when there is no previous snapshot)
+        and the new snapshot for commit(), or None when nothing changed. The snapshot
+        is only stored by commit(), once the events are delivered or queued: a run that
+        fails before that reports them again.
+        """
+        current = snapshot(model)
+        pending = {"generated_at": model.get("generated_at"), "records": current}
+        if self.records is None:
+            return [], pending
+
+        previous = self.records
+        changed = [k for k, rec in current.items() if previous.get(k) != rec]
+        changed += [k for k in previous if k not in current]
+
+        events = []
+        for key in changed:
+            kind, name = key.split(":", 1)
+            old, new = previous.get(key), current.get(key)
+            for rule_name, rule in self.rules.items():
+                message = rule(kind, name, old, new)
+                if message:
+                    events.append({"rule": rule_name, "key": key, "message": message})
+
+        return events, (pending if changed else None)
+
+    def commit(self, pending):
+        """
+        Stores a snapshot returned by update() as the new baseline (None: nothing to do).
+        """
+        if pending is None:
+            return
+        self.records = pending["records"]
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(pending, f, ensure_ascii=False, indent=0, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+
+_engines = {}
+
+
+def engine(path=None):
+    """
+    The process-wide engine for a snapshot path (a long-running watch reuses it).
+    """
+    path = path or config.ALERT_SNAPSHOT_PATH
+    if path not in _engines:
+        _engines[path] = AlertEngine(path)
+    return _engines[path]
+
+
+def render_events(events):
+    """
+    Plain-text alert message, events grouped by rule in RULES order.
+    """
+    lines = ["板塊輪動變化提醒 (Change Alerts)", "=" * 40]
+    for rule_name in RULES:
+        lines.extend(e["message"] for e in events if e["rule"] == rule_name)
+    return "\n".join(lines)
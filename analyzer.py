@@ -1,41 +1,26 @@
+import numpy as np
 import pandas as pd
 import config
+import instrumentation
+import memo
+from return_index import ReturnIndex, score_returns
 
+def _returns_window(data):
+    # Only the last bar and the longest lookback are read, so index (and hash) just that tail
+    return data.iloc[-(max(config.PERIODS.values()) + 1):]
+
+@memo.memoize(settings=("PERIODS",), modules=("return_index",), key=_returns_window)
 def calculate_returns(data):
     """
-    Calculates returns over specified periods.
+    Calculates returns over specified periods (config.PERIODS, in trading days) as of the last bar.
+    For other dates or windows query return_index.ReturnIndex directly.
     """
-    returns = pd.DataFrame(index=data.columns)
-    
-    # Calculate returns for each period in config
-    for period_name, days in config.PERIODS.items():
-        # Make sure we have enough data
-        if len(data) > days:
-            # pct_change is (curr - prev) / prev
-            # We want change over 'days' periods
-            # Data is daily, so we shift by 'days'
-            # Note: 4 weeks is approx 20 trading days
-            
-            # current price
-            current = data.iloc[-1]
-            # price 'days' ago
-            past = data.iloc[-days-1] 
-            
-            # Simple return
-            ret = (current - past) / past
-            returns[period_name] = ret
-        else:
-            returns[period_name] = None
-            
-    return returns
+    return ReturnIndex(_returns_window(data)).returns_table(periods=config.PERIODS)
 
-def rank_sectors(returns_df, benchmarks):
+@memo.memoize(settings=("SECTORS",), modules=("return_index",))
+def rank_sectors(returns_df, benchmarks, sectors=None):
     """
     Ranks sectors based on relative strength vs benchmarks.
-    Strategy: 
-    1. Calculate average rank across 4w and 12w performance? 
-    OR
-    2. Rank by a composite score.
     
     The prompt says: "I rank them by relative strength against $SPY and $QQQ over the past 4 and 12 weeks."
     This is slightly ambiguous. Common RS usage: 
@@ -43,35 +28,66 @@ def rank_sectors(returns_df, benchmarks):
     
     Let's calculate Excess Return vs SPY for both periods.
     Then rank by the average of (4w Excess + 12w Excess).
+    (The scoring lives in return_index.score_returns, shared with point-in-time queries.)
     """
     
     # Filter only sectors (exclude benchmarks from the ranking list itself, but use them for calculation)
-    sector_tickers = config.SECTORS
-    
-    # Calculate RS vs SPY (primary benchmark)
-    spy_ret = returns_df.loc['SPY']
-    
-    df = returns_df.loc[sector_tickers].copy()
+    sector_tickers = sectors if sectors is not None else config.SECTORS
     
-    df['RS_4w'] = df['4w'] - spy_ret['4w']
-    df['RS_12w'] = df['12w'] - spy_ret['12w']
-    
-    # Composite Score: Simple average of the two RS metrics
-    # You could weight them, but equal weight is a good start.
-    df['Score'] = (df['RS_4w'] + df['RS_12w']) / 2
-    
-    # Rank
-    df = df.sort_values(by='Score', ascending=False)
-    
-    return df
+    # RS vs SPY (primary benchmark)
+    return score_returns(returns_df, "SPY", sector_tickers)
 
-def check_technical_setup(df):
+@instrumentation.timed_call
+def stock_relative_strength(stock_returns, parents, returns_df, benchmark="SPY"):
+    """
+    RS of every screened stock vs its parent sector ETF and vs the benchmark, ranked
+    across the whole screened universe. One broadcast over the (stocks x periods) array,
+    so it costs about the same for 30 or 5,000 stocks.
+
+    stock_returns: calculate_returns table of the stocks (indexed by ticker).
+    parents: Series of parent sector ETFs, one row per screened stock (indexed by ticker).
+    returns_df: calculate_returns table holding the sector ETFs and the benchmark.
+
+    Returns a DataFrame with one row per `parents` row:
+      RS_Sector_<p>, RS_<benchmark>_<p>   stock return minus the sector's / benchmark's
+      <column>_Pct                        percentile rank of that column (0-100)
+      RS_Rank                             average of the percentile ranks
+      RS_Leader                           leads its sector and RS_Rank >= config.RS_MIN_RANK
+    """
+    periods = list(config.PERIODS)
+    stocks = stock_returns.reindex(parents.index)[periods].to_numpy(dtype=float)
+    sectors = returns_df.reindex(parents.to_numpy())[periods].to_numpy(dtype=float)
+    bench = returns_df.loc[benchmark, periods].to_numpy(dtype=float)
+
+    rs_sector = stocks - sectors
+    rs_bench = stocks - bench[None, :]
+
+    table = pd.DataFrame(
+        np.hstack([rs_sector, rs_bench]),
+        columns=[f"RS_Sector_{p}" for p in periods] + [f"RS_{benchmark}_{p}" for p in periods],
+        index=parents.index,
+    )
+    # Percentile ranks of all columns at once; NaN (short history) stays NaN
+    pct = table.rank(pct=True) * 100
+    table[[f"{c}_Pct" for c in pct.columns]] = pct.to_numpy()
+    table["RS_Rank"] = pct.mean(axis=1)
+    leads_sector = table[[f"RS_Sector_{p}" for p in periods]].mean(axis=1) > 0
+    table["RS_Leader"] = leads_sector & (table["RS_Rank"] >= config.RS_MIN_RANK)
+    return table
+
+@instrumentation.timed_call
+@memo.memoize(settings=("VCP_PIVOT_BARS", "VCP_LOOKBACK", "VCP_MIN_CONTRACTIONS", "VCP_MAX_CONTRACTIONS",
+                        "VCP_TIGHTENING", "VCP_MAX_FINAL_DEPTH"), modules=("vcp",))
+def check_technical_setup(df, pattern=None):
     """
     Checks if a stock meets the technical criteria:
     1. Close > 50 EMA (Trend)
     2. Close > 21 EMA (Momentum)
-    3. Volatility Contraction (Recent range < Historical range)
+    3. Volatility Contraction Pattern (successively tighter pullbacks, see vcp.py)
     
+    pattern: this ticker's row of vcp.detect_panel, when the caller ran it over the
+    whole panel (the screens do); otherwise it is detected from df alone.
+    df is not modified (results are memoized on its contents, see memo.py).
     Returns a dictionary of results.
     """
     # Ensure sufficient data
@@ -79,35 +95,42 @@ def check_technical_setup(df):
         return None
         
     # Calculate EMAs
-    df['EMA_50'] = df['Close'].ewm(span=50, adjust=False).mean()
-    df['EMA_21'] = df['Close'].ewm(span=21, adjust=False).mean()
-    
-    current = df.iloc[-1]
+    close = df['Close'].iloc[-1]
+    ema_50 = df['Close'].ewm(span=50, adjust=False).mean().iloc[-1]
+    ema_21 = df['Close'].ewm(span=21, adjust=False).mean().iloc[-1]
     
     # 1. Trend Checks
-    price_gt_50 = current['Close'] > current['EMA_50']
-    price_gt_21 = current['Close'] > current['EMA_21']
+    price_gt_50 = close > ema_50
+    price_gt_21 = close > ema_21
     
     # 2. Volatility Contraction
     # daily_range = (High - Low) / Close
-    df['Range_Pct'] = (df['High'] - df['Low']) / df['Close']
+    range_pct = (df['High'] - df['Low']) / df['Close']
     
     # Current Volatility (avg of last 5 days)
-    current_vol = df['Range_Pct'].iloc[-5:].mean()
+    current_vol = range_pct.iloc[-5:].mean()
     # Historical Volatility (avg of last 20 days)
-    hist_vol = df['Range_Pct'].iloc[-20:].mean()
+    hist_vol = range_pct.iloc[-20:].mean()
     
-    # Contraction if current vol is significantly lower than historical (e.g. < 0.75 ratio) or just generally low
-    # Let's use a ratio check
-    is_contracting = current_vol < (hist_vol * 0.8) # 20% contraction
+    # The 5 / 20 day range ratio is kept for display; the check itself is the VCP
+    if pattern is None:
+        import vcp
+        pattern = vcp.detect_frame(df)
+    is_contracting = bool(pattern['VCP'])
     
-    # 3. RS Check (We need Benchmark data for this, but let's assume we pass in pre-calculated RS or skip for now)
-    # For now, we rely on the Sector RS filter.
+    # 3. RS Check: needs the whole screened universe, see stock_relative_strength
+    #    (the caller adds the RS point to Score)
     
     return {
         "Price > 50EMA": price_gt_50,
         "Price > 21EMA": price_gt_21,
         "Contracting": is_contracting,
+        "Contractions": int(pattern['Contractions']),
+        "Contraction Depths": list(pattern['Depths']),
         "Current Vol": current_vol,
+        "Hist Vol": hist_vol,
+        "Close": close,
+        "EMA_50": ema_50,
+        "EMA_21": ema_21,
         "Score": (1 if price_gt_50 else 0) + (1 if price_gt_21 else 0) + (1 if is_contracting else 0)
     }
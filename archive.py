@@ -0,0 +1,207 @@
+import datetime
+import os
+import sqlite3
+import pandas as pd
+import config
+
+# Append-only history of every run: one row per (generated_at, ticker), so reruns on the
+# same day are all kept. The queries read the last run of each day (daily_runs) or week.
+# Primary keys give the (generated_at, ticker) index; the extra (ticker, run_date)
+# indexes serve the per-ticker history queries.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    generated_at TEXT PRIMARY KEY,
+    run_date     TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_date ON runs (run_date);
+
+CREATE VIEW IF NOT EXISTS daily_runs AS
+    SELECT run_date, MAX(generated_at) AS generated_at FROM runs GROUP BY run_date;
+
+CREATE TABLE IF NOT EXISTS sector_history (
+    generated_at TEXT NOT NULL,
+    run_date     TEXT NOT NULL,
+    ticker       TEXT NOT NULL,
+    rank         INTEGER NOT NULL,
+    perf_4w      REAL,
+    perf_12w     REAL,
+    rs_4w        REAL,
+    rs_12w       REAL,
+    score        REAL,
+    PRIMARY KEY (generated_at, ticker)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_sector_ticker_date ON sector_history (ticker, run_date);
+
+CREATE TABLE IF NOT EXISTS stock_history (
+    generated_at TEXT NOT NULL,
+    run_date     TEXT NOT NULL,
+    ticker       TEXT NOT NULL,
+    sector       TEXT NOT NULL,
+    price_gt_50  INTEGER,
+    price_gt_21  INTEGER,
+    contracting  INTEGER,
+    current_vol  REAL,
+    score        INTEGER,
+    PRIMARY KEY (generated_at, ticker)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_stock_ticker_date ON stock_history (ticker, run_date);
+"""
+
+# Archives written when runs were keyed by run_date (one run per day) are moved to the
+# current tables on open; every old run keeps its generated_at
+MIGRATE_V1 = """
+BEGIN;
+DROP INDEX IF EXISTS idx_sector_ticker_date;
+DROP INDEX IF EXISTS idx_stock_ticker_date;
+ALTER TABLE runs RENAME TO runs_v1;
+ALTER TABLE sector_history RENAME TO sector_history_v1;
+ALTER TABLE stock_history RENAME TO stock_history_v1;
+""" + SCHEMA + """
+INSERT INTO runs SELECT generated_at, run_date FROM runs_v1;
+INSERT INTO sector_history SELECT r.generated_at, h.* FROM sector_history_v1 h JOIN runs_v1 r USING (run_date);
+INSERT INTO stock_history SELECT r.generated_at, h.* FROM stock_history_v1 h JOIN runs_v1 r USING (run_date);
+DROP TABLE runs_v1;
+DROP TABLE sector_history_v1;
+DROP TABLE stock_history_v1;
+COMMIT;
+"""
+
+
+def connect(db_path=None):
+    """
+    Opens (and if needed creates or migrates) the run archive.
+    """
+    db_path = db_path or config.ARCHIVE_PATH
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(sector_history)")]
+    if columns and "generated_at" not in columns:
+        print(f"Migrating the run archive {db_path} to one entry per run...")
+        conn.executescript(MIGRATE_V1)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def archive_run(model, run_date=None, db_path=None):
+    """
+    Appends one run (a report model from report_model.build_report_model) to the archive,
+    keyed by its generated_at: earlier runs, on the same run_date too, are never changed.
+    Returns True if the run was written, False if this run was already archived.
+    """
+    if run_date is None:
+        run_date = model["generated_at"][:10]
+    generated_at = model["generated_at"]
+
+    conn = connect(db_path)
+    try:
+        with conn:
+            existing = conn.execute("SELECT 1 FROM runs WHERE generated_at = ?", (generated_at,)).fetchone()
+            if existing:
+                print(f"Run {generated_at} already archived. Skipping archive write.")
+                return False
+            conn.execute("INSERT INTO runs (generated_at, run_date) VALUES (?, ?)", (generated_at, run_date))
+
+            conn.executemany(
+                "INSERT INTO sector_history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (generated_at, run_date, s["ticker"], s["rank"], s["perf_4w"], s["perf_12w"],
+                     s["rs_4w"], s["rs_12w"], s["score"])
+                    for s in model["sectors"]
+                ],
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO stock_history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (generated_at, run_date, s["ticker"], s["sector"], s["price_gt_50"], s["price_gt_21"],
+                     s["contracting"], s["current_vol"], s["score"])
+                    for s in model["stocks"]
+                ],
+            )
+        return True
+    finally:
+        conn.close()
+
+
+def _since_clause(weeks):
+    # Window is relative to the latest archived run, not today, so old archives still answer
+    return f"run_date >= (SELECT date(MAX(run_date), '-{int(weeks) * 7} days') FROM runs)"
+
+
+def rank_history(ticker, weeks=52, db_path=None):
+    """
+    Returns the rank history of one sector ETF, e.g. rank_history('XLE', weeks=52).
+    DataFrame columns: run_date, rank, score (oldest first, the last run of each day).
+    """
+    conn = connect(db_path)
+    try:
+        return pd.read_sql_query(
+            "SELECT run_date, rank, score FROM sector_history "
+            "WHERE generated_at IN (SELECT generated_at FROM daily_runs) "
+            f"AND ticker = ? AND {_since_clause(weeks)} ORDER BY run_date",
+            conn,
+            params=(ticker,),
+        )
+    finally:
+        conn.close()
+
+
+def all_rank_history(weeks=52, db_path=None):
+    """
+    Returns the rank history of every sector as {ticker: DataFrame(run_date, rank, score)},
+    from the last run of each day.
+    """
+    conn = connect(db_path)
+    try:
+        df = pd.read_sql_query(
+            "SELECT ticker, run_date, rank, score FROM sector_history "
+            "WHERE generated_at IN (SELECT generated_at FROM daily_runs) "
+            f"AND {_since_clause(weeks)} ORDER BY ticker, run_date",
+            conn,
+        )
+    finally:
+        conn.close()
+    return {ticker: g.drop(columns="ticker").reset_index(drop=True) for ticker, g in df.groupby("ticker")}
+
+
+def _weekly_runs(conn, weeks):
+    # generated_at of the last run of each of the latest `weeks` ISO weeks, newest first; None when one
+    # of those weeks has no run (the workflow also runs on pushes: a week may have several)
+    latest = {}
+    for run_date, generated_at in conn.execute("SELECT run_date, generated_at FROM runs ORDER BY generated_at"):
+        day = datetime.date.fromisoformat(run_date)
+        latest[day - datetime.timedelta(days=day.weekday())] = generated_at  # keyed by the week's Monday
+    if not latest:
+        return None
+    newest = max(latest)
+    mondays = [newest - datetime.timedelta(weeks=k) for k in range(weeks)]
+    if any(m not in latest for m in mondays):
+        return None
+    return [latest[m] for m in mondays]
+
+
+def persistent_setups(min_score=2, weeks=3, db_path=None):
+    """
+    Returns the tickers with Score >= min_score in each of the last `weeks` consecutive
+    ISO weeks (the last run of each week counts), sorted by ticker.
+    """
+    conn = connect(db_path)
+    try:
+        runs = _weekly_runs(conn, weeks)
+        if not runs:
+            return []
+        marks = ", ".join("?" * len(runs))
+        rows = conn.execute(
+            f"""
+            SELECT ticker, MAX(sector) FROM stock_history
+            WHERE generated_at IN ({marks}) AND score >= ?
+            GROUP BY ticker
+            HAVING COUNT(DISTINCT generated_at) = ?
+            ORDER BY ticker
+            """,
+            (*runs, min_score, len(runs)),
+        ).fetchall()
+    finally:
+        conn.close()
+    return [{"ticker": t, "sector": s} for t, s in rows]
@@ -0,0 +1,297 @@
+"""
+Microbenchmarks for the analyzer and reporter hot paths, on deterministic
+synthetic data (fully offline).
+
+    python benchmark.py                         # run and compare with the saved baseline
+    python benchmark.py --save-baseline         # record a new baseline
+    python benchmark.py --scales sectors,universe --years 1 --max-regression 0.3
+    python benchmark.py --compare base.json head.json   # compare two saved runs
+
+Exits with status 1 when a case is slower (or uses more memory) than the
+baseline by more than the allowed regression. CI saves the best of a few
+alternating runs of the base and the head commit (--save-baseline --keep-best)
+on the same runner and compares those, since absolute times differ per machine.
+"""
+import argparse
+import functools
+import gc
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+import pandas as pd
+from tabulate import tabulate
+
+import analyzer
+import config
+import memo
+import report_model
+import reporter
+import rrg
+import synthetic
+import vcp
+
+SCALES = {"sectors": 11, "universe": 500, "large": 5000}
+YEARS = [1, 20]
+
+# check_technical_setup works on one ticker at a time; it is timed on a sample of
+# this many tickers and the per-call time is scaled up to the universe size.
+TECHNICAL_SAMPLE = 100
+
+DEFAULT_BASELINE = "benchmark_baseline.json"
+
+# Differences below these are noise, whatever the ratio (sub-millisecond cases, tiny allocations)
+MIN_TIME_DELTA_S = 0.0005
+MIN_MEM_DELTA_MB = 1.0
+
+
+def _measure(func, repeat, min_sample_s=0.02):
+    """
+    Returns (best seconds per call, peak traced MB of one call).
+    Fast functions are looped so each timing sample lasts at least min_sample_s.
+    """
+    func()  # warm-up
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_sample_s or number >= 1000:
+            break
+        number *= 10
+    best = elapsed / number
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+
+    # Memory is measured separately: tracing slows the code down
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / (1024 * 1024)
+
+
+class _Inputs:
+    """
+    The synthetic inputs of one scale, each built on first use, so a --functions run
+    only builds what its cases read.
+    """
+    def __init__(self, n_tickers, years):
+        self.n_tickers = n_tickers
+        self.years = years
+
+    @functools.cached_property
+    def close(self):
+        return synthetic.close_panel(self.n_tickers, self.years)
+
+    @functools.cached_property
+    def sectors(self):
+        return [t for t in self.close.columns if t != "SPY"]
+
+    @functools.cached_property
+    def returns(self):
+        return analyzer.calculate_returns(self.close)
+
+    @functools.cached_property
+    def ranked(self):
+        return analyzer.rank_sectors(self.returns, config.BENCHMARKS, sectors=self.sectors)
+
+    @functools.cached_property
+    def sample(self):
+        # (frames, VCP rows) of TECHNICAL_SAMPLE tickers: the screens run the VCP scan
+        # once per panel and pass each ticker's row in
+        sample = min(self.n_tickers, TECHNICAL_SAMPLE)
+        panel = synthetic.ohlcv_panel(sample, self.years)
+        tickers = [t for t in panel.columns.levels[1] if t != "SPY"][:sample]
+        patterns = vcp.detect_panel(panel)
+        return [synthetic.ticker_frame(panel, t) for t in tickers], [patterns.loc[t] for t in tickers]
+
+
+def _cases(n_tickers, years, only=None):
+    """
+    Yields (function name, callable, multiplier) for one scale, skipping the functions
+    not in `only` before building their data. The callable's time x multiplier is the
+    time for the whole universe.
+    """
+    data = _Inputs(n_tickers, years)
+
+    def wanted(name):
+        return not only or name in only
+
+    if wanted("calculate_returns"):
+        close = data.close
+        yield "calculate_returns", lambda: analyzer.calculate_returns(close), 1
+    if wanted("rank_sectors"):
+        returns, sectors = data.returns, data.sectors
+        yield "rank_sectors", lambda: analyzer.rank_sectors(returns, config.BENCHMARKS, sectors=sectors), 1
+    if wanted("rrg_tails"):
+        close, sectors = data.close, data.sectors
+        yield "rrg_tails", lambda: rrg.rrg_tails(close, "SPY", sectors), 1
+
+    if wanted("stock_relative_strength"):
+        # Every ticker screened as a stock of a sector (the sector "ETFs" are the first tickers)
+        returns, sectors = data.returns, data.sectors
+        parents = pd.Series([sectors[i % min(11, len(sectors))] for i in range(len(sectors))], index=sectors)
+        yield "stock_relative_strength", lambda: analyzer.stock_relative_strength(returns, parents, returns), 1
+
+    # The screens download 1 year of stock prices, so the VCP scan is only timed at 1y
+    if years == 1 and wanted("vcp_detect_panel"):
+        stock_panel = synthetic.ohlcv_panel(n_tickers, years)
+        yield "vcp_detect_panel", lambda: vcp.detect_panel(stock_panel), 1
+
+    if wanted("check_technical_setup"):
+        frames, frame_patterns = data.sample
+
+        def technical():
+            for df, pattern in zip(frames, frame_patterns):
+                analyzer.check_technical_setup(df, pattern)
+        yield "check_technical_setup", technical, n_tickers / len(frames)
+
+    if wanted("memo_hit"):
+        # A repeated call of the memoized calculate_returns: its real key (input hash, source
+        # and settings) plus the lookup, served from a memory-only cache filled by the first call
+        close = data.close
+        previous = memo._default
+        memo._default = memo.Memo(disk_dir=None)
+        config.MEMO_ENABLED = True
+        try:
+            analyzer.calculate_returns(close)
+            yield "memo_hit", lambda: analyzer.calculate_returns(close), 1
+        finally:
+            memo._default = previous
+            config.MEMO_ENABLED = False
+
+    if wanted("simple_encrypt") or wanted("generate_html"):
+        ranked = data.ranked
+        result = analyzer.check_technical_setup(data.sample[0][0])
+        sector_results = {"BENCH": [{"ticker": t, "results": result} for t in data.sectors]}
+    if wanted("simple_encrypt"):
+        payload = json.dumps(report_model.build_report_model(ranked, sector_results))
+        yield "simple_encrypt", lambda: reporter.simple_encrypt(payload, "1234"), 1
+    if wanted("generate_html"):
+        report_text = "x" * 2000
+        yield "generate_html", lambda: reporter.generate_html(report_text, "1234", ranked_df=ranked,
+                                                               sector_results=sector_results), 1
+
+
+def run(scales, years_list, repeat, only=None):
+    # Time the computations themselves, not cache hits after the warm-up call
+    config.MEMO_ENABLED = False
+    results = {}
+    for scale in scales:
+        n_tickers = SCALES[scale]
+        for years in years_list:
+            for name, func, multiplier in _cases(n_tickers, years, only):
+                case = f"{name}[{n_tickers}x{years}y]"
+                seconds, peak_mb = _measure(func, repeat)
+                results[case] = {"time_s": seconds * multiplier, "peak_mb": peak_mb}
+                print(f"  {case:45s} {seconds * multiplier * 1000:10.2f} ms  {peak_mb:8.1f} MB")
+            gc.collect()
+    return results
+
+
+def compare(results, baseline, max_regression, max_mem_regression):
+    """
+    Prints a comparison table and returns the list of regressed cases.
+    """
+    rows, regressions = [], []
+    for case, r in results.items():
+        base = baseline.get(case)
+        if not base:
+            rows.append([case, f"{r['time_s'] * 1000:.2f}", "-", "-", f"{r['peak_mb']:.1f}", "-", "new"])
+            continue
+        time_ratio = r["time_s"] / base["time_s"] if base["time_s"] else 1.0
+        mem_ratio = r["peak_mb"] / base["peak_mb"] if base["peak_mb"] else 1.0
+        status = "ok"
+        if time_ratio > 1 + max_regression and r["time_s"] - base["time_s"] > MIN_TIME_DELTA_S:
+            status = "SLOWER"
+        if mem_ratio > 1 + max_mem_regression and r["peak_mb"] - base["peak_mb"] > MIN_MEM_DELTA_MB:
+            status = "MORE MEMORY" if status == "ok" else status + " + MORE MEMORY"
+        if status != "ok":
+            regressions.append(case)
+        rows.append([case, f"{r['time_s'] * 1000:.2f}", f"{base['time_s'] * 1000:.2f}", f"{time_ratio:.2f}x",
+                     f"{r['peak_mb']:.1f}", f"{base['peak_mb']:.1f}", status])
+    print(tabulate(rows, headers=["Case", "ms", "Baseline ms", "Ratio", "MB", "Baseline MB", "Status"]))
+    return regressions
+
+
+def _load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["results"]
+
+
+def _report(regressions):
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyzer / reporter microbenchmarks (offline)")
+    parser.add_argument("--scales", default=",".join(SCALES),
+                        help=f"Comma-separated scales from {list(SCALES)}")
+    parser.add_argument("--years", default=",".join(map(str, YEARS)), help="Comma-separated history lengths in years")
+    parser.add_argument("--functions", default="", help="Only run these functions (comma-separated)")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing samples per case (best is kept)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline")
+    parser.add_argument("--keep-best", action="store_true",
+                        help="With --save-baseline, keep the faster time and smaller peak of the saved and new run")
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "RESULTS"),
+                        help="Compare two saved result files instead of running")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--max-mem-regression", type=float, default=0.25,
+                        help="Allowed peak memory increase vs baseline")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        baseline, results = (_load_results(path) for path in args.compare)
+        return _report(compare(results, baseline, args.max_regression, args.max_mem_regression))
+
+    scales = [s for s in args.scales.split(",") if s]
+    unknown = [s for s in scales if s not in SCALES]
+    if unknown:
+        parser.error(f"Unknown scale(s): {unknown}")
+    years_list = [float(y) if "." in y else int(y) for y in args.years.split(",") if y]
+    only = {f for f in args.functions.split(",") if f}
+
+    print(f"Running benchmarks (scales={scales}, years={years_list}, repeat={args.repeat})...")
+    results = run(scales, years_list, args.repeat, only)
+
+    if args.save_baseline:
+        # Merge so a partial run only replaces the cases it measured
+        saved = _load_results(args.baseline) if os.path.exists(args.baseline) else {}
+        for case, r in results.items():
+            if args.keep_best and case in saved:
+                r = {key: min(r[key], saved[case][key]) for key in ("time_s", "peak_mb")}
+            saved[case] = r
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {"python": platform.python_version(), "machine": platform.machine(),
+                         "platform": platform.platform(), "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S")},
+                "results": saved,
+            }, f, indent=1)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}. Run with --save-baseline to create one.")
+        return 0
+
+    print()
+    return _report(compare(results, _load_results(args.baseline), args.max_regression, args.max_mem_regression))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,7 @@
 # Configuration for the Sector Rotation Monitor
 
+import os
+
 # Sector ETFs
 SECTORS = [
     "XLK",  # Technology
@@ -24,6 +26,27 @@ PERIODS = {
     "12w": 60   # Approx 12 trading weeks
 }
 
+# A screened stock earns the RS point of its Score when it leads its sector ETF
+# (average RS over PERIODS > 0) and its RS Rank across all screened stocks is at least this
+RS_MIN_RANK = 50
+
+# Volatility contraction pattern (see vcp.py). A contraction runs from a swing high
+# (the highest high of VCP_PIVOT_BARS bars on each side) to its lowest low before the next one.
+VCP_PIVOT_BARS = 5
+VCP_LOOKBACK = 130              # Only swing highs in the last ~6 months count
+VCP_MIN_CONTRACTIONS = 2        # Successive tightening contractions needed ...
+VCP_MAX_CONTRACTIONS = 4        # ... and the most that are looked at
+VCP_TIGHTENING = 0.8            # Each contraction at most this fraction of the previous one's depth
+VCP_MAX_FINAL_DEPTH = 0.12      # The latest contraction is at most 12% deep
+
+# Position sizing of the screened setups (see portfolio.py)
+PORTFOLIO_METHOD = "erc"            # "erc" (equal risk contribution) or "vol_target" (inverse vol scaled to the target)
+PORTFOLIO_TARGET_VOL = 0.15         # Annualized, for "vol_target" (the rest is cash)
+PORTFOLIO_MIN_SCORE = 2             # Stocks with at least this Score are sized
+PORTFOLIO_LOOKBACK = 126            # Days of returns for the covariance (~6 months)
+PORTFOLIO_MIN_HISTORY = 60          # Candidates with fewer days of returns are left out
+PORTFOLIO_SECTOR_CAPS = [0.5, 0.35, 0.25]  # Max weight of the 1st, 2nd, 3rd (and lower) ranked screened sector
+
 # Sector Chinese Names
 SECTOR_NAMES = {
     'XLK': '科技股 (Technology)',
@@ -43,6 +66,8 @@ SECTOR_NAMES = {
 
 
 # Top Holdings per Sector (Snapshot)
+# Only a fallback: the screen uses the holdings fetched from Yahoo (see data_fetcher.load_etf_holdings)
+# and falls back to this list for an ETF whose holdings could not be fetched.
 SECTOR_HOLDINGS = {
     "XLK": ["MSFT", "AAPL", "NVDA", "AVGO", "ORCL", "ADBE", "CRM", "AMD", "QCOM", "TXN"],
     "XLF": ["BRK-B", "JPM", "V", "MA", "BAC", "WFC", "MS", "GS", "SCHW", "SPGI"],
@@ -51,17 +76,126 @@ SECTOR_HOLDINGS = {
     "XLY": ["AMZN", "TSLA", "HD", "MCD", "NKE", "SBUX", "LOW", "TJX", "BKNG", "MAR"],
     "XLP": ["PG", "COST", "PEP", "WMT", "KO", "PM", "MDLZ", "CL", "MO", "TGT"],
     "XLI": ["GE", "CAT", "UBER", "UNP", "HON", "BA", "ADP", "RTX", "DE", "LMT"],
-    "XLC": ["GOOGL", "META", "NFLX", "DIS", "CMCSA", "VZ", "T", "TMUS", "CHTR", "WBD"],
-    "XLRE": ["PLD", "AMT", "EQIX", "CCI", "O", "PSA", "SPG", "VIC", "DLR", "EQR"],
+    "XLC": ["META", "GOOGL", "NFLX", "TTWO", "DIS", "CMCSA", "VZ", "T", "TMUS", "CHTR"],
+    "XLRE": ["PLD", "AMT", "EQIX", "CCI", "O", "PSA", "SPG", "VICI", "DLR", "EQR"],
     "XLB": ["LIN", "SHW", "FCX", "APD", "ECL", "NEM", "DOW", "CTVA", "ALB", "PPG"],
     "XLU": ["NEE", "SO", "DUK", "SRE", "AEP", "D", "PEG", "ED", "EXC", "PCG"]
 }
 
-import os
-from dotenv import load_dotenv
+# Fetched ETF holdings are cached here and reused for this long (screen universe + detail pages)
+HOLDINGS_CACHE_PATH = ".state/holdings.json"
+HOLDINGS_MAX_AGE_HOURS = 24
+
+# Memory budget (MB) for price data in flight in the streaming screen (see screener.py)
+SCREEN_MEMORY_BUDGET_MB = 256
+
+# Machine-readable report exports (see report_model.export_report)
+# 'parquet' additionally needs pyarrow or fastparquet installed
+EXPORT_DIR = "exports"
+EXPORT_FORMATS = ["json", "csv"]
+
+# Published site: index.html, pages/, content-hashed data/ and manifest.json (see site_build.py)
+SITE_DIR = "site"
+# Secret behind the detail pages' file names and keys (see site_build.load_secret). Kept with
+# the run state, not the site, so page names and bytes stay the same from run to run.
+SITE_SECRET_PATH = "data/site_secret"
+
+# Append-only SQLite archive of every run (see archive.py)
+ARCHIVE_PATH = "data/archive.db"
+HISTORY_WEEKS = 52
+
+# Local working state (stage caches for resuming a run, etc.)
+STATE_DIR = ".state"
+
+# Per-stage timeouts in seconds for the run DAG (stages not listed have no limit)
+STAGE_TIMEOUTS = {
+    "fetch_sectors": 300,
+    "fetch_etf_holdings": 300,
+    "fetch_top_sector_stocks": 300,
+    "pages": 300,
+    "deploy": 300,
+    "notify": 120,
+}
+
+# Run metrics (see instrumentation.py): latest run report, history of all runs, --profile output
+RUN_REPORT_PATH = ".state/run_report.json"
+METRICS_HISTORY_PATH = "data/metrics_history.jsonl"
+PROFILE_PATH = ".state/profile.pstats"
+
+# Worker processes for detail page generation (None = one per CPU)
+PAGE_WORKERS = None
+
+# Memoized analyzer results (see memo.py): per-process memory tier and a disk tier shared
+# across runs, both evicted least recently used first beyond their size
+MEMO_ENABLED = True
+MEMO_DIR = ".state/memo"
+MEMO_MAX_MB = 64
+MEMO_DISK_MAX_MB = 256
+
+# Async Yahoo transport (see yahoo_async.py)
+YAHOO_DEFAULT_BASE_URL = "https://query1.finance.yahoo.com"
+YAHOO_COOKIE_URL = "https://fc.yahoo.com"   # sets the cookie the quoteSummary crumb is tied to
+YAHOO_CONCURRENCY = 32                      # requests in flight (and pooled connections)
+
+# Notification delivery queue
+NOTIFY_QUEUE_DIR = ".notify_queue"
+NOTIFY_GRACE_SECONDS = 15       # How long a run waits for deliveries before leaving them queued
+NOTIFY_MAX_ATTEMPTS = 8
+NOTIFY_BACKOFF_SECONDS = 60     # Doubles with every failed attempt
+NOTIFY_MAX_BACKOFF_SECONDS = 6 * 3600
+
+# Change alerts (see alerts.py). "alerts": notifications carry only the events since the
+# previous run (the full report on the first run); "full": the whole report every run.
+NOTIFY_MODE = "alerts"
+ALERT_SNAPSHOT_PATH = "data/alert_snapshot.json"
+ALERT_RULES = ["top_enter", "top_exit", "new_setup", "contraction_start", "rs_flip"]
+ALERT_TOP_N = 3
+ALERT_MIN_SCORE = 2
+
+# `python main.py watch`: seconds between polls
+WATCH_INTERVAL_SECONDS = 3600
+
+
+# Settings read from environment variables (or .env). They are resolved on first
+# access, so importing config stays cheap and .env is only read when one is needed.
+_ENV_SETTINGS = {
+    # Discord Webhook URL
+    "DISCORD_WEBHOOK_URL": lambda: os.getenv("DISCORD_WEBHOOK_URL"),
+
+    # Additional notification sinks (all optional, see notifier.configured_sinks)
+    "SLACK_WEBHOOK_URL": lambda: os.getenv("SLACK_WEBHOOK_URL"),
+    "NOTIFY_WEBHOOK_URLS": lambda: [u.strip() for u in os.getenv("NOTIFY_WEBHOOK_URLS", "").split(",") if u.strip()],
+    "SMTP_HOST": lambda: os.getenv("SMTP_HOST"),
+    "SMTP_PORT": lambda: int(os.getenv("SMTP_PORT", "587")),
+    "SMTP_USER": lambda: os.getenv("SMTP_USER"),
+    "SMTP_PASSWORD": lambda: os.getenv("SMTP_PASSWORD"),
+    "SMTP_FROM": lambda: os.getenv("SMTP_FROM"),
+    "NOTIFY_EMAIL_TO": lambda: os.getenv("NOTIFY_EMAIL_TO"),
+    "NOTIFY_FILE": lambda: os.getenv("NOTIFY_FILE"),
+
+    # Market data transport: "yfinance" (yf.download / yf.Ticker) or "async" (yahoo_async.py:
+    # direct chart / quoteSummary requests, hundreds of tickers concurrently)
+    "DATA_TRANSPORT": lambda: os.getenv("DATA_TRANSPORT", "yfinance"),
+    # Where the async transport sends requests (e.g. a local yahoo_standin.py)
+    "YAHOO_BASE_URL": lambda: os.getenv("YAHOO_BASE_URL", YAHOO_DEFAULT_BASE_URL),
+}
+
+_env_loaded = False
+
+
+def load_env():
+    # Load environment variables from .env (once)
+    global _env_loaded
+    if not _env_loaded:
+        from dotenv import load_dotenv
+        load_dotenv()
+        _env_loaded = True
 
-# Load environment variables
-load_dotenv()
 
-# Discord Webhook URL
-DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
+def __getattr__(name):
+    if name not in _ENV_SETTINGS:
+        raise AttributeError(f"module 'config' has no attribute {name!r}")
+    load_env()
+    value = _ENV_SETTINGS[name]()
+    globals()[name] = value
+    return value
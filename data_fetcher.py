@@ -1,13 +1,21 @@
 import yfinance as yf
 import pandas as pd
 import config
+import instrumentation
 import time
+import json
+import os
 import concurrent.futures
 
+@instrumentation.timed_call
 def fetch_data(tickers, period="6mo", retries=3):
     """
     Fetches historical data for the given tickers with retry logic.
     """
+    if config.DATA_TRANSPORT == "async":
+        import yahoo_async
+        return yahoo_async.fetch_data(tickers, period=period, retries=retries)
+
     print(f"Fetching data for {len(tickers)} tickers...")
     
     for attempt in range(retries):
@@ -20,6 +28,10 @@ def fetch_data(tickers, period="6mo", retries=3):
             # yfinance recent versions might return empty DF on fail without raising
             if data.empty:
                  raise ValueError("Empty dataframe returned")
+            
+            instrumentation.count("tickers_fetched", len(tickers))
+            # yfinance hides the raw HTTP payload; the decoded frame size is a close proxy
+            instrumentation.count("bytes_downloaded", int(data.memory_usage(deep=True).sum()))
                  
             # Reformat if necessary:
             # If group_by='ticker', columns are MultiIndex (Ticker, Price)
@@ -29,11 +41,13 @@ def fetch_data(tickers, period="6mo", retries=3):
         except Exception as e:
             if attempt < retries - 1:
                 print(f"Attempt {attempt+1} failed ({e}). Retrying in 2s...")
+                instrumentation.count("retries")
                 time.sleep(2)
             else:
                 print(f"Failed to fetch data after {retries} attempts: {e}")
                 return pd.DataFrame()
 
+@instrumentation.timed_call
 def fetch_etf_holdings(ticker, retries=3):
     """
     Fetches the top 10 holdings for an ETF with retry logic.
@@ -59,7 +73,7 @@ def fetch_etf_holdings(ticker, retries=3):
                     holdings.append({
                         'symbol': symbol,
                         'name': name,
-                        'percent': percent
+                        'percent': float(percent) if percent == percent else 0.0  # NaN -> 0
                     })
                 return holdings
             else:
@@ -69,6 +83,7 @@ def fetch_etf_holdings(ticker, retries=3):
                  
         except Exception as e:
             if attempt < retries - 1:
+                 instrumentation.count("retries")
                  time.sleep(1)
             else:
                 print(f"Error fetching holdings for {ticker}: {e}")
@@ -80,6 +95,10 @@ def fetch_all_etf_holdings(tickers):
     Fetches holdings for multiple ETFs in parallel.
     Returns a dict: {ticker: [holdings_list]}
     """
+    if config.DATA_TRANSPORT == "async":
+        import yahoo_async
+        return yahoo_async.fetch_all_etf_holdings(tickers)
+
     print(f"Fetching holdings for {len(tickers)} ETFs in parallel...")
     results = {}
     
@@ -97,3 +116,57 @@ def fetch_all_etf_holdings(tickers):
                 results[ticker] = []
                 
     return results
+
+
+def _read_holdings_cache(cache_path):
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def load_etf_holdings(tickers, cache_path=None, max_age_hours=None):
+    """
+    Holdings of the given ETFs, fetched once and cached on disk so the screen, the
+    detail pages and re-runs all share one fetch.
+    Only ETFs missing from the cache (or older than max_age_hours) are fetched; if a
+    re-fetch comes back empty the previous cached holdings are kept.
+    Returns a dict: {ticker: [holdings_list]}
+    """
+    cache_path = cache_path or config.HOLDINGS_CACHE_PATH
+    max_age_hours = config.HOLDINGS_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+    cache = _read_holdings_cache(cache_path)
+
+    now = time.time()
+    stale = [t for t in tickers
+             if t not in cache or now - cache[t].get("fetched_at", 0) > max_age_hours * 3600]
+    if stale:
+        fetched = fetch_all_etf_holdings(stale)
+        for ticker, holdings in fetched.items():
+            if holdings:
+                cache[ticker] = {"fetched_at": now, "holdings": holdings}
+        directory = os.path.dirname(cache_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, ensure_ascii=False)
+    else:
+        print(f"Using cached holdings for {len(tickers)} ETFs ({cache_path})")
+
+    return {t: cache[t]["holdings"] if t in cache else [] for t in tickers}
+
+
+def screen_universe(all_holdings, sector):
+    """
+    The stocks to screen for a sector ETF with their holding weights: {symbol: percent}.
+    Uses the fetched holdings; falls back to config.SECTOR_HOLDINGS (weights None) when
+    there are none.
+    """
+    holdings = all_holdings.get(sector) or []
+    if holdings:
+        return {h['symbol']: h['percent'] for h in holdings}
+    fallback = config.SECTOR_HOLDINGS.get(sector, [])
+    if fallback:
+        print(f"  No fetched holdings for {sector}, using the SECTOR_HOLDINGS snapshot")
+    return {symbol: None for symbol in fallback}
@@ -0,0 +1,220 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+# Run-wide metrics: per-stage and per-call wall/CPU time plus simple counters.
+# Everything lives in module state guarded by one lock; call reset() to start a run.
+
+_lock = threading.Lock()
+_run = {}
+
+
+def reset():
+    with _lock:
+        _run.clear()
+        _run.update({
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "_wall_start": time.perf_counter(),
+            "_cpu_start": time.process_time(),
+            "stages": {},
+            "calls": {},
+            "counters": {},
+        })
+
+
+reset()
+
+
+def count(name, n=1):
+    """
+    Adds n to a counter (e.g. 'retries', 'tickers_processed', 'bytes_downloaded').
+    """
+    with _lock:
+        _run["counters"][name] = _run["counters"].get(name, 0) + n
+
+
+def record_stage(name, status, wall, cpu):
+    with _lock:
+        _run["stages"][name] = {"status": status, "wall_s": round(wall, 4), "cpu_s": round(cpu, 4)}
+
+
+def _record_call(name, wall, cpu):
+    with _lock:
+        c = _run["calls"].setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "max_wall_s": 0.0})
+        c["calls"] += 1
+        c["wall_s"] += wall
+        c["cpu_s"] += cpu
+        c["max_wall_s"] = max(c["max_wall_s"], wall)
+
+
+@contextmanager
+def timed(name):
+    """
+    Times a block as a call named `name` (aggregated: count, total and max wall time, CPU time).
+    CPU time is the calling thread's, so concurrent stages do not blur each other.
+    """
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        _record_call(name, time.perf_counter() - wall_start, time.thread_time() - cpu_start)
+
+
+def timed_call(func=None, name=None):
+    """
+    Decorator version of timed(); the call name defaults to module.function.
+    """
+    if func is None:
+        return functools.partial(timed_call, name=name)
+    call_name = name or f"{func.__module__}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with timed(call_name):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB (None where the platform does not report it).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+class StageMetrics:
+    """
+    pipeline.run_stages hook that records every stage's wall and CPU time.
+    """
+    def stage_finished(self, name, status, seconds, cpu_seconds=0.0):
+        record_stage(name, status, seconds, cpu_seconds)
+
+
+def run_report():
+    """
+    Returns the structured report of the current run.
+    """
+    with _lock:
+        report = {k: v for k, v in _run.items() if not k.startswith("_")}
+        report = json.loads(json.dumps(report))  # deep copy
+        report["wall_s"] = round(time.perf_counter() - _run["_wall_start"], 4)
+        report["cpu_s"] = round(time.process_time() - _run["_cpu_start"], 4)
+    for c in report["calls"].values():
+        for k in ("wall_s", "cpu_s", "max_wall_s"):
+            c[k] = round(c[k], 4)
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def _check_regressions(report, history, window=8, threshold=1.5):
+    """
+    Prints stages that took more than `threshold` x their median over the last `window` runs.
+    """
+    past = history[-window:]
+    if not past:
+        return
+    for name, stage in report["stages"].items():
+        times = sorted(h["stages"][name]["wall_s"] for h in past
+                       if name in h.get("stages", {}) and h["stages"][name]["status"] == "done")
+        if len(times) < 3 or stage["status"] != "done":
+            continue
+        median = times[len(times) // 2]
+        if median > 0.05 and stage["wall_s"] > threshold * median:
+            print(f"⚠️  Stage {name} took {stage['wall_s']:.2f}s (median of last {len(times)} runs: {median:.2f}s)")
+
+
+def write_run_report(report_path=None, history_path=None):
+    """
+    Writes the JSON run report and appends it (one line per run) to the metrics history.
+    Returns the report.
+    """
+    report_path = report_path or config.RUN_REPORT_PATH
+    history_path = history_path or config.METRICS_HISTORY_PATH
+    report = run_report()
+
+    for path in (report_path, history_path):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    history = []
+    if os.path.exists(history_path):
+        with open(history_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    history.append(json.loads(line))
+                except ValueError:
+                    continue
+    _check_regressions(report, history)
+
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    with open(history_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(report, separators=(",", ":")) + "\n")
+
+    stages = ", ".join(f"{k} {v['wall_s']:.2f}s" for k, v in report["stages"].items())
+    print(f"Run metrics: wall {report['wall_s']:.2f}s, CPU {report['cpu_s']:.2f}s, "
+          f"peak RSS {report['peak_rss_mb']} MB ({stages})")
+    return report
+
+
+class Profiler:
+    """
+    Opt-in cProfile of the run. Stages run on their own threads and cProfile only
+    sees the thread it is enabled in, so each stage is profiled separately
+    (wrap()) and the stats are merged when saved. Only one cProfile may be active per
+    process (Python 3.12+ raises otherwise), so profiled stages must run one at a time
+    (pipeline.run_stages(serial=True)); the lock also covers a timed-out stage that is
+    still running.
+    """
+    def __init__(self):
+        self._profiles = []
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+
+    def wrap(self, func):
+        import cProfile
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self._active:
+                profile = cProfile.Profile()
+                profile.enable()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profile.disable()
+                    with self._lock:
+                        self._profiles.append(profile)
+        return wrapper
+
+    def save(self, path, top=25):
+        import pstats
+
+        with self._lock:
+            profiles = list(self._profiles)
+        if not profiles:
+            return None
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        stats.dump_stats(path)
+        print(f"\nProfile written to {path} (view with: python -m pstats {path})")
+        stats.sort_stats("cumulative").print_stats(top)
+        return path
@@ -0,0 +1,193 @@
+"""
+End-to-end load test: the whole `main.py run` pipeline (fetch -> analyze -> render ->
+notify) against a synthetic market (synthetic.SyntheticMarket) and a local webhook sink
+(mock_webhook.py), at multiples of today's universe (11 sector ETFs + SPY / QQQ and
+30 screened holdings).
+
+    python loadtest.py                          # scales 1, 10 and 100
+    python loadtest.py --scales 1,10 --out loadtest.json
+
+Scale s is 11 x s sector ETFs holding 10 x s stocks each, so the top 3 sectors put
+30 x s stocks through the screen. Every scale runs in its own process and scratch
+directory, so peak RSS is per scale and nothing in the repository is touched. There
+is no network access: prices and holdings are synthetic, the notification goes to
+the mock webhook and deploy is skipped as in CI.
+"""
+import argparse
+import datetime
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from tabulate import tabulate
+
+import config
+
+DEFAULT_SCALES = [1, 10, 100]
+ETFS_PER_SCALE = 11
+HOLDINGS_PER_SCALE = 10
+
+
+def _stage_items(etfs, sectors, stocks, pages, messages):
+    # What each stage's throughput is counted in
+    return {
+        "fetch_sectors": (etfs, "tickers"),
+        "rank": (etfs, "tickers"),
+        "rrg": (sectors, "sectors"),
+        "fetch_etf_holdings": (sectors, "ETFs"),
+        "fetch_top_sector_stocks": (stocks, "tickers"),
+        "screen": (stocks, "tickers"),
+        "portfolio": (stocks, "tickers"),
+        "build_report": (stocks, "stocks"),
+        "alerts": (stocks, "stocks"),
+        "archive": (stocks, "stocks"),
+        "pages": (pages, "pages"),
+        "index": (stocks, "stocks"),
+        "site": (pages, "pages"),
+        "notify": (messages, "messages"),
+    }
+
+
+def run_scale(scale, years=2):
+    """
+    Runs main.main() once against a synthetic market of this scale in the current
+    directory. Returns the result dict (stages, counters, wall time, peak RSS).
+    """
+    import data_fetcher
+    import instrumentation
+    import main
+    import mock_webhook
+    import synthetic
+
+    market = synthetic.SyntheticMarket(n_sectors=ETFS_PER_SCALE * scale, holdings_per_sector=HOLDINGS_PER_SCALE * scale,
+                                       years=years, end=datetime.date.today())
+    config.SECTORS = market.sectors
+    config.SECTOR_HOLDINGS = {etf: market.holdings_of(etf) for etf in market.sectors}
+    data_fetcher.fetch_data = market.fetch_data
+    data_fetcher.fetch_all_etf_holdings = market.fetch_all_etf_holdings
+
+    # Only the mock webhook gets notified, whatever .env or the environment configure
+    config._env_loaded = True
+    config.SLACK_WEBHOOK_URL = config.SMTP_HOST = config.NOTIFY_FILE = None
+    config.NOTIFY_WEBHOOK_URLS = []
+    os.environ["GITHUB_ACTIONS"] = "1"  # deploy: skip the git push
+
+    status = "done"
+    start = time.perf_counter()
+    with mock_webhook.MockWebhookServer() as sink:
+        config.DISCORD_WEBHOOK_URL = sink.url
+        try:
+            main.main(["run"])
+        except SystemExit as e:
+            status = f"failed (exit {e.code})"
+        messages = len(sink.messages)
+        received_bytes = sum(len(json.dumps(m["payload"])) + sum(len(f) for f in m["files"].values())
+                             for m in sink.messages)
+    wall = time.perf_counter() - start
+
+    report = instrumentation.run_report()
+    etfs = len(market.sectors) + len(config.BENCHMARKS)
+    stocks = 3 * market.holdings_per_sector
+    pages_dir = os.path.join(config.SITE_DIR, "pages")
+    pages = len(os.listdir(pages_dir)) if os.path.isdir(pages_dir) else 0
+
+    stages = {}
+    for name, (items, unit) in _stage_items(etfs, len(market.sectors), stocks, pages, messages).items():
+        stage = report["stages"].get(name)
+        if stage is None:
+            continue
+        wall_s = stage["wall_s"]
+        stages[name] = {"status": stage["status"], "wall_s": wall_s, "cpu_s": stage["cpu_s"], "items": items,
+                        "unit": unit, "per_s": round(items / wall_s, 1) if wall_s > 0 else None}
+    return {
+        "scale": scale,
+        "etfs": etfs,
+        "stocks": stocks,
+        "status": status,
+        "wall_s": round(wall, 2),
+        "cpu_s": report["cpu_s"],
+        "peak_rss_mb": report["peak_rss_mb"],
+        "messages": messages,
+        "message_bytes": received_bytes,
+        "stages": stages,
+        "counters": report["counters"],
+    }
+
+
+def run_child(scale, log_dir, years):
+    """
+    Runs one scale in a fresh process and scratch directory; its output goes to a log file.
+    """
+    workdir = tempfile.mkdtemp(prefix=f"loadtest_{scale}x_")
+    result_path = os.path.join(workdir, "result.json")
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f"loadtest_{scale}x.log")
+    print(f"Scale {scale}x: {ETFS_PER_SCALE * scale} sector ETFs, {3 * HOLDINGS_PER_SCALE * scale} screened stocks "
+          f"(work dir {workdir}, log {log_path})...")
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", str(scale), "--years", str(years),
+                               "--result", result_path],
+                              cwd=workdir, stdout=log, stderr=subprocess.STDOUT,
+                              env=dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(__file__))))
+    try:
+        with open(result_path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"scale": scale, "status": f"crashed (exit {proc.returncode}), see {log_path}", "stages": {}}
+
+
+def print_results(results):
+    rows = []
+    for r in results:
+        rows.append([f"{r['scale']}x", r.get("etfs"), r.get("stocks"), r["status"], r.get("wall_s"), r.get("cpu_s"),
+                     r.get("peak_rss_mb"), r.get("messages")])
+    print("\n" + tabulate(rows, headers=["Scale", "ETFs", "Stocks", "Status", "Wall s", "CPU s", "Peak RSS MB",
+                                         "Messages"], tablefmt="simple"))
+
+    names = list(dict.fromkeys(name for r in results for name in r["stages"]))
+    rows = []
+    for name in names:
+        row = [name]
+        for r in results:
+            stage = r["stages"].get(name)
+            if stage is None:
+                row.append("-")
+            elif stage["per_s"] is None:
+                row.append(f"{stage['wall_s']:.2f}s")
+            else:
+                row.append(f"{stage['wall_s']:.2f}s ({stage['per_s']:g} {stage['unit']}/s)")
+        rows.append(row)
+    print("\n" + tabulate(rows, headers=["Stage"] + [f"{r['scale']}x" for r in results], tablefmt="simple"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="End-to-end load test against a synthetic market")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="Comma-separated multiples of today's universe")
+    parser.add_argument("--years", type=int, default=2, help="Years of synthetic history")
+    parser.add_argument("--out", help="Write the results as JSON")
+    parser.add_argument("--log-dir", default=tempfile.gettempdir(), help="Where each scale's run output goes")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        result = run_scale(args.child, args.years)
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=1)
+        return 0
+
+    results = [run_child(int(s), args.log_dir, args.years) for s in args.scales.split(",")]
+    print_results(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+        print(f"\nResults written to {args.out}")
+    return 0 if all(r["status"] == "done" for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
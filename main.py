@@ -1,179 +1,527 @@
 import config
-import data_fetcher
-import analyzer
-import reporter
+import pipeline
+import instrumentation
+import argparse
 import sys
+import time
 import os # Added for env var check
-import pandas as pd # Added for type checking logic
 
-import notifier # Add import
+# Heavy modules (yfinance, pandas, requests...) are imported inside the stages that
+# use them, so commands that only render or notify from saved outputs start fast.
 
-def main():
-    try:
-        # 1. Define Tickers
-        all_tickers = config.SECTORS + config.BENCHMARKS
-        
-        # 2. Fetch Data
-        # We need enough data for 12 weeks calculation. 
-        # 12 weeks = ~60 trading days. '6mo' is safe.
-        data = data_fetcher.fetch_data(all_tickers, period="6mo")
-        
-        if data.empty:
-            print("No data fetched. Exiting.")
-            sys.exit(1)
-            
-        # 3. Calculate Returns
-        # We need to handle the fact that 'data' might be MultiIndex (if >1 ticker) or single index
-        # For sector analysis, we only want 'Close' prices.
-        
-        sector_data = data
-        if isinstance(data.columns, pd.MultiIndex):
-            # Extract 'Close' level
-            sector_data = data['Close']
-        else:
-            # Single ticker or flat index, assume it has 'Close' if fetched with OHLC, 
-            # or if it was just Close (old behavior), but we changed fetch_data to return full.
-            if 'Close' in data.columns:
-                 sector_data = data['Close'].to_frame() # This might be wrong if multiple tickers but flat? Unlikely with new yf.
-                 # Actually if flat, it's one ticker. 
-                 pass
-        
-        # calculate_returns expects a DataFrame where columns are Tickers and values are Prices.
-        # If we passed multiple tickers to yf.download, data['Close'] matches this (Cols=Tickers).
-        
-        returns = analyzer.calculate_returns(sector_data)
-        
-        # 4. Rank Sectors
-        ranked_sectors = analyzer.rank_sectors(returns, config.BENCHMARKS)
-        
-        # 5. Report
-        reporter.print_sector_ranking(ranked_sectors)
-        
-        # Collect report for Discord
-        full_report = reporter.generate_sector_report(ranked_sectors)
-        
-        # 6. Drill Down (Phase 2)
-        # Get Top 3 Sectors
-        # ranked_sectors has a column 'Sector' after reset_index in reporter, but here it is the index
-        top_3_sectors = ranked_sectors.index[:3].tolist()
-        
-        sector_results = {}
-        
-        print("\n正在分析領先板塊成分股 (Analyzing Top Sector Components)...")
-        
-        for sector in top_3_sectors:
-            print(f"  Fetching {sector} holdings...")
-            holdings = config.SECTOR_HOLDINGS.get(sector, [])
-            if not holdings:
-                continue
-                
-            # Fetch data for holdings
-            stock_data = data_fetcher.fetch_data(holdings, period="1y") # Need > 200 days for 200SMA, user asked for 50SMA so 6mo is fine, but 1y safest.
-            
-            sector_res = []
-            
-            # Interact with the data structure
-            is_multi = isinstance(stock_data.columns, pd.MultiIndex)
-            
-            for ticker in holdings:
-                try:
-                    if is_multi:
-                        # Extract dataframe for single ticker
-                        # Columns are (Price, Ticker) -> We want just Price cols
-                        # xs might fail if ticker not found
-                        try:
-                            df = stock_data.xs(ticker, axis=1, level=1)
-                        except KeyError:
-                            continue
-                    else:
-                        # If single ticker in holdings (unlikely)
-                        if len(holdings) == 1 and ticker == holdings[0]:
-                             df = stock_data
-                        else:
-                             continue
-                    
-                    # Analyze
-                    res = analyzer.check_technical_setup(df)
-                    if res:
-                        sector_res.append({'ticker': ticker, 'results': res})
-                except Exception as e:
-                    # print(f"Error analyzing {ticker}: {e}")
-                    continue
-                    
-            sector_results[sector] = sector_res
-            
-        reporter.print_stock_analysis(sector_results)
-        
-        # Append stock report to Discord message
-        stock_report = reporter.generate_stock_report(sector_results)
-        full_report += "\n" + stock_report
-        
-        # 7. Web Report & PIN (Phase 4 & 6)
-        import random
-        pin = str(random.randint(1000, 9999))
-        print(f"\nGenerated PIN: {pin}")
-        
-        # Generate ETF Detail Pages
-        print("Generating ETF detail pages...")
-        if not os.path.exists("pages"):
-            os.makedirs("pages")
-            
-        # Parallel fetch
-        etf_tickers = ranked_sectors.index.tolist()
-        all_holdings = data_fetcher.fetch_all_etf_holdings(etf_tickers)
-            
-        for ticker, holdings in all_holdings.items():
-             try:
-                 print(f"  Processing {ticker}...")
-                 # holdings already fetched
-                 chinese_name = config.SECTOR_NAMES.get(ticker, ticker)
-                 page_html = reporter.generate_etf_detail_page(ticker, holdings, chinese_name)
-                 with open(f"pages/{ticker}.html", "w", encoding="utf-8") as f:
-                     f.write(page_html)
-             except Exception as e:
-                 print(f"Failed to generate page for {ticker}: {e}")
-
-        html_content = reporter.generate_html(full_report, pin, ranked_df=ranked_sectors, sector_results=sector_results)
-        
-        with open("index.html", "w", encoding="utf-8") as f:
-            f.write(html_content)
-            
-        print("Generated index.html with PIN protection.")
-        
-        # Automate Deployment (Git Push)
-        # Only run this if NOT in GitHub Actions (or if configured to do so explicitly)
-        # In GitHub Actions, we might want to let the workflow handle the push to avoid auth issues or conflicts,
-        # OR we can do it here if we set up the remote correctly.
-        # But typically, workflows use a specific step for pushing.
-        
-        if not os.getenv("GITHUB_ACTIONS"):
-            import subprocess
+# The run is a DAG of stages (see pipeline.py). Each stage declares the values it
+# needs and the values it produces; independent stages (e.g. the ETF holdings
+# scrape and the top-3 price downloads) run at the same time.
+
+# Stage outputs are cached here so a failed run can be resumed with --resume
+STAGE_CACHE_DIR = os.path.join(config.STATE_DIR, "stages")
+
+
+def drain_notifications():
+    # Retry notifications that failed or were cut off in earlier runs (in the background)
+    import notifier
+    return notifier.drain_queue()
+
+
+def fetch_sectors():
+    # We need enough data for 12 weeks calculation.
+    # 12 weeks = ~60 trading days. '6mo' would be enough for the ranking;
+    # the RRG needs ~1y (rolling windows plus an 8-week tail).
+    import data_fetcher
+    import validation
+    import pandas as pd
+
+    all_tickers = config.SECTORS + config.BENCHMARKS
+    data = data_fetcher.fetch_data(all_tickers, period="1y")
+
+    if data.empty:
+        raise RuntimeError("No data fetched")
+
+    # Check the whole panel (gaps, stale bars, bad prices, split jumps); only failing tickers are re-fetched
+    data, quality = validation.validate_and_refetch(data, data_fetcher.fetch_data, "1y",
+                                                    min_bars=max(config.PERIODS.values()) + 1,
+                                                    as_of=pd.Timestamp.now(), tickers=all_tickers)
+    if "SPY" not in quality.index or not quality.loc["SPY", "ok"]:
+        raise RuntimeError("No valid SPY data (needed as the benchmark)")
+
+    # We need to handle the fact that 'data' might be MultiIndex (if >1 ticker) or single index
+    # For sector analysis, we only want 'Close' prices.
+    sector_data = data
+    if isinstance(data.columns, pd.MultiIndex):
+        # Extract 'Close' level
+        sector_data = data['Close']
+    elif 'Close' in data.columns:
+        # Flat index means a single ticker
+        sector_data = data['Close'].to_frame()
+    return sector_data
+
+
+def rank(sector_data):
+    # calculate_returns expects a DataFrame where columns are Tickers and values are Prices.
+    import analyzer
+
+    returns = analyzer.calculate_returns(sector_data)
+    # Sectors that failed the data checks were dropped in fetch_sectors
+    sectors = [s for s in config.SECTORS if s in sector_data.columns]
+    ranked_sectors = analyzer.rank_sectors(returns, config.BENCHMARKS, sectors=sectors)
+    return {'returns': returns, 'ranked_sectors': ranked_sectors}
+
+
+def rotation(sector_data):
+    # Relative Rotation Graph: weekly RS-Ratio / RS-Momentum tails of every sector vs SPY
+    import rrg
+
+    sectors = [s for s in config.SECTORS if s in sector_data.columns]
+    return rrg.rrg_tails(sector_data, benchmark="SPY", sectors=sectors)
+
+
+def fetch_etf_holdings():
+    # Holdings of every sector ETF, fetched once (and cached) for both the screen and the detail pages
+    import data_fetcher
+    return data_fetcher.load_etf_holdings(config.SECTORS)
+
+
+def fetch_top_sector_stocks(ranked_sectors, all_holdings):
+    # Drill Down (Phase 2): price history of the holdings of the top 3 sectors
+    import data_fetcher
+    import validation
+    import pandas as pd
+
+    top_3_sectors = ranked_sectors.index[:3].tolist()
+    stock_data = {}
+    for sector in top_3_sectors:
+        print(f"  Fetching {sector} holdings...")
+        # {symbol: holding weight}, from the fetched ETF holdings (SECTOR_HOLDINGS as fallback)
+        weights = data_fetcher.screen_universe(all_holdings, sector)
+        if not weights:
+            continue
+        # Need > 200 days for 200SMA, user asked for 50SMA so 6mo is fine, but 1y safest.
+        data = data_fetcher.fetch_data(list(weights), period="1y")
+        if not data.empty:
+            data, _ = validation.validate_and_refetch(data, data_fetcher.fetch_data, "1y", min_bars=50,
+                                                      as_of=pd.Timestamp.now(), tickers=list(weights))
+        stock_data[sector] = (weights, data)
+    return stock_data
+
+
+def screen(stock_data, returns):
+    import analyzer
+    import pandas as pd
+    import vcp
+
+    print("\n正在分析領先板塊成分股 (Analyzing Top Sector Components)...")
+    sector_results = {}
+    closes = []
+
+    for sector, (weights, data) in stock_data.items():
+        sector_res = []
+        holdings = list(weights)
+
+        # Interact with the data structure
+        is_multi = isinstance(data.columns, pd.MultiIndex)
+        closes.append(data['Close'] if is_multi else data[['Close']].set_axis(holdings[:1], axis=1))
+        # Contraction patterns of the whole sector panel in one pass
+        patterns = vcp.detect_panel(data) if is_multi else None
+
+        for ticker in holdings:
             try:
-                print("Deploying to GitHub Pages (Local mode)...")
-                subprocess.run(["git", "add", "index.html", "pages/"], check=True)
-                subprocess.run(["git", "commit", "-m", f"Update report for {pd.Timestamp.now().date()}"], check=False) # Check=False in case nothing changed
-                subprocess.run(["git", "push"], check=True)
-                print("Deployment successful.")
+                if is_multi:
+                    # Extract dataframe for single ticker
+                    # Columns are (Price, Ticker) -> We want just Price cols
+                    # xs might fail if ticker not found
+                    try:
+                        df = data.xs(ticker, axis=1, level=1)
+                    except KeyError:
+                        continue
+                    pattern = patterns.loc[ticker]
+                else:
+                    # If single ticker in holdings (unlikely)
+                    if len(holdings) == 1 and ticker == holdings[0]:
+                         df = data
+                         pattern = None
+                    else:
+                         continue
+
+                # Analyze
+                res = analyzer.check_technical_setup(df, pattern)
+                if res:
+                    instrumentation.count("tickers_processed")
+                    res['Weight'] = weights[ticker]
+                    sector_res.append({'ticker': ticker, 'results': res})
             except Exception as e:
-                print(f"Deployment failed: {e}")
-        else:
-            print("Running in GitHub Actions. Skipping internal git push (Workflow will handle it).")
+                # print(f"Error analyzing {ticker}: {e}")
+                continue
+
+        sector_results[sector] = sector_res
+
+    # RS vs the parent sector ETF and SPY, ranked across every screened stock in one pass
+    screened = [(sector, s) for sector, rows in sector_results.items() for s in rows]
+    if screened:
+        close = pd.concat(closes, axis=1)
+        close = close.loc[:, ~close.columns.duplicated()]
+        parents = pd.Series([sector for sector, _ in screened], index=[s['ticker'] for _, s in screened])
+        rs = analyzer.stock_relative_strength(analyzer.calculate_returns(close), parents, returns)
+        for (_, s), row in zip(screened, rs.to_dict("records")):
+            res = s['results']
+            res['RS vs Sector 4w'] = row['RS_Sector_4w']
+            res['RS vs Sector 12w'] = row['RS_Sector_12w']
+            res['RS vs SPY 4w'] = row['RS_SPY_4w']
+            res['RS vs SPY 12w'] = row['RS_SPY_12w']
+            res['RS Rank'] = row['RS_Rank']
+            res['RS Leader'] = bool(row['RS_Leader'])
+            res['Score'] += 1 if row['RS_Leader'] else 0
+    return sector_results
+
+
+def size_positions(stock_data, ranked_sectors, sector_results):
+    # Weights for the setups: shrinkage covariance of their returns, ERC / vol target, sector caps
+    import portfolio
+
+    result = portfolio.build_portfolio(stock_data, ranked_sectors, sector_results)
+    if result['weights']:
+        print(f"Portfolio ({result['method']}): {len(result['weights'])} positions, "
+              f"expected vol {result['vol']:.1%}, cash {result['cash']:.1%}.")
+    return result
+
+
+def build_report(ranked_sectors, sector_results, rrg, portfolio):
+    # Build the report model once; every output below is rendered from it
+    import reporter
+    import report_model
+
+    model = report_model.build_report_model(ranked_sectors, sector_results, rrg=rrg, portfolio=portfolio)
+
+    reporter.render_console(model)
+
+    # Plain-text report for Discord and the HTML 'Detailed Report' section
+    full_report = reporter.render_discord(model)
+
+    exported = report_model.export_report(model, out_dir=config.EXPORT_DIR, formats=config.EXPORT_FORMATS)
+    print(f"Exported {len(exported)} report files to {config.EXPORT_DIR}/")
+    return {'model': model, 'full_report': full_report}
+
 
-        
-        # 8. Notify Discord
-        print("\nSending report to Discord...")
-        # GitHub Pages URL (Replace with actual user's URL if known, else usage guide says 'xzonisy.github.io/stock_watch_tower')
-        # Based on remote origin: https://github.com/xzonisy/stock_watch_tower
-        github_pages_url = "https://xzonisy.github.io/stock_watch_tower/"
-        
-        notifier.send_discord_report(full_report, pin=pin, url=github_pages_url)
+def detect_alerts(model, full_report):
+    # Diff against the previous run's snapshot; only the events are sent. The new
+    # snapshot is saved by the notify stage, once the events are queued for delivery.
+    import alerts
 
+    engine = alerts.engine()
+    first_run = not engine.has_baseline
+    events, pending = engine.update(model)
+    print(f"Alerts: {len(events)} event(s)" + (" (first run, no previous snapshot)" if first_run else "") + ".")
+    text = full_report if config.NOTIFY_MODE == "full" or first_run else (alerts.render_events(events) if events else None)
+    return {'alert_events': events, 'notify_text': text, 'alert_snapshot': pending}
 
-        
+
+def archive_run(model):
+    # Archive this run and read the rank history back (no re-fetch)
+    import archive
+    import sqlite3
+
+    # The archive is a side record: a database error must not cost the report its pages,
+    # site, deploy and notification, so they get an empty history instead
+    try:
+        archive.archive_run(model)
+        # Kept as plain lists so `render` can load the saved history without importing pandas
+        history = {ticker: df.to_dict("list")
+                   for ticker, df in archive.all_rank_history(weeks=config.HISTORY_WEEKS).items()}
+        persistent = archive.persistent_setups(min_score=2, weeks=3)
+    except (sqlite3.Error, OSError) as e:
+        print(f"Archive failed ({type(e).__name__}: {e}). Continuing without rank history.")
+        return {'history': {}, 'persistent': []}
+    return {'history': history, 'persistent': persistent}
+
+
+def write_detail_pages(model, all_holdings, history, persistent):
+    # Generate ETF and stock detail pages. Each is encrypted with a key derived from its content;
+    # the keys go into the PIN-encrypted index data, so a page that did not change keeps its bytes
+    import reporter
+    import pages
+    import site_build
+
+    print("Generating detail pages...")
+    pages_dir = os.path.join(config.SITE_DIR, "pages")
+    os.makedirs(pages_dir, exist_ok=True)
+    secret = site_build.load_secret()
+    page_keys = {}
+
+    def job(name, render_func, args):
+        # The page's key is the last argument of its render function
+        page_keys[name] = reporter.page_key(secret, name, args)
+        return os.path.join(pages_dir, f"{name}.html"), render_func, args + (page_keys[name],)
+
+    # One job per page; pages are rendered across a worker pool and unchanged pages are skipped
+    stock_pages = {s['ticker']: reporter.stock_page_name(s['ticker'], secret) for s in model['stocks']}
+    page_jobs = []
+    for ticker, holdings in all_holdings.items():
+        chinese_name = config.SECTOR_NAMES.get(ticker, ticker)
+        screened = {s['ticker']: stock_pages[s['ticker']] for s in model['stocks'] if s['sector'] == ticker}
+        page_jobs.append(job(ticker, reporter.generate_etf_detail_page, (ticker, holdings, chinese_name, screened)))
+    for stock in model['stocks']:
+        name = stock_pages[stock['ticker']]
+        page_jobs.append(job(name, reporter.generate_stock_detail_page, (stock, name)))
+    page_jobs.append(job("history", reporter.generate_rank_history_page,
+                         (history, persistent, config.HISTORY_WEEKS)))
+
+    summary = pages.write_pages(page_jobs)
+    # Pages in the manifest; a page that failed this time keeps its previous version if there is one
+    paths = summary['written'] + summary['unchanged'] + [p for p, _ in summary['failed'] if os.path.exists(p)]
+    page_files = sorted(os.path.relpath(p, config.SITE_DIR).replace(os.sep, "/") for p in paths)
+    return {'page_summary': {k: len(v) for k, v in summary.items()}, 'page_files': page_files,
+            'page_keys': page_keys, 'stock_pages': stock_pages}
+
+
+def write_index(model, full_report, page_keys, stock_pages):
+    # Web Report & PIN (Phase 4 & 6)
+    import random
+    import reporter
+    import site_build
+    pin = str(random.randint(1000, 9999))
+    print(f"\nGenerated PIN: {pin}")
+
+    # The encrypted data goes to a content-hashed file; index.html is a small shell that loads it
+    payload = reporter.encrypt_report(model, pin, report_text=full_report, page_keys=page_keys,
+                                      stock_pages=stock_pages)
+    data_path = site_build.write_hashed(config.SITE_DIR, "data/report.txt", payload.encode("utf-8"))
+    site_build.write_file(config.SITE_DIR, "index.html", reporter.render_index_shell(data_path).encode("utf-8"))
+
+    print(f"Generated {config.SITE_DIR}/index.html with PIN protection (data: {data_path}).")
+    return {'pin': pin, 'index_files': {"index.html": "index.html", "data/report.txt": data_path}}
+
+
+def finalize_site(page_files, index_files):
+    # manifest.json of the site build; stale files are deleted
+    import site_build
+
+    files = dict(index_files)
+    files.update((path, path) for path in page_files)
+    return site_build.finalize(config.SITE_DIR, files)
+
+
+def deploy(pin, site_changes):
+    # Automate Deployment (Git Push)
+    # Only run this if NOT in GitHub Actions (or if configured to do so explicitly)
+    # In GitHub Actions, we might want to let the workflow handle the push to avoid auth issues or conflicts,
+    # OR we can do it here if we set up the remote correctly.
+    # But typically, workflows use a specific step for pushing.
+
+    config.load_env()
+    if not os.getenv("GITHUB_ACTIONS"):
+        import subprocess
+        import datetime
+        try:
+            print("Deploying to GitHub Pages (Local mode)...")
+            print(f"  {len(site_changes['added']) + len(site_changes['changed'])} site files changed, "
+                  f"{len(site_changes['removed'])} removed.")
+            # Only the site: the archive, metrics history and alert snapshot stay local (data/ is ignored).
+            # git add fails on a pathspec that does not exist, so check first
+            if not os.path.isdir(config.SITE_DIR):
+                print(f"Nothing to deploy: {config.SITE_DIR}/ does not exist (run `python main.py render` first).")
+                return "skipped"
+            subprocess.run(["git", "add", "-A", config.SITE_DIR], check=True)
+            subprocess.run(["git", "commit", "-m", f"Update report for {datetime.date.today()}"], check=False) # Check=False in case nothing changed
+            subprocess.run(["git", "push"], check=True)
+            print("Deployment successful.")
+            return "pushed"
+        except Exception as e:
+            print(f"Deployment failed: {e}")
+            return "failed"
+    print("Running in GitHub Actions. Skipping internal git push (Workflow will handle it).")
+    return "skipped"
+
+
+def notify(notify_text, pin, deployed, retry_batch, alert_snapshot):
+    # Notify (Discord, Slack/webhooks, email, file) once the pages are live
+    import alerts
+    import notifier
+
+    # GitHub Pages URL (Replace with actual user's URL if known, else usage guide says 'xzonisy.github.io/stock_watch_tower')
+    # Based on remote origin: https://github.com/xzonisy/stock_watch_tower
+    github_pages_url = "https://xzonisy.github.io/stock_watch_tower/"
+
+    if not notify_text:
+        if not pin:
+            # watch polls without news: nothing to send
+            print("No alert events. Skipping notification.")
+            alerts.engine().commit(alert_snapshot)
+            retry_batch.wait(timeout=0)
+            return {"delivered": [], "failed": [], "pending": []}
+        # A new report still needs its link and PIN delivered
+        notify_text = "本次無新事件 (No new alerts)."
+
+    # Deliveries run in the background; after a short grace period anything
+    # unconfirmed is left in the on-disk queue for the next run.
+    batch = notifier.notify(notify_text, pin=pin, url=github_pages_url)
+    # Every delivery is on the on-disk queue now: the events will not be lost
+    alerts.engine().commit(alert_snapshot)
+    summary = batch.wait(timeout=config.NOTIFY_GRACE_SECONDS)
+    retry_batch.wait(timeout=0)
+    return summary
+
+
+def build_stages():
+    """
+    The weekly run as a DAG of stages.
+    """
+    timeouts = config.STAGE_TIMEOUTS
+    S = pipeline.Stage
+    return [
+        S("drain_notifications", drain_notifications, [], ["retry_batch"], cache=False),
+        S("fetch_sectors", fetch_sectors, [], ["sector_data"], timeouts.get("fetch_sectors")),
+        S("rank", rank, ["sector_data"], ["returns", "ranked_sectors"]),
+        S("rrg", rotation, ["sector_data"], ["rrg"]),
+        S("fetch_etf_holdings", fetch_etf_holdings, [], ["all_holdings"], timeouts.get("fetch_etf_holdings")),
+        S("fetch_top_sector_stocks", fetch_top_sector_stocks, ["ranked_sectors", "all_holdings"], ["stock_data"],
+          timeouts.get("fetch_top_sector_stocks")),
+        S("screen", screen, ["stock_data", "returns"], ["sector_results"]),
+        S("portfolio", size_positions, ["stock_data", "ranked_sectors", "sector_results"], ["portfolio"]),
+        S("build_report", build_report, ["ranked_sectors", "sector_results", "rrg", "portfolio"],
+          ["model", "full_report"]),
+        S("alerts", detect_alerts, ["model", "full_report"], ["alert_events", "notify_text", "alert_snapshot"]),
+        S("archive", archive_run, ["model"], ["history", "persistent"]),
+        S("pages", write_detail_pages, ["model", "all_holdings", "history", "persistent"],
+          ["page_summary", "page_files", "page_keys", "stock_pages"], timeouts.get("pages")),
+        S("index", write_index, ["model", "full_report", "page_keys", "stock_pages"], ["pin", "index_files"]),
+        S("site", finalize_site, ["page_files", "index_files"], ["site_changes"]),
+        S("deploy", deploy, ["pin", "site_changes"], ["deployed"], timeouts.get("deploy")),
+        S("notify", notify, ["notify_text", "pin", "deployed", "retry_batch", "alert_snapshot"], ["notify_summary"],
+          timeouts.get("notify")),
+    ]
+
+
+# Subcommands and the stages each one runs. Inputs a command does not produce itself
+# are read from the saved outputs of the previous commands (STAGE_CACHE_DIR), so e.g.
+# `render` and `notify` never touch the network.
+COMMANDS = {
+    "fetch": ["fetch_sectors", "rank", "fetch_etf_holdings", "fetch_top_sector_stocks"],
+    "analyze": ["rank", "rrg", "screen", "portfolio", "build_report", "alerts", "archive"],
+    "render": ["pages", "index", "site"],
+    "deploy": ["deploy"],
+    "notify": ["drain_notifications", "notify"],
+    "run": None,  # everything
+    # Long-running: re-fetch and re-analyze every --interval seconds, send only the alert
+    # events, and retry queued notifications (no pages, archive or deploy)
+    "watch": ["drain_notifications", "fetch_sectors", "rank", "rrg", "fetch_etf_holdings", "fetch_top_sector_stocks",
+              "screen", "portfolio", "build_report", "alerts", "notify"],
+}
+
+COMMAND_HELP = {
+    "fetch": "Download sector prices, ETF holdings and top-sector stock prices",
+    "analyze": "Rank sectors, screen and size stocks, build/export the report, detect alerts and archive it (no network)",
+    "render": f"Build {config.SITE_DIR}/ (index.html, pages, hashed data, manifest) from the analyzed report (no network)",
+    "deploy": "Commit and push the rendered pages (local mode only)",
+    "notify": "Send the rendered report to the configured notification sinks",
+    "run": "Full weekly run (default)",
+    "watch": "Poll the market and send only change alerts until interrupted",
+}
+
+# Inputs that may be missing when a command runs on its own
+OPTIONAL_INPUTS = {"deployed": "skipped", "alert_snapshot": None}
+
+
+def parse_args(argv):
+    profile = argparse.ArgumentParser(add_help=False)
+    profile.add_argument("--profile", action="store_true",
+                         help=f"Write cProfile stats of every stage to {config.PROFILE_PATH}")
+
+    parser = argparse.ArgumentParser(description="Weekly Sector Rotation Monitor")
+    sub = parser.add_subparsers(dest="command")
+    for name in COMMANDS:
+        p = sub.add_parser(name, parents=[profile], help=COMMAND_HELP[name])
+        if name == "run":
+            p.add_argument("--resume", action="store_true",
+                           help="Reuse the cached outputs of stages that finished in the previous run")
+        if name == "watch":
+            p.add_argument("--interval", type=float, default=config.WATCH_INTERVAL_SECONDS,
+                           help="Seconds between polls")
+            p.add_argument("--iterations", type=int, help="Stop after this many polls (default: run until interrupted)")
+
+    # `python main.py [--resume] [--profile]` is a full run
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+        argv.insert(0, "run")
+    return parser.parse_args(argv)
+
+
+def watch(stages, interval, iterations=None):
+    """
+    Runs the watch stages every `interval` seconds. The alert engine keeps the last
+    snapshot in memory between polls, so each poll only diffs what changed.
+    """
+    tick = 0
+    while iterations is None or tick < iterations:
+        tick += 1
+        started = time.monotonic()
+        print(f"\n[watch] Poll {tick} at {time.strftime('%Y-%m-%d %H:%M:%S')}")
+        instrumentation.reset()
+        try:
+            # No new pages in watch mode, so no PIN; nothing is cached for --resume
+            pipeline.run_stages(stages, initial={"pin": None, "deployed": "skipped"},
+                                hooks=[instrumentation.StageMetrics()])
+        except Exception as e:
+            print(f"[watch] Poll failed: {e}")
+        if iterations is None or tick < iterations:
+            time.sleep(max(0, interval - (time.monotonic() - started)))
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    resume = getattr(args, "resume", False)
+
+    stages = build_stages()
+    initial = {}
+    if args.command == "watch":
+        selected = COMMANDS["watch"]
+        try:
+            watch([stage for stage in stages if stage.name in selected], args.interval, args.iterations)
+        except KeyboardInterrupt:
+            print("\n[watch] Stopped.")
+        return
+    if args.command == "run":
+        if not resume:
+            pipeline.clear_cache(STAGE_CACHE_DIR)
+    else:
+        selected = COMMANDS[args.command]
+        initial, missing = pipeline.cached_inputs(stages, selected, STAGE_CACHE_DIR)
+        for name in list(missing):
+            if name in OPTIONAL_INPUTS:
+                initial[name] = OPTIONAL_INPUTS[name]
+                del missing[name]
+        if missing:
+            needed = ", ".join(f"{name} (from stage {stage})" for name, stage in missing.items())
+            print(f"No saved outputs for: {needed}. Run the earlier commands (or `python main.py run`) first.")
+            sys.exit(1)
+        stages = [stage for stage in stages if stage.name in selected]
+
+    instrumentation.reset()
+    profiler = None
+    if args.profile:
+        profiler = instrumentation.Profiler()
+        for stage in stages:
+            stage.func = profiler.wrap(stage.func)
+
+    try:
+        # Under --profile stages run one at a time: one cProfile per process
+        pipeline.run_stages(stages, initial=initial, cache_dir=STAGE_CACHE_DIR, resume=resume,
+                            hooks=[instrumentation.StageMetrics()], serial=profiler is not None)
+    except pipeline.PipelineError as e:
+        print(f"An error occurred: {e}")
+        if args.command == "run":
+            print("Fix the problem and re-run with --resume to continue from the finished stages.")
+        sys.exit(1)
     except Exception as e:
         print(f"An error occurred: {e}")
         import traceback
         traceback.print_exc()
+        sys.exit(1)
+    finally:
+        try:
+            instrumentation.write_run_report()
+        except Exception as e:
+            print(f"Failed to write run metrics: {e}")
+        if profiler:
+            profiler.save(config.PROFILE_PATH)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,291 @@
+"""
+Memoization of analyzer results, keyed by a content hash of the inputs.
+
+    @memo.memoize(settings=("PERIODS",))
+    def calculate_returns(data): ...
+
+The key is a blake2b digest of the function's name, the source of its module (and of
+the `modules` it depends on), the config `settings` it reads and the input values
+themselves: the raw bytes of every DataFrame / Series / ndarray plus its index and
+columns. Changed prices, parameters, settings or code give a different key, so a
+result is never served for inputs it was not computed from.
+
+Results are kept in two tiers, each bounded in (pickled) size and evicted least
+recently used first:
+  - memory: config.MEMO_MAX_MB per process
+  - disk:   config.MEMO_DIR (pickles), shared by processes and runs, config.MEMO_DISK_MAX_MB
+Every hit returns a fresh copy, so callers may modify what they get (the screens add
+fields to check_technical_setup's dict). Set config.MEMO_ENABLED = False to bypass.
+"""
+import collections
+import copy
+import functools
+import hashlib
+import importlib.util
+import os
+import pickle
+import threading
+
+import numpy as np
+import pandas as pd
+
+import config
+import instrumentation
+
+_MISS = object()
+_PLAIN = {str, int, float, bool, bytes}
+
+
+def _feed(h, value):
+    # Type tags keep e.g. 1, 1.0, "1" and [1] apart
+    if value is None or type(value) in _PLAIN:
+        h.update(f"{type(value).__name__}:{value!r}".encode())
+    elif isinstance(value, pd.DataFrame):
+        h.update(b"DataFrame")
+        _feed(h, value.columns)
+        _feed(h, value.index)
+        # One block for numeric frames (ints and floats of equal value hash alike, which
+        # is fine for prices); one array per column when that would mean Python objects
+        values = value.to_numpy()
+        if values.dtype.hasobject:
+            values = [column.to_numpy() for _, column in value.items()]
+        _feed(h, values)
+    elif isinstance(value, pd.Series):
+        h.update(b"Series")
+        _feed(h, value.name)
+        _feed(h, value.index)
+        _feed(h, value.to_numpy())
+    elif isinstance(value, pd.DatetimeIndex):
+        h.update(f"DatetimeIndex{value.dtype}".encode())
+        _feed(h, value.names)
+        _feed(h, value.asi8)
+    elif isinstance(value, pd.Index):
+        h.update(f"Index{value.dtype}".encode())
+        _feed(h, value.names)
+        # Labels (tickers, field names) as one string, not element by element
+        h.update(repr(value.tolist()).encode())
+    elif isinstance(value, np.ndarray):
+        h.update(f"ndarray{value.dtype.str}{value.shape}".encode())
+        if value.dtype.hasobject:
+            h.update(repr(value.tolist()).encode())
+        else:
+            h.update(np.ascontiguousarray(value).reshape(-1).view(np.uint8))  # datetimes too, no copy
+    elif isinstance(value, dict):
+        h.update(f"dict{len(value)}".encode())
+        for k, v in value.items():
+            _feed(h, k)
+            _feed(h, v)
+    elif isinstance(value, (list, tuple)):
+        h.update(f"{type(value).__name__}{len(value)}".encode())
+        for v in value:
+            _feed(h, v)
+    else:
+        # Scalars (numpy ones included). Anything else falls back to its repr: one that
+        # holds an id() only ever misses, it never hits wrongly.
+        h.update(f"{type(value).__name__}:{value!r}".encode())
+
+
+def content_hash(*values):
+    """
+    Hex blake2b digest of the values (DataFrames, arrays, scalars, nested lists / dicts).
+    """
+    h = hashlib.blake2b(digest_size=20)
+    for value in values:
+        _feed(h, value)
+    return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _source_hash(module_names):
+    # Editing the code of a memoized function (or of what it calls) starts a new set of keys.
+    # Modules are located by name whether or not they are imported yet (analyzer imports
+    # vcp lazily): leaving one out would let the disk tier serve results of its old code.
+    h = hashlib.blake2b(digest_size=20)
+    for name in module_names:
+        spec = importlib.util.find_spec(name)
+        if spec is None or not spec.origin or not os.path.isfile(spec.origin):
+            raise ModuleNotFoundError(f"memo: cannot find the source of module {name!r} to key its results",
+                                      name=name)
+        h.update(name.encode())
+        with open(spec.origin, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+class Memo:
+    """
+    Two-tier (memory, then disk) store of results, keyed by content_hash.
+    disk_dir=None keeps it in memory only.
+    """
+    def __init__(self, max_mb=None, disk_dir=None, disk_max_mb=None):
+        self.max_bytes = (max_mb if max_mb is not None else config.MEMO_MAX_MB) * 1024 * 1024
+        self.disk_dir = disk_dir
+        self.disk_max_bytes = (disk_max_mb if disk_max_mb is not None else config.MEMO_DISK_MAX_MB) * 1024 * 1024
+        self._memory = collections.OrderedDict()
+        self._memory_bytes = 0
+        self._disk_bytes = None  # counted on first write
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "disk_evictions": 0}
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """
+        The stored value (a fresh copy), or memo._MISS.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats["hits"] += 1
+        if entry is not None:
+            instrumentation.count("memo_hits")
+            # deepcopy is much cheaper than unpickling for DataFrames
+            return copy.deepcopy(entry[0])
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "rb") as f:
+                    blob = f.read()
+                os.utime(self._disk_path(key))  # mtime = last use, for eviction
+                value = pickle.loads(blob)
+            except (OSError, EOFError, pickle.UnpicklingError):
+                value = _MISS
+            if value is not _MISS:
+                self._remember(key, copy.deepcopy(value), len(blob))
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                instrumentation.count("memo_disk_hits")
+                return value
+
+        with self._lock:
+            self.stats["misses"] += 1
+        instrumentation.count("memo_misses")
+        return _MISS
+
+    def put(self, key, value):
+        try:
+            blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception:
+            return  # not picklable: just not cached
+        # A copy: the caller is free to modify the value it returns
+        self._remember(key, copy.deepcopy(value), len(blob))
+        if self.disk_dir:
+            self._write_disk(key, blob)
+
+    def _remember(self, key, value, size):
+        # size: the pickled size, as an estimate of the memory the value holds
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= old[1]
+            self._memory[key] = (value, size)
+            self._memory_bytes += size
+            while self._memory_bytes > self.max_bytes:
+                _, (_, evicted) = self._memory.popitem(last=False)
+                self._memory_bytes -= evicted
+                self.stats["evictions"] += 1
+
+    def _write_disk(self, key, blob):
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            tmp_path = f"{self._disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(blob)
+            os.replace(tmp_path, self._disk_path(key))
+        except OSError as e:
+            print(f"Memo: could not write {key} to {self.disk_dir}: {e}")
+            return
+        with self._lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_entries())
+            else:
+                self._disk_bytes += len(blob)
+            full = self._disk_bytes > self.disk_max_bytes
+        if full:
+            self._evict_disk()
+
+    def _disk_entries(self):
+        entries = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.name.endswith(".pkl"):
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, entry.path))
+        return entries
+
+    def _evict_disk(self):
+        # Down to 80% of the bound, so eviction (a directory scan) runs once in a while,
+        # not on every write. Other processes may be evicting too: missing files are fine.
+        entries = sorted(self._disk_entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.disk_max_bytes * 0.8
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_bytes = total
+            self.stats["disk_evictions"] += evicted
+
+    def clear(self, disk=True):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        if disk and self.disk_dir and os.path.isdir(self.disk_dir):
+            for _, _, path in self._disk_entries():
+                os.remove(path)
+            self._disk_bytes = 0
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default():
+    """
+    The process-wide Memo the decorated functions use (config.MEMO_DIR on disk).
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Memo(disk_dir=config.MEMO_DIR)
+        return _default
+
+
+def memoize(func=None, settings=(), modules=(), key=None):
+    """
+    Caches func's results in default(), keyed by content_hash of:
+      - func's name and the source of its module plus `modules` (names, e.g. "vcp")
+      - the current values of the config `settings` it reads (names, e.g. "PERIODS")
+      - key(*args, **kwargs) if given (e.g. only the part of a frame func reads), else the arguments
+    """
+    if func is None:
+        return functools.partial(memoize, settings=settings, modules=modules, key=key)
+    name = f"{func.__module__}.{func.__qualname__}"
+    module_names = (func.__module__,) + tuple(modules)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not config.MEMO_ENABLED:
+            return func(*args, **kwargs)
+        inputs = key(*args, **kwargs) if key else (args, sorted(kwargs.items()))
+        digest = content_hash(name, _source_hash(module_names), [getattr(config, s) for s in settings], inputs)
+        memo = default()
+        value = memo.get(digest)
+        if value is _MISS:
+            value = func(*args, **kwargs)
+            memo.put(digest, value)
+        return value
+    return wrapper
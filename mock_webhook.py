@@ -0,0 +1,185 @@
+"""
+Local stand-in for a Discord (or generic) webhook, for testing notifications offline.
+
+    python mock_webhook.py --port 8765 --bucket-size 5 --reset-after 2
+
+then point DISCORD_WEBHOOK_URL at http://127.0.0.1:8765/webhook. It can also be
+started in-process:
+
+    with MockWebhookServer(bucket_size=5) as server:
+        notifier.send_discord_report(text, webhook_url=server.url)
+        server.messages   # received messages, in arrival order
+"""
+import argparse
+import email.parser
+import email.policy
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def _parse_multipart(content_type, body):
+    """
+    Parses a multipart/form-data body into (payload_json dict, {filename: text}).
+    """
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode() + body
+    )
+    payload, files = {}, {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        data = part.get_payload(decode=True) or b""
+        if name == "payload_json":
+            payload = json.loads(data.decode("utf-8"))
+        else:
+            files[part.get_filename() or name] = data.decode("utf-8", errors="replace")
+    return payload, files
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _reply(self, status, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+
+        with server.lock:
+            server.requests += 1
+            now = time.monotonic()
+            if now >= server.window_reset:
+                server.window_reset = now + server.reset_after
+                server.window_used = 0
+
+            # Injected failures come first (e.g. fail_with=[429, 503])
+            if server.fail_with:
+                status = server.fail_with.pop(0)
+                if status == 429:
+                    self._reply(429, {"message": "You are being rate limited.", "retry_after": server.reset_after,
+                                      "global": False}, {"Retry-After": str(server.reset_after)})
+                else:
+                    self._reply(status, {"message": "Injected failure"})
+                return
+
+            if server.bucket_size and server.window_used >= server.bucket_size:
+                retry_after = round(server.window_reset - now, 3)
+                server.rate_limited += 1
+                self._reply(429, {"message": "You are being rate limited.", "retry_after": retry_after,
+                                  "global": False}, {"Retry-After": str(retry_after)})
+                return
+            server.window_used += 1
+
+            content_type = self.headers.get("Content-Type", "")
+            if content_type.startswith("multipart/form-data"):
+                payload, files = _parse_multipart(content_type, body)
+            else:
+                payload, files = json.loads(body.decode("utf-8") or "{}"), {}
+
+            message_id = str(next(server.ids))
+            server.messages.append({"id": message_id, "path": self.path, "payload": payload, "files": files})
+
+            headers = {}
+            if server.bucket_size:
+                headers = {
+                    "X-RateLimit-Limit": str(server.bucket_size),
+                    "X-RateLimit-Remaining": str(server.bucket_size - server.window_used),
+                    "X-RateLimit-Reset-After": f"{max(server.window_reset - now, 0):.3f}",
+                    "X-RateLimit-Bucket": "mock",
+                }
+
+        if server.delay:
+            time.sleep(server.delay)
+        if "wait=true" in self.path:
+            self._reply(200, {"id": message_id, "content": payload.get("content")}, headers)
+        else:
+            self._reply(204, None, headers)
+
+
+class MockWebhookServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server that records every webhook POST.
+
+    bucket_size / reset_after: rate limit window (requests allowed per window), 0 disables it.
+    fail_with: list of status codes returned for the first requests (e.g. [429, 503]).
+    delay: seconds to sleep before answering (to simulate a slow endpoint).
+    """
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, bucket_size=0, reset_after=1.0, fail_with=None,
+                 delay=0.0, verbose=False):
+        super().__init__((host, port), _Handler)
+        self.bucket_size = bucket_size
+        self.reset_after = reset_after
+        self.fail_with = list(fail_with or [])
+        self.delay = delay
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.messages = []
+        self.ids = itertools.count(1)
+        self.requests = 0
+        self.connections = 0
+        self.rate_limited = 0
+        self.window_reset = 0.0
+        self.window_used = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/webhook"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local mock webhook server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--bucket-size", type=int, default=5, help="Requests per rate limit window (0 = unlimited)")
+    parser.add_argument("--reset-after", type=float, default=2.0, help="Rate limit window in seconds")
+    args = parser.parse_args()
+
+    server = MockWebhookServer(args.host, args.port, args.bucket_size, args.reset_after, verbose=True)
+    print(f"Mock webhook listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Received {len(server.messages)} messages over {server.connections} connections "
+              f"({server.rate_limited} rate limited).")
+        server.server_close()
@@ -1,59 +1,493 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+import hashlib
 import json
+import math
+import os
+import threading
+import time
 import config
-import sys
+import notify_queue
+import instrumentation
 
-def send_discord_report(report_text, pin=None, url=None):
+# Discord limits (https://discord.com/developers/docs/resources/message)
+CONTENT_LIMIT = 2000
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBEDS_PER_MESSAGE = 10
+EMBED_TOTAL_LIMIT = 6000
+
+# Room for the ```text fences around each code block
+CODE_BLOCK_OVERHEAD = len("```text\n\n```")
+
+# Status codes that mean the message was not created, so retrying cannot duplicate it
+RETRY_STATUS = {429, 502, 503, 504}
+
+
+def _never_sent(error):
+    """
+    True if a requests ConnectionError happened before the request reached the server
+    (connect timeout, refused connection, DNS failure).
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _number(value):
+    """
+    value as a finite, non-negative float, or None if it is missing or not a number.
+    """
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) and number >= 0 else None
+
+
+class DiscordDeliveryError(Exception):
+    """
+    Raised when a message could not be delivered. `delivered` is the number of
+    messages (in order) that did arrive before the failure.
+    """
+    def __init__(self, message, delivered=0):
+        super().__init__(message)
+        self.delivered = delivered
+
+
+class DiscordWebhookClient:
+    """
+    Sends messages to one Discord webhook over a single pooled keep-alive session.
+
+    Follows the X-RateLimit-* headers (waits for the bucket to reset instead of
+    hitting 429s) and honours `retry_after` when a 429 does happen. Messages are
+    sent one at a time with ?wait=true so each is confirmed before the next,
+    which keeps them in order.
+
+    Only failures where Discord did not create the message (429, 502-504,
+    connect errors) are retried. A read timeout after the request was sent is
+    reported instead of retried, because the message may already be posted.
+    """
+
+    def __init__(self, webhook_url, session=None, max_retries=5, timeout=(5, 30)):
+        self.webhook_url = webhook_url
+        self.max_retries = max_retries
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=2))
+        self.session = session
+        # Rate limit bucket state from the last response
+        self._remaining = None
+        self._reset_at = 0.0
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _wait_for_bucket(self):
+        if self._remaining == 0:
+            delay = self._reset_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _update_bucket(self, headers):
+        # A malformed header (e.g. from a proxy) leaves the bucket state as it was
+        remaining = _number(headers.get("X-RateLimit-Remaining"))
+        reset_after = _number(headers.get("X-RateLimit-Reset-After"))
+        if remaining is not None:
+            self._remaining = int(remaining)
+        if reset_after is not None:
+            self._reset_at = time.monotonic() + reset_after
+
+    @staticmethod
+    def _retry_after(response):
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        delay = _number(body.get("retry_after")) if isinstance(body, dict) else None
+        if delay is None:
+            delay = _number(response.headers.get("Retry-After"))
+        return delay if delay is not None else 1.0
+
+    @instrumentation.timed_call(name="notifier.discord_send")
+    def send(self, payload, files=None):
+        """
+        Sends one message and returns Discord's message object (dict).
+        payload is the JSON body; files is an optional {filename: text} mapping sent as attachments.
+        """
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                instrumentation.count("retries")
+            self._wait_for_bucket()
+            try:
+                if files:
+                    multipart = {"payload_json": (None, json.dumps(payload), "application/json")}
+                    for i, (name, text) in enumerate(files.items()):
+                        multipart[f"files[{i}]"] = (name, text.encode("utf-8"), "text/plain")
+                    response = self.session.post(self.webhook_url, params={"wait": "true"},
+                                                 files=multipart, timeout=self.timeout)
+                else:
+                    response = self.session.post(self.webhook_url, params={"wait": "true"},
+                                                 json=payload, timeout=self.timeout)
+            except requests.exceptions.ConnectionError as e:
+                if not _never_sent(e) or attempt == self.max_retries:
+                    raise
+                delay = min(2 ** attempt, 30)
+                print(f"Could not connect to Discord ({e}). Retrying in {delay}s...")
+                time.sleep(delay)
+                continue
+
+            self._update_bucket(response.headers)
+
+            if response.status_code == 429:
+                delay = self._retry_after(response)
+                print(f"Discord rate limited. Retrying after {delay:.2f}s...")
+                time.sleep(delay)
+                continue
+            if response.status_code in RETRY_STATUS:
+                delay = min(2 ** attempt, 30)
+                print(f"Discord returned {response.status_code}. Retrying in {delay}s...")
+                time.sleep(delay)
+                continue
+
+            response.raise_for_status()
+            try:
+                return response.json()
+            except ValueError:
+                return {}
+
+        raise DiscordDeliveryError(f"Gave up after {self.max_retries + 1} attempts")
+
+    def send_all(self, messages):
+        """
+        Sends (payload, files) messages in order, stopping at the first failure.
+        Returns the list of message objects; raises DiscordDeliveryError on failure.
+        """
+        sent = []
+        for payload, files in messages:
+            try:
+                sent.append(self.send(payload, files))
+            except DiscordDeliveryError as e:
+                raise DiscordDeliveryError(str(e), delivered=len(sent))
+            except requests.exceptions.RequestException as e:
+                raise DiscordDeliveryError(f"{type(e).__name__}: {e}", delivered=len(sent))
+        return sent
+
+
+def split_lines(text, limit):
+    """
+    Splits text into chunks of at most `limit` characters, preferring newline boundaries.
+    """
+    chunks = []
+    while len(text) > limit:
+        split_idx = text.rfind('\n', 0, limit)
+        if split_idx <= 0:
+            split_idx = limit
+        chunks.append(text[:split_idx])
+        text = text[split_idx:].lstrip('\n')
+    chunks.append(text)
+    return chunks
+
+
+def build_header(pin=None, url=None):
+    """
+    Builds the raw-text header with the report link and PIN (raw text keeps the link clickable).
+    """
+    if not (pin and url):
+        return ""
+    header_content = "🔒 **Weekly Report Updated!**\n"
+    header_content += f"🔗 **Link:** {url}\n"
+    header_content += f"🔑 **PIN:** `{pin}`\n"
+    header_content += "----------------------------------------\n"
+    return header_content
+
+
+def pack_report(report_text, header=""):
+    """
+    Packs the header and report into as few webhook messages as possible.
+    Returns a list of (payload, files) tuples:
+    1. Header + code block in one plain message when it fits in 2000 characters.
+    2. Otherwise one message with the report split across code-block embeds (up to 6000 characters).
+    3. Otherwise one message with the full report attached as report.txt and the start of it as a preview embed.
+    """
+    block = f"```text\n{report_text}\n```"
+    if len(header) + len(block) <= CONTENT_LIMIT:
+        return [({"content": header + block}, None)]
+
+    chunks = split_lines(report_text, EMBED_DESCRIPTION_LIMIT - CODE_BLOCK_OVERHEAD)
+    total = sum(len(c) + CODE_BLOCK_OVERHEAD for c in chunks)
+    if len(chunks) <= EMBEDS_PER_MESSAGE and total <= EMBED_TOTAL_LIMIT:
+        embeds = [{"description": f"```text\n{c}\n```"} for c in chunks]
+        return [({"content": header or None, "embeds": embeds}, None)]
+
+    # Long tables: attach the whole report and preview the beginning
+    preview = split_lines(report_text, EMBED_DESCRIPTION_LIMIT - CODE_BLOCK_OVERHEAD)[0]
+    payload = {
+        "content": (header + "📎 完整報告見附件 (Full report attached)")[:CONTENT_LIMIT],
+        "embeds": [{"description": f"```text\n{preview}\n```"}],
+    }
+    return [(payload, {"report.txt": report_text})]
+
+
+def send_discord_report(report_text, pin=None, url=None, webhook_url=None, client=None):
     """
     Sends the provided report text to the configured Discord Webhook.
     If pin and url are provided, adds a header with the link and PIN.
+    Returns True if every message was delivered.
     """
-    if not config.DISCORD_WEBHOOK_URL:
+    webhook_url = webhook_url or config.DISCORD_WEBHOOK_URL
+    if not webhook_url:
         print("Discord Webhook URL not configured. Skipping notification.")
+        return False
+
+    messages = pack_report(report_text, build_header(pin, url))
+    print(f"Sending report to Discord ({len(messages)} message(s))...")
+
+    own_client = client is None
+    client = client or DiscordWebhookClient(webhook_url)
+    try:
+        client.send_all(messages)
+        return True
+    except DiscordDeliveryError as e:
+        print(f"Failed to send Discord report ({e.delivered}/{len(messages)} messages delivered): {e}")
+        return False
+    finally:
+        if own_client:
+            client.close()
+
+
+# --- Multi-sink fan-out ---
+#
+# A notification is {'report_text', 'sealed_pin', 'nonce', 'url'}. Each configured sink
+# gets its own queue entry (notify_queue) and is delivered on a background thread, so a
+# slow or failing endpoint never holds up the run; whatever is not confirmed stays queued
+# and is retried with backoff by the next run (or the next `main.py watch` poll).
+# A newer report supersedes the queued ones: their PIN no longer opens the site.
+
+def configured_sinks():
+    """
+    Returns the enabled sinks as {name: spec}, built from config / environment variables.
+    """
+    sinks = {}
+    if config.DISCORD_WEBHOOK_URL:
+        sinks["discord"] = {"type": "discord", "url": config.DISCORD_WEBHOOK_URL}
+    if config.SLACK_WEBHOOK_URL:
+        sinks["slack"] = {"type": "webhook", "url": config.SLACK_WEBHOOK_URL}
+    for i, hook_url in enumerate(config.NOTIFY_WEBHOOK_URLS, start=1):
+        sinks[f"webhook-{i}"] = {"type": "webhook", "url": hook_url}
+    if config.SMTP_HOST and config.NOTIFY_EMAIL_TO:
+        sinks["email"] = {"type": "email"}
+    if config.NOTIFY_FILE:
+        sinks["file"] = {"type": "file", "path": config.NOTIFY_FILE}
+    return sinks
+
+
+def _sink_secret(spec):
+    # What only the holder of the sink's configuration knows
+    if spec["type"] == "email":
+        return f"{config.SMTP_HOST}:{config.SMTP_USER}:{config.SMTP_PASSWORD}:{config.NOTIFY_EMAIL_TO}"
+    return spec.get("url") or spec.get("path") or ""
+
+
+def _pin_pad(spec, nonce, length):
+    return hashlib.shake_256(f"{nonce}:{_sink_secret(spec)}".encode("utf-8")).digest(length)
+
+
+def seal_pin(spec, pin, nonce):
+    """
+    The PIN XORed with a pad derived from the sink's credentials (never stored in the
+    queue) and a per-notification nonce, as hex; None without a PIN.
+    """
+    if not pin:
+        return None
+    data = str(pin).encode("utf-8")
+    return bytes(a ^ b for a, b in zip(data, _pin_pad(spec, nonce, len(data)))).hex()
+
+
+def _pin(spec, notification):
+    sealed = notification.get("sealed_pin")
+    if not sealed:
+        return None
+    data = bytes.fromhex(sealed)
+    return bytes(a ^ b for a, b in zip(data, _pin_pad(spec, notification["nonce"], len(data)))).decode("utf-8", "replace")
+
+
+def _header(spec, notification):
+    return build_header(_pin(spec, notification), notification["url"])
+
+
+def _deliver_discord(spec, entry):
+    notification = entry["notification"]
+    messages = pack_report(notification["report_text"], _header(spec, notification))
+    with DiscordWebhookClient(spec["url"]) as client:
+        # Resume after the messages an earlier attempt already delivered
+        for payload, files in messages[entry["progress"]:]:
+            client.send(payload, files)
+            entry["progress"] += 1
+            notify_queue.update(entry)
+
+
+def _deliver_webhook(spec, entry):
+    # Generic JSON webhook; {"text": ...} is what Slack incoming webhooks expect
+    notification = entry["notification"]
+    text = _header(spec, notification) + f"```{notification['report_text']}```"
+    requests.post(spec["url"], json={"text": text}, timeout=(5, 30)).raise_for_status()
+
+
+def _deliver_email(spec, entry):
+    import smtplib
+    from email.message import EmailMessage
+
+    notification = entry["notification"]
+    msg = EmailMessage()
+    msg["Subject"] = f"每週板塊輪動監測 {time.strftime('%Y-%m-%d')}"
+    msg["From"] = config.SMTP_FROM or config.SMTP_USER
+    msg["To"] = config.NOTIFY_EMAIL_TO
+    msg.set_content(_header(spec, notification) + notification["report_text"])
+
+    with smtplib.SMTP(config.SMTP_HOST, config.SMTP_PORT, timeout=30) as smtp:
+        smtp.starttls()
+        if config.SMTP_USER:
+            smtp.login(config.SMTP_USER, config.SMTP_PASSWORD)
+        smtp.send_message(msg)
+
+
+def _deliver_file(spec, entry):
+    notification = entry["notification"]
+    with open(spec["path"], "a", encoding="utf-8") as f:
+        f.write(f"\n===== {time.strftime('%Y-%m-%d %H:%M:%S')} =====\n")
+        f.write(_header(spec, notification))
+        f.write(notification["report_text"] + "\n")
+
+
+SINK_HANDLERS = {
+    "discord": _deliver_discord,
+    "webhook": _deliver_webhook,
+    "email": _deliver_email,
+    "file": _deliver_file,
+}
+
+
+def _attempt(entry, sinks, results):
+    entry = notify_queue.claim(entry)
+    if entry is None:
         return
+    try:
+        spec = sinks.get(entry["sink"])
+        if spec is None:
+            raise ValueError(f"Sink '{entry['sink']}' is no longer configured")
+        SINK_HANDLERS[spec["type"]](spec, entry)
+        notify_queue.remove(entry)
+        results[entry["id"]] = "delivered"
+    except Exception as e:
+        notify_queue.record_failure(entry, f"{type(e).__name__}: {e}")
+        results[entry["id"]] = f"failed: {e}"
+    finally:
+        notify_queue.release(entry)
 
-    url_webhook = config.DISCORD_WEBHOOK_URL
-    
-    
-    headers = {
-        "Content-Type": "application/json"
-    }
 
-    # 1. Send Header (if exists) - Raw Text for Clickable Links
-    if pin and url:
-        header_content = f"🔒 **Weekly Report Updated!**\n"
-        header_content += f"🔗 **Link:** {url}\n"
-        header_content += f"🔑 **PIN:** `{pin}`\n"
-        header_content += "----------------------------------------\n"
-        
-        try:
-            requests.post(url_webhook, json={"content": header_content}, headers=headers).raise_for_status()
-        except Exception as e:
-            print(f"Failed to send Discord header: {e}")
+class NotificationBatch:
+    """
+    Handle on deliveries running in the background. wait() blocks for at most
+    `timeout` seconds; anything still in flight stays in the on-disk queue.
+    """
+    def __init__(self, entries, threads, results):
+        self.entries = entries
+        self.threads = threads
+        self.results = results
 
-    # 2. Send Report - Code Block for Monospaced Formatting
-    # Discord limit is 2000, we'll slice securely
-    chunks = []
-    
-    while len(report_text) > 1900: # Leave some buffer
-        # Find a good split point (newline)
-        split_idx = report_text.rfind('\n', 0, 1900)
-        if split_idx == -1:
-            split_idx = 1900
-            
-        chunks.append(report_text[:split_idx])
-        report_text = report_text[split_idx:]
-    chunks.append(report_text)
-    
-    print(f"Sending report body to Discord ({len(chunks)} chunks)...")
-    
-    for chunk in chunks:
-        payload = {
-            "content": f"```text\n{chunk}\n```"
-        }
-        
-        try:
-            response = requests.post(url_webhook, json=payload, headers=headers)
-            response.raise_for_status()
-        except Exception as e:
-            print(f"Failed to send Discord notification chunk: {e}")
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for t in self.threads:
+            t.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        summary = {"delivered": [], "failed": [], "pending": []}
+        for entry in self.entries:
+            label = f"{entry['sink']} ({entry['id']})"
+            status = self.results.get(entry["id"])
+            if status == "delivered":
+                summary["delivered"].append(label)
+            elif status:
+                summary["failed"].append(label)
+            else:
+                summary["pending"].append(label)
+        if self.entries:
+            print(f"Notifications: {len(summary['delivered'])} delivered, {len(summary['failed'])} failed (queued for retry), "
+                  f"{len(summary['pending'])} still sending (queued if interrupted).")
+        return summary
+
+
+def _start(entries, sinks):
+    results = {}
+    threads = []
+    for entry in entries:
+        # Daemon threads: the process may exit while a slow endpoint is still sending
+        t = threading.Thread(target=_attempt, args=(entry, sinks, results), daemon=True)
+        t.start()
+        threads.append(t)
+    return NotificationBatch(entries, threads, results)
+
+
+def _is_report(entry):
+    return bool(entry["notification"].get("sealed_pin"))
+
+
+def drop_superseded():
+    """
+    Removes the queued reports (link + PIN) of each sink older than its newest one.
+    Returns how many were dropped.
+    """
+    newest = {}
+    for entry in notify_queue.entries():
+        if _is_report(entry):
+            newest[entry["sink"]] = max(newest.get(entry["sink"], ()), (entry["created_at"], entry["id"]))
+    dropped = 0
+    for entry in notify_queue.entries():
+        if _is_report(entry) and (entry["created_at"], entry["id"]) < newest[entry["sink"]]:
+            # A delivery already in flight finds it gone when it saves its progress
+            notify_queue.remove(entry)
+            dropped += 1
+    if dropped:
+        print(f"Dropped {dropped} queued notification(s) superseded by a newer report.")
+    return dropped
+
+
+def drain_queue():
+    """
+    Retries every queued delivery whose backoff has expired (superseded reports are
+    dropped, not resent). Returns a NotificationBatch.
+    """
+    drop_superseded()
+    entries = notify_queue.due_entries()
+    if entries:
+        print(f"Retrying {len(entries)} queued notification(s)...")
+    return _start(entries, configured_sinks())
+
+
+def notify(report_text, pin=None, url=None, sinks=None):
+    """
+    Fans the report out to every configured sink concurrently and returns at once
+    with a NotificationBatch. Each delivery is queued on disk first, so failures and
+    interrupted sends are retried later by drain_queue().
+    """
+    sinks = sinks if sinks is not None else configured_sinks()
+    if not sinks:
+        print("No notification sinks configured. Skipping notification.")
+        return NotificationBatch([], [], {})
+
+    nonce = os.urandom(16).hex()
+    entries = [notify_queue.enqueue(name, {"report_text": report_text, "sealed_pin": seal_pin(spec, pin, nonce),
+                                           "nonce": nonce, "url": url})
+               for name, spec in sinks.items()]
+    if pin:
+        drop_superseded()
+    print(f"Sending report to {', '.join(sinks)}...")
+    return _start(entries, sinks)
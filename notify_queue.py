@@ -0,0 +1,150 @@
+import json
+import os
+import time
+import uuid
+import config
+
+# On-disk queue of pending notification deliveries: one JSON file per (notification, sink).
+# An entry is written *before* the first delivery attempt and removed once the sink
+# confirms, so anything interrupted or failed is picked up again by drain_queue().
+# Entries only name the sink; URLs and credentials are resolved from config at send time.
+# The queue directory is carried between CI runs in a cache, so nothing secret goes in
+# it in the clear (notifier seals the PIN with the sink's own credentials).
+
+STALE_LOCK_SECONDS = 600
+
+
+def _queue_dir():
+    os.makedirs(config.NOTIFY_QUEUE_DIR, exist_ok=True)
+    return config.NOTIFY_QUEUE_DIR
+
+
+def _path(entry_id, suffix=".json"):
+    return os.path.join(_queue_dir(), entry_id + suffix)
+
+
+def save(entry):
+    """
+    Atomically writes an entry to the queue.
+    """
+    tmp_path = _path(entry["id"], ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp_path, _path(entry["id"]))
+
+
+def enqueue(sink, notification):
+    """
+    Adds a delivery of `notification` to `sink` (a sink name) and returns the entry.
+    """
+    entry = {
+        "id": f"{time.strftime('%Y%m%d%H%M%S')}-{sink}-{uuid.uuid4().hex[:8]}",
+        "sink": sink,
+        "notification": notification,
+        "attempts": 0,
+        "progress": 0,  # messages already delivered (multi-message sinks resume from here)
+        "created_at": time.time(),
+        "next_attempt_at": 0,
+        "last_error": None,
+    }
+    save(entry)
+    return entry
+
+
+def remove(entry):
+    try:
+        os.remove(_path(entry["id"]))
+    except FileNotFoundError:
+        pass
+
+
+def update(entry):
+    """
+    Saves an entry's progress, unless it has left the queue meanwhile (superseded by a
+    newer report): a late update must not bring it back.
+    """
+    if os.path.exists(_path(entry["id"])):
+        save(entry)
+
+
+def _load(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def entries():
+    """
+    Returns every queued entry, oldest first.
+    """
+    found = []
+    for name in sorted(os.listdir(_queue_dir())):
+        if name.endswith(".json"):
+            entry = _load(os.path.join(_queue_dir(), name))
+            if entry is not None:
+                found.append(entry)
+    return found
+
+
+def due_entries(now=None):
+    """
+    Returns the queued entries whose backoff has expired, oldest first.
+    """
+    now = now or time.time()
+    return [entry for entry in entries() if entry.get("next_attempt_at", 0) <= now]
+
+
+def claim(entry):
+    """
+    Takes an exclusive lock on an entry so a daemon and a run never send it twice.
+    Returns the entry as it is on disk now (its progress may have moved), or None if
+    someone else holds it or it already left the queue (delivered or superseded).
+    """
+    lock_path = _path(entry["id"], ".lock")
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        # Break locks left behind by a killed process
+        try:
+            if time.time() - os.path.getmtime(lock_path) < STALE_LOCK_SECONDS:
+                return None
+            os.remove(lock_path)
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError:
+            return None
+    os.write(fd, str(os.getpid()).encode())
+    os.close(fd)
+    # Whoever held the lock before us may have delivered it in the meantime
+    current = _load(_path(entry["id"]))
+    if current is None:
+        release(entry)
+    return current
+
+
+def release(entry):
+    try:
+        os.remove(_path(entry["id"], ".lock"))
+    except FileNotFoundError:
+        pass
+
+
+def record_failure(entry, error):
+    """
+    Schedules the next attempt with exponential backoff, or moves the entry to
+    the dead-letter folder after config.NOTIFY_MAX_ATTEMPTS attempts.
+    """
+    entry["attempts"] += 1
+    entry["last_error"] = str(error)
+    if entry["attempts"] >= config.NOTIFY_MAX_ATTEMPTS:
+        dead_dir = os.path.join(_queue_dir(), "failed")
+        os.makedirs(dead_dir, exist_ok=True)
+        with open(os.path.join(dead_dir, entry["id"] + ".json"), "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        remove(entry)
+        print(f"Giving up on {entry['sink']} delivery {entry['id']} after {entry['attempts']} attempts: {error}")
+        return
+    delay = min(config.NOTIFY_BACKOFF_SECONDS * 2 ** (entry["attempts"] - 1), config.NOTIFY_MAX_BACKOFF_SECONDS)
+    entry["next_attempt_at"] = time.time() + delay
+    update(entry)
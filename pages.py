@@ -0,0 +1,88 @@
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+import hashlib
+import os
+import config
+import instrumentation
+
+# A page job is (path, render_func, args): render_func(*args) must return the HTML string.
+# render_func has to be a module-level function so it can be sent to worker processes.
+
+
+def _file_digest(path):
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _write_page(job):
+    """
+    Renders one page and writes it only if its content changed.
+    Never raises: returns (path, status, detail) with status 'written', 'unchanged' or 'failed'.
+    """
+    path, render_func, args = job
+    try:
+        content = render_func(*args).encode("utf-8")
+        if hashlib.sha256(content).hexdigest() == _file_digest(path):
+            return path, "unchanged", None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Write to a temp file first so a failure never leaves a half-written page
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        return path, "written", None
+    except Exception as e:
+        return path, "failed", f"{type(e).__name__}: {e}"
+
+
+def _write_batch(jobs):
+    return [_write_page(job) for job in jobs]
+
+
+@instrumentation.timed_call
+def write_pages(jobs, max_workers=None, batch_size=None):
+    """
+    Renders and writes page jobs across a process pool.
+    Pages whose content hash matches the file on disk are not rewritten, and a
+    failing page does not affect the others.
+    Returns {'written': [...], 'unchanged': [...], 'failed': [(path, error), ...]}.
+    """
+    max_workers = max_workers or config.PAGE_WORKERS or os.cpu_count() or 1
+    summary = {"written": [], "unchanged": [], "failed": []}
+    if not jobs:
+        return summary
+
+    # Rendering a page is cheap, so jobs are shipped to the workers in batches
+    # to keep the per-task pickling overhead small.
+    batch_size = batch_size or max(1, min(100, len(jobs) // (max_workers * 4) or 1))
+    batches = [jobs[i:i + batch_size] for i in range(0, len(jobs), batch_size)]
+
+    if max_workers == 1 or len(batches) == 1:
+        results = [r for batch in batches for r in _write_batch(batch)]
+    else:
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = [r for batch_result in executor.map(_write_batch, batches) for r in batch_result]
+        except (OSError, BrokenProcessPool) as e:
+            # Some sandboxes do not allow worker processes; fall back to threads
+            print(f"Process pool unavailable ({e}). Writing pages with threads...")
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = [r for batch_result in executor.map(_write_batch, batches) for r in batch_result]
+
+    for path, status, detail in results:
+        if status == "failed":
+            summary["failed"].append((path, detail))
+        else:
+            summary[status].append(path)
+
+    print(f"Pages: {len(summary['written'])} written, {len(summary['unchanged'])} unchanged, "
+          f"{len(summary['failed'])} failed.")
+    for path, detail in summary["failed"]:
+        print(f"  Failed to generate {path}: {detail}")
+
+    return summary
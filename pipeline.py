@@ -0,0 +1,242 @@
+import os
+import pickle
+import queue
+import threading
+import time
+
+
+class Stage:
+    """
+    A named step of the run.
+    func is called with the declared inputs as keyword arguments and returns a dict
+    holding the declared outputs (or the single value when there is one output).
+    timeout: seconds before the stage is abandoned and marked as timed out (None = no limit).
+    cache: whether the outputs are saved so a later run can resume from them (they must pickle).
+    """
+    def __init__(self, name, func, inputs=(), outputs=(), timeout=None, cache=True):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.timeout = timeout
+        self.cache = cache
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+
+class PipelineError(Exception):
+    """
+    Raised when one or more stages failed. `status` maps every stage name to
+    'done', 'cached', 'failed', 'timeout' or 'skipped'; `errors` holds the failures.
+    """
+    def __init__(self, status, errors):
+        failed = ", ".join(f"{name} ({err})" for name, err in errors.items())
+        super().__init__(f"Stage(s) failed: {failed}")
+        self.status = status
+        self.errors = errors
+
+
+def _cache_path(cache_dir, stage):
+    return os.path.join(cache_dir, f"{stage.name}.pkl")
+
+
+def load_cached(cache_dir, stage):
+    """
+    Returns the cached outputs of a stage, or None if there are none.
+    """
+    try:
+        with open(_cache_path(cache_dir, stage), "rb") as f:
+            outputs = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+    if not all(name in outputs for name in stage.outputs):
+        return None
+    return outputs
+
+
+def _save_cached(cache_dir, stage, outputs):
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = _cache_path(cache_dir, stage) + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(outputs, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, _cache_path(cache_dir, stage))
+
+
+def clear_cache(cache_dir):
+    if not os.path.isdir(cache_dir):
+        return
+    for name in os.listdir(cache_dir):
+        if name.endswith(".pkl"):
+            os.remove(os.path.join(cache_dir, name))
+
+
+def cached_inputs(stages, selected, cache_dir):
+    """
+    For running only the `selected` stage names: loads the values the selected stages
+    need from the caches of the stages that are not selected.
+    Returns (values, missing) where missing maps each unavailable input to the stage
+    that produces it.
+    """
+    producers = {out: stage for stage in stages for out in stage.outputs}
+    selected_outputs = {out for stage in stages if stage.name in selected for out in stage.outputs}
+    values, missing, loaded = {}, {}, {}
+    for stage in stages:
+        if stage.name not in selected:
+            continue
+        for name in stage.inputs:
+            if name in selected_outputs or name in values or name not in producers:
+                continue
+            producer = producers[name]
+            if producer.name not in loaded:
+                loaded[producer.name] = load_cached(cache_dir, producer)
+            cached = loaded[producer.name]
+            if cached is None:
+                missing[name] = producer.name
+            else:
+                values[name] = cached[name]
+    return values, missing
+
+
+def _validate(stages, initial):
+    producers = {}
+    for stage in stages:
+        for out in stage.outputs:
+            if out in producers:
+                raise ValueError(f"Output '{out}' is produced by both {producers[out]} and {stage.name}")
+            producers[out] = stage.name
+    for stage in stages:
+        for name in stage.inputs:
+            if name not in producers and name not in initial:
+                raise ValueError(f"Stage {stage.name} needs '{name}', which no stage produces")
+    return producers
+
+
+def _run_stage(stage, kwargs, done):
+    start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        result = stage.func(**kwargs)
+        if len(stage.outputs) == 1 and not (isinstance(result, dict) and stage.outputs[0] in result):
+            result = {stage.outputs[0]: result}
+        result = result or {}
+        missing = [name for name in stage.outputs if name not in result]
+        if missing:
+            raise ValueError(f"did not return {missing}")
+        done.put((stage.name, True, result, time.perf_counter() - start, time.thread_time() - cpu_start))
+    except BaseException as e:
+        done.put((stage.name, False, f"{type(e).__name__}: {e}", time.perf_counter() - start,
+                  time.thread_time() - cpu_start))
+
+
+def run_stages(stages, initial=None, cache_dir=None, resume=False, hooks=None, serial=False):
+    """
+    Runs the stages as a DAG: a stage starts as soon as all of its inputs exist,
+    so independent stages run concurrently and wall time follows the critical path.
+
+    initial: values available before any stage runs.
+    cache_dir / resume: outputs of successful stages are saved to cache_dir; with
+    resume=True a stage with saved outputs is not run again.
+    hooks: optional list of objects with stage_started(name) /
+    stage_finished(name, status, seconds, cpu_seconds); CPU time is the stage thread's own.
+    serial: run one stage at a time (e.g. under a profiler that allows only one active
+    instance per process).
+
+    Returns the dict of all values. Raises PipelineError if any stage failed, timed
+    out, or was skipped because something it depends on failed.
+    """
+    values = dict(initial or {})
+    producers = _validate(stages, values)
+    hooks = hooks or []
+
+    pending = {stage.name: stage for stage in stages}
+    running = {}  # name -> (stage, deadline)
+    status = {}
+    errors = {}
+    done = queue.Queue()
+
+    def notify(method, *args):
+        for hook in hooks:
+            getattr(hook, method, lambda *a: None)(*args)
+
+    while pending or running:
+        # Start (or restore from cache) everything whose inputs are ready
+        progressed = True
+        while progressed:
+            progressed = False
+            for name, stage in list(pending.items()):
+                upstream = {producers[i] for i in stage.inputs if i in producers}
+                if any(status.get(u) in ("failed", "timeout", "skipped") for u in upstream):
+                    status[name] = "skipped"
+                    del pending[name]
+                    progressed = True
+                    continue
+                if not all(i in values for i in stage.inputs):
+                    continue
+                if serial and running:
+                    break
+                del pending[name]
+                progressed = True
+
+                cached = load_cached(cache_dir, stage) if (resume and cache_dir and stage.cache) else None
+                if cached is not None:
+                    values.update({k: cached[k] for k in stage.outputs})
+                    status[name] = "cached"
+                    print(f"[{name}] restored from cache")
+                    notify("stage_finished", name, "cached", 0.0, 0.0)
+                    continue
+
+                kwargs = {i: values[i] for i in stage.inputs}
+                deadline = time.monotonic() + stage.timeout if stage.timeout else None
+                running[name] = (stage, deadline)
+                notify("stage_started", name)
+                # Daemon threads: a timed-out stage is abandoned rather than blocking exit
+                threading.Thread(target=_run_stage, args=(stage, kwargs, done), daemon=True,
+                                 name=f"stage-{name}").start()
+
+        if not running:
+            # Whatever is left can never get its inputs
+            for name in pending:
+                status[name] = "skipped"
+            break
+
+        deadlines = [d for _, d in running.values() if d is not None]
+        wait = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        try:
+            name, ok, result, seconds, cpu_seconds = done.get(timeout=wait)
+        except queue.Empty:
+            now = time.monotonic()
+            for name, (stage, deadline) in list(running.items()):
+                if deadline is not None and deadline <= now:
+                    del running[name]
+                    status[name] = "timeout"
+                    errors[name] = f"timed out after {stage.timeout}s"
+                    print(f"[{name}] timed out after {stage.timeout}s")
+                    notify("stage_finished", name, "timeout", float(stage.timeout), 0.0)
+            continue
+
+        if name not in running:
+            # Finished after being marked as timed out; ignore the late result
+            continue
+        stage, _ = running.pop(name)
+        if ok:
+            values.update({k: result[k] for k in stage.outputs})
+            status[name] = "done"
+            if cache_dir and stage.cache:
+                try:
+                    _save_cached(cache_dir, stage, {k: result[k] for k in stage.outputs})
+                except Exception as e:
+                    print(f"[{name}] could not cache outputs: {e}")
+            print(f"[{name}] done in {seconds:.2f}s")
+        else:
+            status[name] = "failed"
+            errors[name] = result
+            print(f"[{name}] failed after {seconds:.2f}s: {result}")
+        notify("stage_finished", name, status[name], seconds, cpu_seconds)
+
+    if errors or any(s == "skipped" for s in status.values()):
+        for name, s in status.items():
+            if s == "skipped" and name not in errors:
+                errors[name] = "skipped (upstream failed)"
+        raise PipelineError(status, errors)
+    return values
@@ -0,0 +1,205 @@
+import numpy as np
+import config
+
+# Position sizing for the screened setups: a Ledoit-Wolf shrinkage covariance of the
+# candidates' daily returns (from the prices the screen already downloaded), then
+# equal-risk-contribution or volatility-targeted weights, capped per sector by the
+# sector's place in the rank_sectors ordering.
+#
+# Everything works on (dates x candidates) / (candidates x candidates) arrays: one
+# matrix product for the covariance, a few Newton steps (one linear solve each) for
+# ERC, and np.bincount for the sector totals, so hundreds of candidates take milliseconds.
+
+TRADING_DAYS = 252
+
+
+def ledoit_wolf(returns):
+    """
+    Ledoit-Wolf covariance of a (dates x assets) array of daily returns, shrunk towards
+    the scaled identity. A missing return (NaN) counts as the asset's average return.
+    Returns (covariance, shrinkage intensity between 0 and 1).
+    """
+    x = np.asarray(returns, dtype=float)
+    valid = np.isfinite(x)
+    counts = valid.sum(axis=0)
+    mean = np.where(counts > 0, np.where(valid, x, 0).sum(axis=0) / np.maximum(counts, 1), 0)
+    x = np.where(valid, x - mean, 0.0)
+    n_dates, n_assets = x.shape
+
+    sample = x.T @ x / n_dates
+    mu = np.trace(sample) / n_assets
+    # Distance of the sample covariance from the target, and how noisy the sample is
+    # (variance of the per-date outer products around it)
+    x2 = x ** 2
+    delta = np.sum((sample - mu * np.eye(n_assets)) ** 2) / n_assets
+    beta = (np.sum(x2.T @ x2) / n_dates - np.sum(sample ** 2)) / (n_assets * n_dates)
+    shrinkage = min(beta, delta) / delta if delta > 0 else 0.0
+    cov = (1 - shrinkage) * sample + shrinkage * mu * np.eye(n_assets)
+    return cov, float(shrinkage)
+
+
+def erc_weights(cov, iterations=50, tol=1e-10):
+    """
+    Equal-risk-contribution weights (fully invested, long only): every asset contributes
+    the same share of the portfolio variance. Newton's method on the convex problem
+    min 1/2 y'Cy - sum(log y) / n, whose solution scaled to sum 1 is the ERC portfolio.
+    """
+    n = len(cov)
+    budget = np.full(n, 1.0 / n)
+    y = 1 / np.sqrt(np.diag(cov))
+    y /= np.sqrt(y @ cov @ y)
+    for _ in range(iterations):
+        grad = cov @ y - budget / y
+        if np.max(np.abs(grad)) < tol:
+            break
+        step = np.linalg.solve(cov + np.diag(budget / y ** 2), grad)
+        # Halve the step until y stays positive
+        t = 1.0
+        while np.any(y - t * step <= 0):
+            t /= 2
+        y = y - t * step
+    return y / y.sum()
+
+
+def vol_target_weights(cov, target_vol=None):
+    """
+    Inverse-volatility weights scaled so the portfolio's annualized volatility is
+    target_vol (default config.PORTFOLIO_TARGET_VOL), without leverage: the rest is cash.
+    """
+    target_vol = target_vol if target_vol is not None else config.PORTFOLIO_TARGET_VOL
+    w = 1 / np.sqrt(np.diag(cov))
+    w /= w.sum()
+    vol = np.sqrt(w @ cov @ w * TRADING_DAYS)
+    return w * min(1.0, target_vol / vol) if vol > 0 else w
+
+
+def cap_sectors(weights, groups, caps):
+    """
+    Caps every sector's total weight. weights: (assets,), groups: (assets,) sector index
+    of each asset, caps: (sectors,) max total weight. The weight cut from a sector goes
+    to the uncapped sectors in proportion to their weights; what no sector can take
+    stays in cash.
+    """
+    w = np.asarray(weights, dtype=float).copy()
+    caps = np.asarray(caps, dtype=float)
+    budget = w.sum()
+    capped = np.zeros(len(caps), dtype=bool)
+    for _ in range(len(caps)):
+        totals = np.bincount(groups, weights=w, minlength=len(caps))
+        over = totals > caps + 1e-12
+        if not over.any():
+            break
+        w *= np.where(over, caps / np.where(over, totals, 1), 1.0)[groups]
+        capped |= over
+        free = ~capped[groups]
+        if not free.any() or w[free].sum() <= 0:
+            break
+        w[free] *= 1 + (budget - w.sum()) / w[free].sum()
+    return w
+
+
+def sector_caps(sectors, ranked_sectors):
+    """
+    {sector: cap} from config.PORTFOLIO_SECTOR_CAPS, by each sector's place in the
+    rank_sectors ordering (sectors ranked below the list get its last cap).
+    """
+    caps = config.PORTFOLIO_SECTOR_CAPS
+    order = {ticker: i for i, ticker in enumerate(ranked_sectors.index)}
+    ranked = sorted(sectors, key=lambda s: order.get(s, len(order)))
+    return {s: caps[min(i, len(caps) - 1)] for i, s in enumerate(ranked)}
+
+
+def candidates(sector_results, min_score=None):
+    """
+    [(ticker, sector)] of the screened stocks with Score >= min_score (default
+    config.PORTFOLIO_MIN_SCORE); a stock held by two screened sectors counts once.
+    """
+    min_score = min_score if min_score is not None else config.PORTFOLIO_MIN_SCORE
+    seen = {}
+    for sector, results in sector_results.items():
+        for s in results:
+            res = s.get("results")
+            if res and res["Score"] >= min_score and s["ticker"] not in seen:
+                seen[s["ticker"]] = sector
+    return list(seen.items())
+
+
+def daily_returns(stock_data, tickers, lookback=None):
+    """
+    (dates x tickers) daily returns over the last `lookback` days (default
+    config.PORTFOLIO_LOOKBACK) from the screen's downloaded price panels.
+    """
+    import pandas as pd
+
+    lookback = lookback or config.PORTFOLIO_LOOKBACK
+    closes = []
+    for _, data in stock_data.values():
+        if data is None or data.empty:
+            continue
+        close = data["Close"] if isinstance(data.columns, pd.MultiIndex) else data[["Close"]]
+        closes.append(close)
+    if not closes:
+        return pd.DataFrame(columns=tickers)
+    close = pd.concat(closes, axis=1)
+    close = close.loc[:, ~close.columns.duplicated()]
+    close = close.reindex(columns=tickers)
+    return close.pct_change(fill_method=None).iloc[-lookback:]
+
+
+def build_portfolio(stock_data, ranked_sectors, sector_results, method=None):
+    """
+    Sizes the screened setups. Returns a JSON-safe dict:
+      method              'erc' or 'vol_target' (default config.PORTFOLIO_METHOD)
+      weights             {ticker: weight}, fractions of capital
+      sectors             {ticker: sector}
+      risk_contributions  {ticker: share of the portfolio variance}
+      sector_weights      {sector: total weight}, sector_caps {sector: cap}
+      vol                 annualized volatility of the portfolio
+      cash                1 - sum of the weights
+      shrinkage           Ledoit-Wolf shrinkage intensity
+      skipped             candidates without enough price history
+    """
+    method = method or config.PORTFOLIO_METHOD
+    if method not in ("erc", "vol_target"):
+        raise ValueError(f"Unknown portfolio method: {method}")
+    empty = {"method": method, "weights": {}, "sectors": {}, "risk_contributions": {}, "sector_weights": {},
+             "sector_caps": {}, "vol": None, "cash": 1.0, "shrinkage": None, "skipped": []}
+
+    picks = candidates(sector_results)
+    if not picks:
+        return empty
+    returns = daily_returns(stock_data, [t for t, _ in picks])
+    # A covariance needs enough overlapping history: drop the short ones
+    enough = returns.notna().sum().to_numpy() >= config.PORTFOLIO_MIN_HISTORY
+    skipped = [t for (t, _), ok in zip(picks, enough) if not ok]
+    picks = [p for p, ok in zip(picks, enough) if ok]
+    if skipped:
+        print(f"Portfolio: skipping {len(skipped)} candidates with under {config.PORTFOLIO_MIN_HISTORY} "
+              f"days of returns: {', '.join(skipped)}")
+    if not picks:
+        return dict(empty, skipped=skipped)
+
+    tickers = [t for t, _ in picks]
+    cov, shrinkage = ledoit_wolf(returns[tickers].to_numpy())
+    weights = erc_weights(cov) if method == "erc" else vol_target_weights(cov)
+
+    caps = sector_caps(dict.fromkeys(s for _, s in picks), ranked_sectors)
+    sector_names = list(caps)
+    groups = np.array([sector_names.index(s) for _, s in picks])
+    weights = cap_sectors(weights, groups, [caps[s] for s in sector_names])
+
+    variance = weights @ cov @ weights
+    contributions = weights * (cov @ weights) / variance if variance > 0 else np.zeros_like(weights)
+    sector_weights = np.bincount(groups, weights=weights, minlength=len(sector_names))
+    return {
+        "method": method,
+        "weights": {t: float(w) for t, w in zip(tickers, weights)},
+        "sectors": dict(picks),
+        "risk_contributions": {t: float(c) for t, c in zip(tickers, contributions)},
+        "sector_weights": {s: float(w) for s, w in zip(sector_names, sector_weights)},
+        "sector_caps": caps,
+        "vol": float(np.sqrt(variance * TRADING_DAYS)),
+        "cash": max(0.0, float(1 - weights.sum())),
+        "shrinkage": shrinkage,
+        "skipped": skipped,
+    }
@@ -0,0 +1,270 @@
+"""
+Memory-mapped price archive: one fixed-layout np.memmap file per field (Open, High,
+Low, Close, Volume), each a (dates x tickers) float64 array, plus a small JSON header
+holding the ticker and date axes.
+
+    <path>/header.json      {"fields": [...], "tickers": [...], "dates": ["2025-01-02", ...], "generation": 3}
+    <path>/Close.3.f64      dates x tickers, C order (a date is one contiguous row)
+
+Worker processes open the store read-only and map the files instead of receiving
+pickled DataFrames, so starting one costs the same for 50 or 5,000 tickers and the OS
+page cache serves the data to every worker (and to the next run). New dates are rows
+at the end of the files, so appending bars never rewrites what is already there.
+
+Adding tickers, or dates before / between the stored ones, changes the layout: the
+files are rewritten under the next generation's names and the header is switched to
+them (atomically) once they are complete, so a reader keeps the consistent files of
+the header it opened. The previous generation is kept until the next rewrite.
+Writers need exclusive access: one process writes at a time.
+"""
+import concurrent.futures
+from concurrent.futures.process import BrokenProcessPool
+import json
+import os
+
+import numpy as np
+
+FIELDS = ["Open", "High", "Low", "Close", "Volume"]
+HEADER_NAME = "header.json"
+DTYPE = np.float64
+
+
+def _field_path(path, field, generation=None):
+    # generation None: stores written before the files were versioned
+    if generation is None:
+        return os.path.join(path, f"{field}.f64")
+    return os.path.join(path, f"{field}.{generation}.f64")
+
+
+class PriceStore:
+    """
+    An opened store. mode 'r' maps the files read-only; 'r+' also allows write().
+    """
+    def __init__(self, path, mode="r"):
+        import pandas as pd
+
+        self.path = path
+        self.mode = mode
+        with open(os.path.join(path, HEADER_NAME), encoding="utf-8") as f:
+            header = json.load(f)
+        self.fields = header["fields"]
+        self.tickers = header["tickers"]
+        self.dates = pd.DatetimeIndex(header["dates"])
+        self.generation = header.get("generation")
+        self.columns = {t: i for i, t in enumerate(self.tickers)}
+        self._maps = {}
+
+    @classmethod
+    def create(cls, path, tickers, dates, fields=None):
+        """
+        Creates an empty (all NaN) store for these tickers and dates and opens it for writing.
+        """
+        fields = list(fields or FIELDS)
+        os.makedirs(path, exist_ok=True)
+        for field in fields:
+            data = np.memmap(_field_path(path, field, 0), dtype=DTYPE, mode="w+", shape=(len(dates), len(tickers)))
+            data[:] = np.nan
+            data.flush()
+            del data
+        _write_header(path, fields, list(tickers), dates, 0)
+        return cls(path, mode="r+")
+
+    def _path(self, name):
+        return _field_path(self.path, name, self.generation)
+
+    def field(self, name):
+        """
+        The (dates x tickers) memmap of one field (no copy).
+        """
+        if name not in self._maps:
+            self._maps[name] = np.memmap(self._path(name), dtype=DTYPE, mode=self.mode,
+                                         shape=(len(self.dates), len(self.tickers)))
+        return self._maps[name]
+
+    def arrays(self, start=0, stop=None):
+        """
+        {field: (dates x tickers[start:stop]) view}: a contiguous block of tickers, no copy.
+        """
+        return {name: self.field(name)[:, start:stop] for name in self.fields}
+
+    def frame(self, ticker):
+        """
+        One ticker's OHLCV as a DataFrame indexed by date (a copy of its column), from its first bar on.
+        """
+        import pandas as pd
+
+        col = self.columns[ticker]
+        df = pd.DataFrame({name: np.array(self.field(name)[:, col]) for name in self.fields}, index=self.dates)
+        return df.dropna(subset=["Close"])
+
+    def panel(self, tickers=None):
+        """
+        OHLCV panel with (Price, Ticker) columns, like data_fetcher.fetch_data (a copy).
+        """
+        import pandas as pd
+
+        tickers = list(tickers) if tickers is not None else self.tickers
+        cols = [self.columns[t] for t in tickers]
+        columns = pd.MultiIndex.from_product([self.fields, tickers], names=["Price", "Ticker"])
+        data = np.concatenate([self.field(name)[:, cols] for name in self.fields], axis=1)
+        return pd.DataFrame(data, index=self.dates, columns=columns)
+
+    def write(self, panel):
+        """
+        Writes an OHLCV panel with (Price, Ticker) columns into the store: bars on known
+        dates are overwritten in place and dates after the last one are appended as new
+        rows. New tickers and dates before or between the stored ones are added too
+        (those rewrite the files). Returns the number of new dates.
+        """
+        if self.mode == "r":
+            raise ValueError("Store is opened read-only")
+        import pandas as pd
+
+        tickers = list(dict.fromkeys(panel.columns.get_level_values(1)))
+        new_tickers = [t for t in tickers if t not in self.columns]
+        new_dates = pd.DatetimeIndex(panel.index).difference(self.dates)
+        appended = new_dates[new_dates > self.dates[-1]] if len(self.dates) else new_dates
+        inserted = new_dates.difference(appended)
+        if new_tickers or len(inserted):
+            self._rewrite(self.tickers + new_tickers, self.dates.union(inserted))
+        if len(appended):
+            self._append_dates(appended)
+
+        rows = self.dates.get_indexer(panel.index)
+        cols = np.array([self.columns[t] for t in tickers])
+        for name in self.fields:
+            if name not in panel.columns.get_level_values(0):
+                continue
+            values = panel[name].reindex(columns=tickers).to_numpy(dtype=DTYPE)
+            self.field(name)[np.ix_(rows, cols)] = values
+        self.flush()
+        _write_header(self.path, self.fields, self.tickers, self.dates, self.generation)
+        return len(new_dates)
+
+    def flush(self):
+        for data in self._maps.values():
+            data.flush()
+
+    def _append_dates(self, new_dates):
+        # Rows go at the end of each file: extend the file, NaN-fill the new rows.
+        # Readers map only the rows of the header they opened, so they are unaffected.
+        self.flush()
+        self._maps = {}
+        old, width = len(self.dates), len(self.tickers)
+        for name in self.fields:
+            with open(self._path(name), "r+b") as f:
+                f.truncate((old + len(new_dates)) * width * DTYPE().itemsize)
+            tail = np.memmap(self._path(name), dtype=DTYPE, mode="r+",
+                             offset=old * width * DTYPE().itemsize, shape=(len(new_dates), width))
+            tail[:] = np.nan
+            tail.flush()
+            del tail
+        self.dates = self.dates.append(new_dates)
+
+    def _add_tickers(self, new_tickers):
+        self._rewrite(self.tickers + list(new_tickers), self.dates)
+
+    def _rewrite(self, tickers, dates):
+        # Columns are interleaved in every row and dates are rows in order, so a wider
+        # store or an inserted date is a rewrite: into the next generation's files,
+        # which the header only points to once they are complete
+        self.flush()
+        self._maps = {}
+        rows = dates.get_indexer(self.dates)
+        old_width = len(self.tickers)
+        previous = self.generation
+        generation = (previous or 0) + 1
+        for name in self.fields:
+            old = np.memmap(self._path(name), dtype=DTYPE, mode="r", shape=(len(self.dates), old_width))
+            new = np.memmap(_field_path(self.path, name, generation), dtype=DTYPE, mode="w+",
+                            shape=(len(dates), len(tickers)))
+            new[:] = np.nan
+            new[rows, :old_width] = old
+            new.flush()
+            del old, new
+        self.tickers = list(tickers)
+        self.columns = {t: i for i, t in enumerate(self.tickers)}
+        self.dates = dates
+        self.generation = generation
+        _write_header(self.path, self.fields, self.tickers, self.dates, generation)
+        # Readers may still hold the previous generation's header: keep its files one
+        # more rewrite, drop the ones before it
+        stale = [_field_path(self.path, name, previous - 1) for name in self.fields] if previous else []
+        if previous == 1:
+            stale += [_field_path(self.path, name) for name in self.fields]
+        for path in stale:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _write_header(path, fields, tickers, dates, generation):
+    header = {"fields": fields, "tickers": tickers, "dates": [d.strftime("%Y-%m-%d") for d in dates],
+              "generation": generation}
+    tmp_path = os.path.join(path, HEADER_NAME + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(header, f)
+    os.replace(tmp_path, os.path.join(path, HEADER_NAME))
+
+
+def open_store(path, mode="r"):
+    return PriceStore(path, mode)
+
+
+def write_panel(path, panel, tickers=None):
+    """
+    Writes a panel into the store at `path`, creating it (with `tickers` as the ticker
+    axis, default the panel's) if it does not exist. Returns the opened store.
+    """
+    if os.path.exists(os.path.join(path, HEADER_NAME)):
+        store = PriceStore(path, mode="r+")
+        # All new tickers in one rewrite, not one per chunk
+        missing = [t for t in tickers or [] if t not in store.columns]
+        if missing:
+            store._add_tickers(missing)
+    else:
+        tickers = tickers or list(dict.fromkeys(panel.columns.get_level_values(1)))
+        store = PriceStore.create(path, tickers, panel.index)
+    store.write(panel)
+    return store
+
+
+# --- Zero-copy process pool: workers map the store once and get ticker ranges ---
+
+_worker_store = None
+
+
+def _init_worker(path):
+    global _worker_store
+    _worker_store = PriceStore(path)
+
+
+def _run_chunk(func, start, stop):
+    return func(_worker_store, start, stop)
+
+
+def map_chunks(path, func, chunk_size=500, workers=None):
+    """
+    Runs func(store, start, stop) over contiguous ticker ranges of the store at `path`
+    across a process pool and returns the results in order. func must be a module-level
+    function; a task only pickles (func, start, stop), never price data.
+    """
+    n_tickers = len(PriceStore(path).tickers)
+    ranges = [(start, min(start + chunk_size, n_tickers)) for start in range(0, n_tickers, chunk_size)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(ranges) <= 1:
+        _init_worker(path)
+        return [_run_chunk(func, start, stop) for start, stop in ranges]
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                    initargs=(path,)) as executor:
+            futures = [executor.submit(_run_chunk, func, start, stop) for start, stop in ranges]
+            return [f.result() for f in futures]
+    except (OSError, BrokenProcessPool) as e:
+        # Some sandboxes do not allow worker processes; the mapped store works from threads too
+        print(f"Process pool unavailable ({e}). Using threads...")
+        _init_worker(path)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda r: _run_chunk(func, *r), ranges))
@@ -0,0 +1,185 @@
+import json
+import os
+import config
+
+# pandas is imported inside the functions that build or export tables, so reading
+# and rendering an already-built model (render / notify commands) does not load it.
+
+# Columns written to the machine-readable exports (and their order)
+SECTOR_FIELDS = ["rank", "ticker", "name", "perf_4w", "perf_12w", "rs_4w", "rs_12w", "score"]
+STOCK_FIELDS = ["sector", "ticker", "price_gt_50", "price_gt_21", "contracting", "contractions", "current_vol", "score",
+                "close", "ema_50", "ema_21", "hist_vol", "rs_sector_4w", "rs_sector_12w", "rs_spy_4w", "rs_spy_12w", "rs_rank",
+                "rs_leader", "weight", "allocation", "risk_contribution"]
+
+
+def _clean(value):
+    """
+    Converts numpy / pandas scalars to plain Python values (NaN -> None) so the model is JSON-safe.
+    """
+    if value is None:
+        return None
+    if hasattr(value, "item"):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def build_report_model(ranked_df, sector_results=None, generated_at=None, rrg=None, portfolio=None):
+    """
+    Builds the intermediate report model from the ranked sectors and the stock screen results.
+
+    The model is a plain dict of lists, built once per run, and every output
+    (console, Discord, HTML, JSON/CSV exports) is rendered from it:
+    {
+        'generated_at': '2026-02-16T08:00:00',
+        'sectors': [{'rank': 1, 'ticker': 'XLK', 'name': ..., 'perf_4w': 0.05, ...}, ...],
+        'screened_sectors': ['XLK', 'XLE', 'XLF'],
+        'stocks': [{'sector': 'XLK', 'ticker': 'NVDA', 'score': 3, 'weight': 0.14, 'allocation': 0.08, ...}, ...],
+        'breadth': {'XLK': {'screened': 10, 'uptrend': 6, 'breadth': 0.6, 'weighted_breadth': 0.72}, ...},
+        'rrg': {'dates': [...], 'tails': {'XLK': [[101.2, 99.9], ...]}, 'quadrants': {'XLK': 'leading'}},
+        'portfolio': {'method': 'erc', 'vol': 0.18, 'cash': 0.0, 'sector_weights': {'XLK': 0.5}, ...}
+    }
+    rrg is the output of rrg.rrg_tails (empty when not computed).
+    portfolio is the output of portfolio.build_portfolio: a stock's 'weight' is its
+    holding weight in the sector ETF, 'allocation' its suggested share of capital
+    (None when it was not sized).
+    """
+    import pandas as pd
+
+    if generated_at is None:
+        generated_at = pd.Timestamp.now().isoformat(timespec="seconds")
+
+    sectors = []
+    if ranked_df is not None and not ranked_df.empty:
+        df = ranked_df.reset_index()
+        # The first column is the ticker, regardless of its original name
+        df = df.rename(columns={df.columns[0]: "ticker"})
+        table = pd.DataFrame({
+            "rank": range(1, len(df) + 1),
+            "ticker": df["ticker"],
+            "name": df["ticker"].map(lambda t: config.SECTOR_NAMES.get(t, t)),
+            "perf_4w": df.get("4w"),
+            "perf_12w": df.get("12w"),
+            "rs_4w": df.get("RS_4w"),
+            "rs_12w": df.get("RS_12w"),
+            "score": df.get("Score"),
+        })
+        # One pass over the frame; NaN/None become None
+        sectors = [{k: _clean(v) for k, v in rec.items()} for rec in table.to_dict("records")]
+
+    stocks = []
+    sector_results = sector_results or {}
+    portfolio = portfolio or {}
+    allocations = portfolio.get("weights", {})
+    contributions = portfolio.get("risk_contributions", {})
+    # A stock held by two screened sectors is sized once, under the first
+    sized_in = portfolio.get("sectors", {})
+    for sector, results in sector_results.items():
+        for s in results:
+            res = s.get("results")
+            if not res:
+                continue
+            stocks.append({
+                "sector": sector,
+                "ticker": s["ticker"],
+                "price_gt_50": bool(res["Price > 50EMA"]),
+                "price_gt_21": bool(res["Price > 21EMA"]),
+                "contracting": bool(res["Contracting"]),
+                "contractions": _clean(res.get("Contractions")),
+                "contraction_depths": [_clean(d) for d in res.get("Contraction Depths") or []],
+                "current_vol": _clean(res["Current Vol"]),
+                "score": _clean(res["Score"]),
+                "close": _clean(res.get("Close")),
+                "ema_50": _clean(res.get("EMA_50")),
+                "ema_21": _clean(res.get("EMA_21")),
+                "hist_vol": _clean(res.get("Hist Vol")),
+                "rs_sector_4w": _clean(res.get("RS vs Sector 4w")),
+                "rs_sector_12w": _clean(res.get("RS vs Sector 12w")),
+                "rs_spy_4w": _clean(res.get("RS vs SPY 4w")),
+                "rs_spy_12w": _clean(res.get("RS vs SPY 12w")),
+                "rs_rank": _clean(res.get("RS Rank")),
+                "rs_leader": bool(res.get("RS Leader")),
+                "weight": _clean(res.get("Weight")),
+                "allocation": allocations.get(s["ticker"]) if sized_in.get(s["ticker"]) == sector else None,
+                "risk_contribution": contributions.get(s["ticker"]) if sized_in.get(s["ticker"]) == sector else None,
+            })
+
+    return {
+        "generated_at": generated_at,
+        "sectors": sectors,
+        "screened_sectors": list(sector_results.keys()),
+        "stocks": stocks,
+        "breadth": {sector: sector_breadth(stocks, sector) for sector in sector_results},
+        "rrg": rrg or {"dates": [], "tails": {}, "quadrants": {}},
+        "portfolio": {k: v for k, v in portfolio.items() if k not in ("weights", "sectors", "risk_contributions")},
+    }
+
+
+def sector_breadth(stocks, sector):
+    """
+    Share of a sector's screened stocks in an uptrend (price above the 50 and 21 EMA),
+    plain and weighted by ETF holding weight. weighted_breadth is None when the
+    weights are unknown (SECTOR_HOLDINGS fallback).
+    """
+    rows = [s for s in stocks if s["sector"] == sector]
+    up = [s for s in rows if s["price_gt_50"] and s["price_gt_21"]]
+    weighted = None
+    weights = [s.get("weight") for s in rows]
+    if rows and all(w is not None for w in weights) and sum(weights) > 0:
+        weighted = sum(s["weight"] for s in up) / sum(weights)
+    return {
+        "screened": len(rows),
+        "uptrend": len(up),
+        "breadth": len(up) / len(rows) if rows else None,
+        "weighted_breadth": weighted,
+    }
+
+
+def good_setups(model, sector, min_score=2):
+    """
+    Returns the stocks of a sector that pass the screen (Score >= min_score).
+    """
+    return [s for s in model["stocks"] if s["sector"] == sector and s["score"] is not None and s["score"] >= min_score]
+
+
+def export_report(model, out_dir="exports", formats=("json", "csv")):
+    """
+    Writes the report model to machine-readable files for downstream tools.
+    Supported formats: 'json' (whole model), 'csv' and 'parquet' (one file per table).
+    Returns the list of written paths.
+    """
+    import pandas as pd
+
+    os.makedirs(out_dir, exist_ok=True)
+    written = []
+
+    if "json" in formats:
+        path = os.path.join(out_dir, "report.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(model, f, ensure_ascii=False, indent=1)
+        written.append(path)
+
+    tables = {
+        "sectors": pd.DataFrame(model["sectors"], columns=SECTOR_FIELDS),
+        "stocks": pd.DataFrame(model["stocks"], columns=STOCK_FIELDS),
+    }
+
+    if "csv" in formats:
+        for name, df in tables.items():
+            path = os.path.join(out_dir, f"{name}.csv")
+            df.to_csv(path, index=False, encoding="utf-8")
+            written.append(path)
+
+    if "parquet" in formats:
+        for name, df in tables.items():
+            path = os.path.join(out_dir, f"{name}.parquet")
+            try:
+                df.to_parquet(path, index=False)
+                written.append(path)
+            except ImportError as e:
+                # Parquet needs pyarrow or fastparquet, which are optional
+                print(f"Skipping parquet export ({e})")
+                break
+
+    return written
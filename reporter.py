@@ -1,192 +1,238 @@
 from tabulate import tabulate
 from colorama import Fore, Style, init
 import config
-import pandas as pd
 import json
 import base64
-import os
+import hashlib
+import hmac
+import report_model
+import instrumentation
 
 # Initialize colorama
 init()
 
-def generate_sector_report(ranked_df):
+SECTOR_HEADERS = ["排名", "板塊", "4週表現", "12週表現", "RS分數"]
+STOCK_HEADERS = ["Ticker", "Trend", "Vol", "Vol %", "RS Rank", "Alloc"]
+
+PORTFOLIO_METHODS = {"erc": "風險平價 (ERC)", "vol_target": "波動目標 (Vol Target)"}
+
+# Relative Rotation Graph quadrants (see rrg.py), in clockwise order
+RRG_QUADRANTS = {
+    "leading": "領先 (Leading)",
+    "weakening": "轉弱 (Weakening)",
+    "lagging": "落後 (Lagging)",
+    "improving": "改善 (Improving)",
+}
+
+# Trend / coil labels: plain text for Discord, emoji for the console
+PLAIN_LABELS = {"trend_ok": "O", "trend_bad": "X", "trend_mixed": ">50,<21", "tight": "Tight"}
+CONSOLE_LABELS = {"trend_ok": "✅", "trend_bad": "⚠️", "trend_mixed": "Above 50, Below 21", "tight": "🔥 Tight"}
+
+
+def _fmt_pct(value):
+    return f"{value:.2%}" if value is not None else "N/A"
+
+
+def render_sector_text(model, color=False):
     """
-    Generates the sector ranking report as a string.
+    Renders the sector ranking table from the report model.
+    With color=True the top 3 are red and the bottom 3 green (Taiwan convention) for the console.
     """
     output = []
-    output.append("每週板塊輪動監測")
+    title = "每週板塊輪動監測"
+    output.append(Style.BRIGHT + title + Style.RESET_ALL if color else title)
     output.append("=" * 40)
-    
+
+    sectors = model["sectors"]
     table_data = []
-    
-    # We expect columns: ['4w', '12w', 'RS_4w', 'RS_12w', 'Score']
-    # We want to show Rank, Ticker, 4w%, 12w%, Score
-    
-    # Reset index to get the ticker as a column
-    ranked_df = ranked_df.reset_index()
-    # The first column is the ticker, rename it to 'Sector' regardless of its original name
-    ranked_df.rename(columns={ranked_df.columns[0]: 'Sector'}, inplace=True)
-    
-    for i, row in ranked_df.iterrows():
-        rank = i + 1
-        ticker = row['Sector']
-        perf_4w = f"{row['4w']:.2%}" if row['4w'] else "N/A"
-        perf_12w = f"{row['12w']:.2%}" if row['12w'] else "N/A"
-        score = f"{row['Score']:.4f}"
-        
-        # Color coding (removed for string output to Discord/File, keep simple text or just emojis if needed)
-        # For console print we can add color, but for Discord we need plain text or markdown code blocks
-        
-        row_data = [
-            rank,
-            ticker,
-            perf_4w,
-            perf_12w,
-            score
-        ]
-        table_data.append(row_data)
-        
-    headers = ["排名", "板塊", "4週表現", "12週表現", "RS分數"]
-    
-    output.append(tabulate(table_data, headers=headers, tablefmt="fancy_grid"))
-    
-    output.append("\n前三名：關注區域 (Focus Area)")
-    output.append("後三名：避免/黑名單 (Avoid/Blacklist)")
-    
+    for s in sectors:
+        row = [s["rank"], s["ticker"], _fmt_pct(s["perf_4w"]), _fmt_pct(s["perf_12w"]), f"{s['score']:.4f}"]
+        if color:
+            c = ""
+            if s["rank"] <= 3:
+                c = Fore.RED
+            elif s["rank"] > len(sectors) - 3:
+                c = Fore.GREEN
+            row = [f"{c}{v}{Style.RESET_ALL}" for v in row]
+        table_data.append(row)
+
+    output.append(tabulate(table_data, headers=SECTOR_HEADERS, tablefmt="fancy_grid"))
+
+    if color:
+        output.append("\n" + Fore.RED + "前三名：關注區域 (Focus Area)" + Style.RESET_ALL)
+        output.append(Fore.GREEN + "後三名：避免/黑名單 (Avoid/Blacklist)" + Style.RESET_ALL)
+    else:
+        output.append("\n前三名：關注區域 (Focus Area)")
+        output.append("後三名：避免/黑名單 (Avoid/Blacklist)")
+
+    quadrants = model.get("rrg", {}).get("quadrants")
+    if quadrants:
+        output.append("\n輪動象限 (RRG):")
+        for key, label in RRG_QUADRANTS.items():
+            members = [t for t, q in quadrants.items() if q == key]
+            output.append(f"  {label}: {', '.join(members) if members else '-'}")
+
     return "\n".join(output)
 
-def print_sector_ranking(ranked_df):
-    """
-    Prints the sector ranking in a tabular format (Wrapped version with color).
-    """
-    # For simplicity, we just print the colored version directly as before, 
-    # OR we use the generate function and print it. 
-    # Let's keep the colored version for console and use generate for Discord.
-    # Actually, to avoid code duplication, we could have one source of truth, but colorama complicates string return.
-    # Let's keep the original logic for console printing and add the string generator.
-    
-    print("\n" + Style.BRIGHT + "每週板塊輪動監測" + Style.RESET_ALL)
-    print("=" * 40)
-    
-    table_data = []
-    
-    # Check if already reset (depends on how it's passed) -> It is passed as index=Ticker usually.
-    # But generate_sector_report resets it. We should pass a copy or handle it.
-    df = ranked_df.copy()
-    df = df.reset_index()
-    df.rename(columns={df.columns[0]: 'Sector'}, inplace=True)
-    
-    for i, row in df.iterrows():
-        rank = i + 1
-        ticker = row['Sector']
-        perf_4w = f"{row['4w']:.2%}" if row['4w'] else "N/A"
-        perf_12w = f"{row['12w']:.2%}" if row['12w'] else "N/A"
-        score = f"{row['Score']:.4f}"
-        
-        # Color coding
-        color = ""
-        if rank <= 3:
-            color = Fore.RED
-        elif rank > len(df) - 3:
-            color = Fore.GREEN
-            
-        row_data = [
-            f"{color}{rank}{Style.RESET_ALL}",
-            f"{color}{ticker}{Style.RESET_ALL}",
-            f"{color}{perf_4w}{Style.RESET_ALL}",
-            f"{color}{perf_12w}{Style.RESET_ALL}",
-            f"{color}{score}{Style.RESET_ALL}"
-        ]
-        table_data.append(row_data)
-        
-    headers = ["排名", "板塊", "4週表現", "12週表現", "RS分數"]
-    
-    print(tabulate(table_data, headers=headers, tablefmt="fancy_grid"))
-    
-    print("\n" + Fore.RED + "前三名：關注區域 (Focus Area)" + Style.RESET_ALL)
-    print(Fore.GREEN + "後三名：避免/黑名單 (Avoid/Blacklist)" + Style.RESET_ALL)
 
-def generate_stock_report(sector_results):
+def _fmt_rank(stock):
+    # Percentile of the stock's RS across all screened stocks; * = leads its sector ETF
+    if stock.get("rs_rank") is None:
+        return "N/A"
+    return f"{stock['rs_rank']:.0f}" + ("*" if stock.get("rs_leader") else "")
+
+
+def _fmt_alloc(stock):
+    # Suggested share of capital (portfolio.py); '-' when not sized
+    return f"{stock['allocation']:.1%}" if stock.get("allocation") is not None else "-"
+
+
+def _trend_label(stock, labels):
+    if stock["price_gt_50"] and stock["price_gt_21"]:
+        return labels["trend_ok"]
+    if stock["price_gt_50"]:
+        return labels["trend_mixed"]
+    return labels["trend_bad"]
+
+
+def render_stock_text(model, color=False):
     """
-    Generates the stock analysis report as a string.
+    Renders the stock screen (Score >= 2 setups per screened sector) from the report model.
     """
+    labels = CONSOLE_LABELS if color else PLAIN_LABELS
     output = []
-    output.append("\n領先板塊個股篩選 (Top Sector Stock Screen)")
-    output.append("篩選標準: 價格 > 50EMA & 21EMA (趨勢), 波動收縮 (Coiling)")
+    title = "領先板塊個股篩選 (Top Sector Stock Screen)"
+    output.append("\n" + (Style.BRIGHT + title + Style.RESET_ALL if color else title))
+    output.append("篩選標準: 價格 > 50EMA & 21EMA (趨勢), 波動收縮 (VCP, nT = n 次逐步收斂的回檔), "
+                  f"RS 強於所屬板塊且百分位 >= {config.RS_MIN_RANK} (RS Rank, * = 取得 RS 分數)")
     output.append("=" * 60)
-    
-    for sector, stocks in sector_results.items():
-        output.append(f"\n板塊: {sector}")
-        
-        good_setups = [s for s in stocks if s['results'] and s['results']['Score'] >= 2]
-        
-        if not good_setups:
+
+    for sector in model["screened_sectors"]:
+        if color:
+            output.append(f"\n{Style.BRIGHT}{Fore.YELLOW}板塊: {sector}{Style.RESET_ALL}")
+        else:
+            output.append(f"\n板塊: {sector}")
+
+        breadth = model.get("breadth", {}).get(sector)
+        if breadth and breadth["breadth"] is not None:
+            line = f"  多頭比例 (Breadth): {breadth['uptrend']}/{breadth['screened']} ({breadth['breadth']:.0%})"
+            if breadth["weighted_breadth"] is not None:
+                line += f", 持股權重加權 (Weighted): {breadth['weighted_breadth']:.0%}"
+            output.append(line)
+
+        setups = report_model.good_setups(model, sector)
+        if not setups:
             output.append("  無符合條件的個股 (No setups found)")
             continue
-            
+
         table_data = []
-        for s in good_setups:
-            res = s['results']
-            
-            trend = "O" if res['Price > 50EMA'] and res['Price > 21EMA'] else "X"
-            if res['Price > 50EMA'] and not res['Price > 21EMA']: trend = ">50,<21"
-            
-            coil = "Tight" if res['Contracting'] else "Normal"
-            
-            row = [
-                s['ticker'],
-                trend,
-                coil,
-                f"{res['Current Vol']:.2%}"
-            ]
-            table_data.append(row)
-            
-        headers = ["Ticker", "Trend", "Vol", "Vol %"]
-        output.append(tabulate(table_data, headers=headers, tablefmt="simple"))
-        
+        for s in setups:
+            # The contraction count is left out when the model has none (e.g. an older saved model)
+            count = s.get('contractions')
+            coil = (f"{labels['tight']} {count}T" if count else labels['tight']) if s["contracting"] else "Normal"
+            table_data.append([s["ticker"], _trend_label(s, labels), coil, _fmt_pct(s["current_vol"]), _fmt_rank(s),
+                               _fmt_alloc(s)])
+
+        output.append(tabulate(table_data, headers=STOCK_HEADERS, tablefmt="simple"))
+
+    output.extend(render_portfolio_lines(model))
     return "\n".join(output)
 
+
+def render_portfolio_lines(model):
+    """
+    Summary of the suggested position sizes (Alloc column): method, expected volatility,
+    cash and the weight of each sector against its cap. Empty when nothing was sized.
+    """
+    p = model.get("portfolio") or {}
+    if p.get("vol") is None:
+        return []
+    lines = [f"\n建議部位 (Position Sizing): {PORTFOLIO_METHODS.get(p['method'], p['method'])}, "
+             f"預期年化波動 {p['vol']:.1%}, 現金 {p['cash']:.1%}, 共變異數收縮 (Shrinkage) {p['shrinkage']:.2f}"]
+    caps = p.get("sector_caps", {})
+    lines.append("  板塊權重 (Sector Weights): " + ", ".join(
+        f"{sector} {w:.1%} (上限 {caps.get(sector, 1):.0%})" for sector, w in p.get("sector_weights", {}).items()))
+    return lines
+
+
+def render_discord(model):
+    """
+    Renders the plain-text report used for Discord and the HTML 'Detailed Report' section.
+    """
+    return render_sector_text(model) + "\n" + render_stock_text(model)
+
+
+def render_console(model):
+    """
+    Prints the colored report to the console.
+    """
+    print("\n" + render_sector_text(model, color=True))
+    print(render_stock_text(model, color=True))
+
+
+def render_html(model, pin, report_text=None):
+    """
+    Renders the PIN-protected index page from the report model, with the encrypted
+    data embedded (a single self-contained file).
+    """
+    return _html_page(encrypt_report(model, pin, report_text))
+
+
+def render_index_shell(data_url):
+    """
+    Renders the index page that loads its encrypted data from data_url (the
+    content-hashed data file of the site build, see site_build.py).
+    """
+    return _html_page(data_url=data_url)
+
+
+# Pluggable renderers: each takes the report model (plus renderer-specific kwargs).
+# Machine-readable exports live in report_model.export_report.
+RENDERERS = {
+    "console": render_console,
+    "discord": render_discord,
+    "html": render_html,
+}
+
+
+def render(model, name, **kwargs):
+    """
+    Renders the report model with the named renderer.
+    """
+    return RENDERERS[name](model, **kwargs)
+
+
+# --- Backwards-compatible wrappers (build a model on the fly) ---
+
+def generate_sector_report(ranked_df):
+    """
+    Generates the sector ranking report as a string.
+    """
+    return render_sector_text(report_model.build_report_model(ranked_df))
+
+
+def print_sector_ranking(ranked_df):
+    """
+    Prints the sector ranking in a tabular format (with color).
+    """
+    print("\n" + render_sector_text(report_model.build_report_model(ranked_df), color=True))
+
+
+def generate_stock_report(sector_results):
+    """
+    Generates the stock analysis report as a string.
+    """
+    return render_stock_text(report_model.build_report_model(None, sector_results))
+
+
 def print_stock_analysis(sector_results):
     """
     Prints the analysis of individual stocks within the top sectors (Console version).
     """
-    print("\n" + Style.BRIGHT + "領先板塊個股篩選 (Top Sector Stock Screen)" + Style.RESET_ALL)
-    print("篩選標準: 價格 > 50EMA & 21EMA (趨勢), 波動收縮 (Coiling)")
-    print("=" * 60)
-    
-    for sector, stocks in sector_results.items():
-        print(f"\n{Style.BRIGHT}{Fore.YELLOW}板塊: {sector}{Style.RESET_ALL}")
-        
-        # Filter for "good" setups (Score >= 2)
-        good_setups = [s for s in stocks if s['results'] and s['results']['Score'] >= 2]
-        
-        if not good_setups:
-            print("  無符合條件的個股 (No setups found)")
-            continue
-            
-        table_data = []
-        for s in good_setups:
-            res = s['results']
-            
-            # Trend Status
-            trend = "✅" if res['Price > 50EMA'] and res['Price > 21EMA'] else "⚠️"
-            if res['Price > 50EMA'] and not res['Price > 21EMA']: trend = "Above 50, Below 21"
-            
-            # Contraction
-            coil = "🔥 Tight" if res['Contracting'] else "Normal"
-            
-            row = [
-                s['ticker'],
-                trend,
-                coil,
-                f"{res['Current Vol']:.2%}"
-            ]
-            table_data.append(row)
-            
+    print(render_stock_text(report_model.build_report_model(None, sector_results), color=True))
 
-import base64
-import json
 
+@instrumentation.timed_call
 def simple_encrypt(text, pin):
     """
     Simple XOR encryption with the PIN to prevent casual 'View Source' peeking.
@@ -196,69 +242,131 @@ def simple_encrypt(text, pin):
     if not pin_str:
         return text 
         
-    # Expand PIN to match text length
-    key = (pin_str * (len(text) // len(pin_str) + 1))[:len(text)]
-    
-    encrypted_chars = []
-    for t, k in zip(text, key):
-        # XOR and keep within printable range if possible, or just use ordained values
-        # We will base64 encode the result anyway, so raw bytes are fine.
-        # However, to be safe with unicode strings, let's work with utf-8 bytes
-        # Standard XOR on string characters might produce invalid unicode.
-        pass
-    
-    # Better approach: XOR bytes
+    # XOR the utf-8 bytes with the PIN repeated to the same length. One big-int XOR
+    # instead of a Python loop per byte: large reports (thousands of stocks) stay fast.
     text_bytes = text.encode('utf-8')
-    key_bytes = key.encode('utf-8')
-    
-    encrypted_bytes = bytearray()
-    for t, k in zip(text_bytes, key_bytes):
-        encrypted_bytes.append(t ^ k)
+    pin_bytes = pin_str.encode('utf-8')
+    key_bytes = (pin_bytes * (len(text_bytes) // len(pin_bytes) + 1))[:len(text_bytes)]
+    encrypted_bytes = (int.from_bytes(text_bytes, 'big') ^ int.from_bytes(key_bytes, 'big')).to_bytes(len(text_bytes), 'big')
         
     # Return as base64 string for safe embedding in HTML
     return base64.b64encode(encrypted_bytes).decode('utf-8')
 
-def generate_etf_detail_page(ticker, holdings_data, chinese_name):
+# simple_encrypt's inverse, shared by the index page's worker and the detail pages
+DECRYPT_JS = """
+        function simple_decrypt(base64Text, pin) {
+            const binary = atob(base64Text);
+            const pinBytes = new TextEncoder().encode(pin);
+            const bytes = new Uint8Array(binary.length);
+            for (let i = 0; i < binary.length; i++) {
+                bytes[i] = binary.charCodeAt(i) ^ pinBytes[i % pinBytes.length];
+            }
+            return new TextDecoder().decode(bytes);
+        }
+"""
+
+DETAIL_STYLE = """
+        body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #1e1e1e; color: #e0e0e0; margin: 0; padding: 20px; }
+        .container { max-width: 800px; margin: 0 auto; background-color: #2d2d2d; padding: 2rem; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.3); }
+        h1 { color: #4caf50; border-bottom: 2px solid #444; padding-bottom: 10px; }
+        .back-link { display: inline-block; margin: 0 20px 20px 0; color: #64b5f6; text-decoration: none; font-size: 1.1em; }
+        .back-link:hover { text-decoration: underline; }
+        table { width: 100%; border-collapse: collapse; margin-top: 20px; }
+        th, td { padding: 12px; text-align: left; border-bottom: 1px solid #444; }
+        .hidden-data { display: none; }
+"""
+
+
+def stock_page_name(ticker, secret):
     """
-    Generates a detailed HTML page for a specific ETF.
+    File name (without .html) of a stock's detail page: a keyed hash of the ticker, so the
+    published file names do not list the screened stocks but stay the same from run to run.
     """
-    
-    # Format holdings table rows
-    holdings_rows = ""
-    for h in holdings_data:
-        holdings_rows += f"<tr><td>{h['symbol']}</td><td>{h['name']}</td><td>{h['percent']:.2%}</td></tr>"
-        
-    html = f"""
+    return hmac.new(secret.encode("utf-8"), f"stock:{ticker}".encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+
+def page_key(secret, name, content):
+    """
+    Key of a detail page: a keyed hash of the page's name and content (any JSON-safe value).
+    An unchanged page gets the same key, and so the same bytes, on every run; the keys reach
+    the browser inside the PIN-encrypted index data, so a new PIN only changes the index.
+    """
+    message = f"{name}:{json.dumps(content, sort_keys=True, default=str)}"
+    return hmac.new(secret.encode("utf-8"), message.encode("utf-8"), hashlib.sha256).hexdigest()
+
+
+def _protected_page(name, title, body_html, key, style=DETAIL_STYLE, data=None, render_js="", head_extra=""):
+    """
+    A detail page whose content is only published encrypted with its page key. The browser
+    decrypts it with the key the index page stored for the session (under `name`, the file
+    name without .html); without one, or with a stale one, it goes back to the index page.
+    data: JSON-safe value passed as `data` to render_js once the content is shown.
+    """
+    payload = simple_encrypt(json.dumps({'html': body_html, 'data': data}), key)
+    return f"""
 <!DOCTYPE html>
 <html lang="zh-TW">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{ticker} - {chinese_name}</title>
-    <style>
-        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #1e1e1e; color: #e0e0e0; margin: 0; padding: 20px; }}
-        .container {{ max-width: 800px; margin: 0 auto; background-color: #2d2d2d; padding: 2rem; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.3); }}
-        h1 {{ color: #4caf50; border-bottom: 2px solid #444; padding-bottom: 10px; }}
-        .back-link {{ display: inline-block; margin-bottom: 20px; color: #64b5f6; text-decoration: none; font-size: 1.1em; }}
-        .back-link:hover {{ text-decoration: underline; }}
-        table {{ width: 100%; border-collapse: collapse; margin-top: 20px; }}
-        th, td {{ padding: 12px; text-align: left; border-bottom: 1px solid #444; }}
-        th {{ background-color: #333; color: #4caf50; }}
-        tr:hover {{ background-color: #383838; }}
-    </style>
-    <script>
-        // Check if user is authorized (simple session check)
-        if (!sessionStorage.getItem('unlocked')) {{
-            window.location.href = '../index.html';
-        }}
-    </script>
+    <title>{title}</title>
+    <style>{style}</style>
+    {head_extra}
 </head>
 <body>
-    <div class="container">
+    <div class="container" id="content"></div>
+    <div id="encrypted-data" class="hidden-data">{payload}</div>
+    <script>
+        {DECRYPT_JS}
+        (function () {{
+            let page = null;
+            try {{
+                const key = JSON.parse(sessionStorage.getItem('page_keys') || '{{}}')[{json.dumps(name)}];
+                // A wrong key yields garbage, which fails to parse
+                page = key && JSON.parse(simple_decrypt(document.getElementById('encrypted-data').textContent.trim(), key));
+            }} catch (err) {{
+                page = null;
+            }}
+            if (!page) {{
+                window.location.href = '../index.html';
+                return;
+            }}
+            document.getElementById('content').innerHTML = page.html;
+            (function (data) {{ {render_js} }})(page.data);
+        }})();
+    </script>
+</body>
+</html>
+    """
+
+def generate_etf_detail_page(ticker, holdings_data, chinese_name, screened, key):
+    """
+    Generates a detailed HTML page for a specific ETF (content encrypted with its page key).
+    screened: {ticker: detail page name} of the screened stocks in this sector; they link to
+    their own detail pages.
+    """
+    screened = screened or {}
+    
+    # Format holdings table rows
+    holdings_rows = ""
+    for h in holdings_data:
+        symbol = h['symbol']
+        if symbol in screened:
+            symbol = f'<a href="{screened[symbol]}.html">{symbol}</a>'
+        holdings_rows += f"<tr><td>{symbol}</td><td>{h['name']}</td><td>{h['percent']:.2%}</td></tr>"
+
+    screened_section = ""
+    if screened:
+        links = " ".join(f'<a href="{name}.html">{t}</a>' for t, name in screened.items())
+        screened_section = f"<h3>篩選個股 (Screened Stocks)</h3><p>{links}</p>"
+        
+    body = f"""
         <a href="../index.html" class="back-link">← Back to Main Report</a>
         
         <h1>{ticker} - {chinese_name}</h1>
         
+        {screened_section}
+        
         <h3>Top 10 Holdings</h3>
         <table>
             <thead>
@@ -272,48 +380,191 @@ def generate_etf_detail_page(ticker, holdings_data, chinese_name):
                 {holdings_rows}
             </tbody>
         </table>
-    </div>
-</body>
-</html>
     """
-    return html
+    style = DETAIL_STYLE + """
+        th { background-color: #333; color: #4caf50; }
+        tr:hover { background-color: #383838; }
+        a { color: #64b5f6; text-decoration: none; font-weight: bold; margin-right: 10px; }
+"""
+    return _protected_page(ticker, f"{ticker} - {chinese_name}", body, key, style=style)
+
+def _fmt_num(value, fmt):
+    return format(value, fmt) if value is not None else "N/A"
+
+def generate_stock_detail_page(stock, name, key):
+    """
+    Generates a detailed HTML page for a screened stock (a stock entry of the report model),
+    encrypted with its page key. name is its file name, from stock_page_name.
+    """
+    ticker = stock['ticker']
+    sector = stock['sector']
+    close = stock['close']
+
+    def vs_close(ema):
+        # Distance of the close from an EMA
+        if close is None or not ema:
+            return "N/A"
+        return f"{close / ema - 1:+.2%}"
+
+    vol_ratio = "N/A"
+    if stock['current_vol'] is not None and stock['hist_vol']:
+        vol_ratio = f"{stock['current_vol'] / stock['hist_vol']:.2f}"
+
+    rows = [
+        ("收盤價 (Close)", _fmt_num(close, ".2f")),
+        ("50 EMA", f"{_fmt_num(stock['ema_50'], '.2f')} ({vs_close(stock['ema_50'])})"),
+        ("21 EMA", f"{_fmt_num(stock['ema_21'], '.2f')} ({vs_close(stock['ema_21'])})"),
+        ("5日波動 (Current Vol)", _fmt_pct(stock['current_vol'])),
+        ("20日波動 (Hist Vol)", _fmt_pct(stock['hist_vol'])),
+        ("波動比 (Vol Ratio)", vol_ratio),
+        ("波動收縮 (VCP)", "🔥 Tight" if stock['contracting'] else "Normal"),
+        ("回檔深度 (Contractions)", " → ".join(_fmt_pct(d) for d in stock.get('contraction_depths') or []) or "N/A"),
+        (f"4週 RS vs {sector}", _fmt_pct(stock['rs_sector_4w'])),
+        (f"12週 RS vs {sector}", _fmt_pct(stock['rs_sector_12w'])),
+        ("4週 RS vs SPY", _fmt_pct(stock.get('rs_spy_4w'))),
+        ("12週 RS vs SPY", _fmt_pct(stock.get('rs_spy_12w'))),
+        ("RS 百分位 (RS Rank)", _fmt_rank(stock)),
+        ("篩選分數 (Score)", f"{stock['score']} / 4"),
+        ("建議部位 (Allocation)", _fmt_pct(stock.get('allocation'))),
+        ("風險貢獻 (Risk Contribution)", _fmt_pct(stock.get('risk_contribution'))),
+    ]
+    table_rows = "".join(f"<tr><th>{k}</th><td>{v}</td></tr>" for k, v in rows)
+
+    body = f"""
+        <a href="../index.html" class="back-link">← Back to Main Report</a>
+        <a href="{sector}.html" class="back-link">← {sector}</a>
+        
+        <h1>{ticker}</h1>
+        
+        <table>
+            <tbody>
+                {table_rows}
+            </tbody>
+        </table>
+    """
+    style = DETAIL_STYLE + """
+        th { color: #4caf50; width: 40%; }
+"""
+    # The title is public: no ticker in it
+    return _protected_page(name, "個股 (Stock Detail)", body, key, style=style)
+
+def generate_rank_history_page(history, persistent, weeks, key):
+    """
+    Generates the sector rank-history page from the run archive, encrypted with its page key.
+    history: {ticker: DataFrame(run_date, rank, score)} as returned by archive.all_rank_history
+    (or the same columns as a dict of lists).
+    persistent: [{'ticker': ..., 'sector': ...}] as returned by archive.persistent_setups.
+    """
+    dates = sorted({d for df in history.values() for d in df['run_date']})
+    datasets = []
+    for ticker, df in history.items():
+        ranks = dict(zip(df['run_date'], df['rank']))
+        datasets.append({
+            'label': ticker,
+            'data': [ranks.get(d) for d in dates],
+            'spanGaps': True
+        })
+    chart_data = {'labels': dates, 'datasets': datasets}
+
+    persistent_rows = ""
+    for p in persistent or []:
+        persistent_rows += f"<tr><td>{p['ticker']}</td><td>{p['sector']}</td></tr>"
+    if not persistent_rows:
+        persistent_rows = "<tr><td colspan='2'>無 (None)</td></tr>"
+
+    body = f"""
+        <a href="../index.html" class="back-link">← Back to Main Report</a>
+
+        <h1>板塊排名歷史 (Rank History, {weeks} 週)</h1>
+        <div class="chart-container">
+            <canvas id="rankChart"></canvas>
+        </div>
+
+        <h3>連續 3 週 Score ≥ 2 的個股 (Persistent Setups)</h3>
+        <table>
+            <thead><tr><th>Ticker</th><th>板塊</th></tr></thead>
+            <tbody>{persistent_rows}</tbody>
+        </table>
+    """
+    style = DETAIL_STYLE + """
+        .container { max-width: 1000px; }
+        .chart-container { position: relative; height: 450px; width: 100%; margin-bottom: 30px; }
+        th { background-color: #333; color: #4caf50; }
+"""
+    render_js = """
+            new Chart(document.getElementById('rankChart').getContext('2d'), {
+                type: 'line',
+                data: data,
+                options: {
+                    responsive: true,
+                    maintainAspectRatio: false,
+                    scales: {
+                        y: { reverse: true, min: 1, ticks: { stepSize: 1, color: '#e0e0e0' }, grid: { color: '#444' } },
+                        x: { ticks: { color: '#e0e0e0' }, grid: { display: false } }
+                    },
+                    plugins: { legend: { labels: { color: '#e0e0e0' } } }
+                }
+            });
+"""
+    return _protected_page("history", "板塊排名歷史 (Rank History)", body, key, style=style, data=chart_data,
+                           render_js=render_js,
+                           head_extra='<script src="https://cdn.jsdelivr.net/npm/chart.js"></script>')
 
 def generate_html(report_text, pin, ranked_df=None, sector_results=None):
     """
     Generates a password-protected HTML file with Interactive DataTables.
     """
-    
-    # Prepare structured data if available
-    sectors_data = []
-    if ranked_df is not None:
-        df = ranked_df.copy()
-        # Ensure Ticker is a column
-        if 'Sector' not in df.columns:
-            df = df.reset_index()
-            # Assuming first col is Ticker if not named Sector
-            if df.columns[0] != 'Sector':
-                df.rename(columns={df.columns[0]: 'Sector'}, inplace=True)
-                
-        for i, row in df.iterrows():
-            ticker = row['Sector']
-            chinese_name = config.SECTOR_NAMES.get(ticker, ticker)
-            sectors_data.append({
-                'rank': i + 1,
-                'ticker': ticker,
-                'name': chinese_name,
-                'perf_4w': row['4w'] if pd.notnull(row['4w']) else 0,
-                'perf_12w': row['12w'] if pd.notnull(row['12w']) else 0,
-                'score': row['Score']
-            })
-            
+    model = report_model.build_report_model(ranked_df, sector_results)
+    return _html_page(encrypt_report(model, pin, report_text))
+
+def encrypt_report(model, pin, report_text=None, page_keys=None, stock_pages=None):
+    """
+    The index page's data (sectors, stocks, RRG, text report) as JSON, encrypted with the PIN.
+    page_keys: {page name: key} of the detail pages, handed to them through the session.
+    stock_pages: {ticker: page name} of the stock detail pages (stocks without one are not linked).
+    """
+    stock_pages = stock_pages or {}
+    if report_text is None:
+        report_text = render_discord(model)
+
+    # The page expects numbers, so missing performance values are shown as 0
+    sectors_data = [
+        {
+            'rank': s['rank'],
+            'ticker': s['ticker'],
+            'name': s['name'],
+            'perf_4w': s['perf_4w'] or 0,
+            'perf_12w': s['perf_12w'] or 0,
+            'score': s['score']
+        }
+        for s in model['sectors']
+    ]
+
+    # Screened stocks as compact rows (ticker, sector, score, RS rank, close, vol, weight, allocation,
+    # trend, detail page name): the page may carry thousands, so no per-row keys
+    stocks_data = [
+        [s['ticker'], s['sector'], s['score'], s.get('rs_rank'), s['close'], s['current_vol'], s['weight'],
+         s.get('allocation'), _trend_label(s, PLAIN_LABELS), stock_pages.get(s['ticker'])]
+        for s in model['stocks']
+    ]
+
     frontend_data = {
         'sectors': sectors_data,
-        'report_text': report_text
+        'stocks': stocks_data,
+        'rrg': model.get('rrg') or {'dates': [], 'tails': {}, 'quadrants': {}},
+        'report_text': report_text,
+        'page_keys': page_keys or {}
     }
     
     json_data = json.dumps(frontend_data)
-    encrypted_content = simple_encrypt(json_data, pin)
-    
+    return simple_encrypt(json_data, pin)
+
+
+def _html_page(encrypted_content="", data_url=None):
+    """
+    Builds the password-protected index page. The encrypted data is either embedded
+    or, with data_url, fetched when the page loads.
+    """
     html_template = f"""
 <!DOCTYPE html>
 <html lang="zh-TW">
@@ -384,6 +635,12 @@ def generate_html(report_text, pin, ranked_df=None, sector_results=None):
                 <canvas id="perfChart"></canvas>
             </div>
             
+            <h3>🔄 相對輪動圖 (Relative Rotation Graph)</h3>
+            <p id="rrg-dates" style="color: #aaa; font-size: 0.9rem;"></p>
+            <div class="chart-container" style="height: 500px;">
+                <canvas id="rrgChart"></canvas>
+            </div>
+
             <h3>📋 板塊輪動排名 (Rotation Ranking)</h3>
             <div class="table-container">
                 <table id="sector-table" class="display" style="width:100%">
@@ -400,6 +657,26 @@ def generate_html(report_text, pin, ranked_df=None, sector_results=None):
                     <tbody></tbody>
                 </table>
             </div>
+            <p><a href="pages/history.html">📈 板塊排名歷史 (Rank History)</a></p>
+
+            <h3>🔍 個股篩選 (Screened Stocks)</h3>
+            <div class="table-container">
+                <table id="stock-table" class="display" style="width:100%">
+                    <thead>
+                        <tr>
+                            <th>代碼</th>
+                            <th>板塊</th>
+                            <th>分數</th>
+                            <th>RS 百分位</th>
+                            <th>收盤價</th>
+                            <th>波動率</th>
+                            <th>權重</th>
+                            <th>建議部位</th>
+                            <th>趨勢</th>
+                        </tr>
+                    </thead>
+                </table>
+            </div>
             
             <hr style="margin: 30px 0; border-color: #444;">
             
@@ -410,82 +687,122 @@ def generate_html(report_text, pin, ranked_df=None, sector_results=None):
     
     <div id="encrypted-data" class="hidden-data">{encrypted_content}</div>
 
+    <!-- Decryption + JSON parsing run in a Web Worker so the page stays responsive with large reports -->
+    <script type="text/js-worker" id="decrypt-worker">
+        {DECRYPT_JS}
+
+        function decrypt_report(base64Text, pin) {{
+            // A wrong PIN yields garbage, which fails to parse
+            return JSON.parse(simple_decrypt(base64Text, pin));
+        }}
+
+        self.onmessage = function (e) {{
+            try {{
+                self.postMessage({{ ok: true, data: decrypt_report(e.data.encrypted, e.data.pin) }});
+            }} catch (err) {{
+                self.postMessage({{ ok: false, error: String(err) }});
+            }}
+        }};
+    </script>
+
     <script>
+        const workerSource = document.getElementById('decrypt-worker').textContent;
+
+        // Embedded, or a content-hashed data file (cacheable forever) fetched while the PIN is typed
+        const DATA_URL = {json.dumps(data_url)};
+        const encryptedPayload = DATA_URL
+            ? fetch(DATA_URL).then(r => {{ if (!r.ok) throw new Error(`HTTP ${{r.status}}`); return r.text(); }}).then(t => t.trim())
+            // textContent: innerText would force a layout of the (large) hidden payload
+            : Promise.resolve(document.getElementById('encrypted-data').textContent.trim());
+        let decryptWorker = null;
+
+        function decryptInBackground(encrypted, pin) {{
+            return new Promise((resolve, reject) => {{
+                if (!window.Worker) {{
+                    // Old browsers: same code on the main thread
+                    try {{
+                        resolve(new Function(workerSource + '; return decrypt_report;')()(encrypted, pin));
+                    }} catch (err) {{
+                        reject(err);
+                    }}
+                    return;
+                }}
+                if (!decryptWorker) {{
+                    decryptWorker = new Worker(URL.createObjectURL(new Blob([workerSource], {{ type: 'text/javascript' }})));
+                }}
+                decryptWorker.onmessage = e => e.data.ok ? resolve(e.data.data) : reject(new Error(e.data.error));
+                decryptWorker.postMessage({{ encrypted, pin }});
+            }});
+        }}
+
+        const pct = (v, digits) => `${{(v * 100).toFixed(digits)}}%`;
+        const signed = cls => (v, type) => type === 'display'
+            ? `<span class="${{cls(v) ? 'metric-pos' : 'metric-neg'}}">${{pct(v, 2)}}</span>` : v;
+
         function unlock() {{
             const pin = document.getElementById('pin-input').value;
-            const encryptedData = document.getElementById('encrypted-data').innerText;
             const errorMsg = document.getElementById('error-msg');
-            
-            try {{
-                const decryptedJSON = simple_decrypt(encryptedData, pin);
-                const data = JSON.parse(decryptedJSON);
-                
+
+            encryptedPayload.then(encrypted => decryptInBackground(encrypted, pin)).then(data => {{
                 // If parse successful, show content
                 document.getElementById('login-area').style.display = 'none';
                 document.getElementById('content-area').style.display = 'block';
-                
-                // Set session storage for detail pages
+                errorMsg.style.display = 'none';
+
+                // The detail pages decrypt themselves with their keys from the index data
                 sessionStorage.setItem('unlocked', 'true');
-                
+                sessionStorage.setItem('session_pin', pin);
+                sessionStorage.setItem('page_keys', JSON.stringify(data.page_keys || {{}}));
+
                 // Populate Raw Report
-                document.getElementById('raw-report').innerText = data.report_text;
-                
-                // Populate Table
-                const tableBody = document.querySelector('#sector-table tbody');
-                data.sectors.forEach(sector => {{
-                    const tr = document.createElement('tr');
-                    
-                    const p4Class = sector.perf_4w >= 0 ? 'metric-pos' : 'metric-neg';
-                    const p12Class = sector.perf_12w >= 0 ? 'metric-pos' : 'metric-neg';
-                    const scoreClass = sector.score > 0 ? 'metric-pos' : 'metric-neg';
-                    
-                    tr.innerHTML = `
-                        <td>${{sector.rank}}</td>
-                        <td><a href="pages/${{sector.ticker}}.html">${{sector.ticker}}</a></td>
-                        <td>${{sector.name}}</td>
-                        <td class="${{p4Class}}">${{(sector.perf_4w * 100).toFixed(2)}}%</td>
-                        <td class="${{p12Class}}">${{(sector.perf_12w * 100).toFixed(2)}}%</td>
-                        <td class="${{scoreClass}}"><strong>${{sector.score.toFixed(4)}}</strong></td>
-                    `;
-                    tableBody.appendChild(tr);
-                }});
-                
-                // Initialize DataTables
+                document.getElementById('raw-report').textContent = data.report_text;
+
+                // Tables are built by DataTables straight from the arrays (no per-row innerHTML)
                 $('#sector-table').DataTable({{
+                    data: data.sectors,
+                    columns: [
+                        {{ data: 'rank' }},
+                        {{ data: 'ticker', render: (t, type) => type === 'display' ? `<a href="pages/${{t}}.html">${{t}}</a>` : t }},
+                        {{ data: 'name' }},
+                        {{ data: 'perf_4w', render: signed(v => v >= 0) }},
+                        {{ data: 'perf_12w', render: signed(v => v >= 0) }},
+                        {{ data: 'score', render: (v, type) => type === 'display'
+                            ? `<strong class="${{v > 0 ? 'metric-pos' : 'metric-neg'}}">${{v.toFixed(4)}}</strong>` : v }}
+                    ],
                     paging: false,
                     searching: true,
                     info: false,
                     order: [[ 0, "asc" ]] // Sort by Rank by default
                 }});
-                
-                // Render Chart
-                renderChart(data.sectors);
-                
-                errorMsg.style.display = 'none';
-                
-            }} catch (e) {{
+
+                // deferRender: only the rows of the visible page get DOM nodes, so thousands of stocks stay cheap
+                $('#stock-table').DataTable({{
+                    data: data.stocks,
+                    deferRender: true,
+                    pageLength: 50,
+                    columns: [
+                        {{ render: (t, type, row) => type === 'display' && row[9] ? `<a href="pages/${{row[9]}}.html">${{t}}</a>` : t }},
+                        {{}},
+                        {{}},
+                        {{ render: (v, type) => type === 'display' && v != null ? v.toFixed(0) : v }},
+                        {{ render: (v, type) => type === 'display' && v != null ? v.toFixed(2) : v }},
+                        {{ render: (v, type) => type === 'display' && v != null ? pct(v, 2) : v }},
+                        {{ render: (v, type) => type === 'display' && v != null ? pct(v, 1) : v }},
+                        {{ render: (v, type) => type === 'display' && v != null ? pct(v, 1) : v }},
+                        {{}}
+                    ].map(c => Object.assign({{ defaultContent: '-' }}, c)),
+                    order: [[ 2, "desc" ]]
+                }});
+
+                // Charts after the tables are on screen
+                requestAnimationFrame(() => {{
+                    renderChart(data.sectors);
+                    renderRRG(data.rrg);
+                }});
+            }}).catch(e => {{
                 errorMsg.style.display = 'block';
                 console.error(e);
-            }}
-        }}
-
-        function simple_decrypt(base64Text, pin) {{
-            const encryptedBytes = Uint8Array.from(atob(base64Text), c => c.charCodeAt(0));
-            const encoder = new TextEncoder();
-            const pinBytes = encoder.encode(pin);
-            const keyBytes = new Uint8Array(encryptedBytes.length);
-            
-            for (let i = 0; i < encryptedBytes.length; i++) {{
-                keyBytes[i] = pinBytes[i % pinBytes.length];
-            }}
-            
-            const decryptedBytes = new Uint8Array(encryptedBytes.length);
-            for (let i = 0; i < encryptedBytes.length; i++) {{
-                decryptedBytes[i] = encryptedBytes[i] ^ keyBytes[i];
-            }}
-            
-            const decoder = new TextDecoder();
-            return decoder.decode(decryptedBytes);
+            }});
         }}
         
         function renderChart(sectors) {{
@@ -540,6 +857,67 @@ def generate_html(report_text, pin, ranked_df=None, sector_results=None):
             }});
         }}
         
+        function renderRRG(rrg) {{
+            const tickers = Object.keys(rrg.tails);
+            if (!tickers.length) return;
+            const dates = rrg.dates;
+            document.getElementById('rrg-dates').innerText =
+                `週線尾跡 ${{dates[0]}} → ${{dates[dates.length - 1]}}，最大的點為最新一週 (右上領先、右下轉弱、左下落後、左上改善)`;
+
+            // Quadrant backgrounds split at RS-Ratio = RS-Momentum = 100
+            const quadrantPlugin = {{
+                id: 'rrgQuadrants',
+                beforeDraw(chart) {{
+                    const {{ ctx, chartArea: a, scales: {{ x, y }} }} = chart;
+                    const cx = Math.min(Math.max(x.getPixelForValue(100), a.left), a.right);
+                    const cy = Math.min(Math.max(y.getPixelForValue(100), a.top), a.bottom);
+                    const fill = (color, x0, y0, x1, y1) => {{ ctx.fillStyle = color; ctx.fillRect(x0, y0, x1 - x0, y1 - y0); }};
+                    ctx.save();
+                    fill('rgba(76, 175, 80, 0.12)', cx, a.top, a.right, cy);      // leading
+                    fill('rgba(255, 193, 7, 0.12)', cx, cy, a.right, a.bottom);   // weakening
+                    fill('rgba(255, 82, 82, 0.12)', a.left, cy, cx, a.bottom);    // lagging
+                    fill('rgba(100, 181, 246, 0.12)', a.left, a.top, cx, cy);     // improving
+                    ctx.restore();
+                }}
+            }};
+
+            const datasets = tickers.map((ticker, i) => {{
+                const points = rrg.tails[ticker];
+                const color = `hsl(${{Math.round(i * 360 / tickers.length)}}, 70%, 60%)`;
+                return {{
+                    label: ticker,
+                    data: points.map(p => ({{ x: p[0], y: p[1] }})),
+                    showLine: true,
+                    borderColor: color,
+                    backgroundColor: color,
+                    borderWidth: 1.5,
+                    pointRadius: points.map((_, j) => j === points.length - 1 ? 6 : 2)
+                }};
+            }});
+
+            new Chart(document.getElementById('rrgChart').getContext('2d'), {{
+                type: 'scatter',
+                data: {{ datasets }},
+                plugins: [quadrantPlugin],
+                options: {{
+                    responsive: true,
+                    maintainAspectRatio: false,
+                    scales: {{
+                        x: {{ title: {{ display: true, text: 'RS-Ratio', color: '#e0e0e0' }}, grid: {{ color: '#444' }}, ticks: {{ color: '#e0e0e0' }} }},
+                        y: {{ title: {{ display: true, text: 'RS-Momentum', color: '#e0e0e0' }}, grid: {{ color: '#444' }}, ticks: {{ color: '#e0e0e0' }} }}
+                    }},
+                    plugins: {{
+                        legend: {{ labels: {{ color: '#e0e0e0' }} }},
+                        tooltip: {{
+                            callbacks: {{
+                                label: c => `${{c.dataset.label}} ${{dates[dates.length - c.dataset.data.length + c.dataIndex]}}: (${{c.parsed.x.toFixed(2)}}, ${{c.parsed.y.toFixed(2)}})`
+                            }}
+                        }}
+                    }}
+                }}
+            }});
+        }}
+
         // Auto-login via session
         if (sessionStorage.getItem('unlocked')) {{
              const storedPin = sessionStorage.getItem('session_pin');
@@ -561,109 +939,6 @@ def generate_html(report_text, pin, ranked_df=None, sector_results=None):
         }});
     </script>
 </body>
-</html>
-    """
-    return html_template
-    """
-    Generates a password-protected HTML file.
-    The content is encrypted with the PIN, so 'View Source' shows garbage.
-    """
-    encrypted_content = simple_encrypt(report_text, pin)
-    
-    html_template = f"""
-<!DOCTYPE html>
-<html lang="zh-TW">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Stock Watch Tower - Weekly Report</title>
-    <style>
-        body {{ font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; background-color: #1e1e1e; color: #e0e0e0; display: flex; justify-content: center; align-items: center; min-height: 100vh; margin: 0; }}
-        .container {{ background-color: #2d2d2d; padding: 2rem; border-radius: 10px; box-shadow: 0 4px 6px rgba(0,0,0,0.3); max-width: 800px; width: 100%; }}
-        h1 {{ text-align: center; color: #4caf50; }}
-        #login-area {{ text-align: center; }}
-        input {{ padding: 10px; font-size: 1.2rem; border-radius: 5px; border: 1px solid #444; background: #333; color: white; width: 150px; text-align: center; }}
-        button {{ padding: 10px 20px; font-size: 1.2rem; border-radius: 5px; border: none; background-color: #4caf50; color: white; cursor: pointer; margin-left: 10px; }}
-        button:hover {{ background-color: #45a049; }}
-        #content-area {{ white-space: pre-wrap; font-family: 'Consolas', 'Courier New', monospace; display: none; line-height: 1.5; }}
-        .error {{ color: #ff5252; margin-top: 10px; display: none; }}
-        pre {{ background: #111; padding: 15px; border-radius: 5px; overflow-x: auto; }}
-        .hidden-data {{ display: none; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>🔐 Weekly Analysis Report</h1>
-        
-        <div id="login-area">
-            <p>Please enter the 4-digit PIN from Discord to view the report.</p>
-            <input type="password" id="pin-input" maxlength="4" placeholder="PIN">
-            <button onclick="unlock()">Unlock</button>
-            <p class="error" id="error-msg">Incorrect PIN</p>
-        </div>
-
-        <div id="content-area"></div>
-    </div>
-    
-    <div id="encrypted-data" class="hidden-data">{encrypted_content}</div>
-
-    <script>
-        function unlock() {{
-            const pin = document.getElementById('pin-input').value;
-            const encryptedData = document.getElementById('encrypted-data').innerText;
-            const errorMsg = document.getElementById('error-msg');
-            
-            try {{
-                const decryptedHTML = simple_decrypt(encryptedData, pin);
-                
-                // Simple validation check: Report usually starts with specific headers
-                if (decryptedHTML.includes("每週板塊輪動監測")) {{
-                    document.getElementById('login-area').style.display = 'none';
-                    const contentArea = document.getElementById('content-area');
-                    contentArea.style.display = 'block';
-                    contentArea.innerHTML = '<pre>' + decryptedHTML + '</pre>';
-                    errorMsg.style.display = 'none';
-                }} else {{
-                    throw new Error("Decryption failed");
-                }}
-            }} catch (e) {{
-                errorMsg.style.display = 'block';
-                console.error(e);
-            }}
-        }}
-
-        function simple_decrypt(base64Text, pin) {{
-            // Decode Base64
-            const encryptedBytes = Uint8Array.from(atob(base64Text), c => c.charCodeAt(0));
-            
-            // Prepare Key Bytes
-            const encoder = new TextEncoder();
-            const pinBytes = encoder.encode(pin);
-            const keyBytes = new Uint8Array(encryptedBytes.length);
-            
-            for (let i = 0; i < encryptedBytes.length; i++) {{
-                keyBytes[i] = pinBytes[i % pinBytes.length];
-            }}
-            
-            // XOR Decrypt
-            const decryptedBytes = new Uint8Array(encryptedBytes.length);
-            for (let i = 0; i < encryptedBytes.length; i++) {{
-                decryptedBytes[i] = encryptedBytes[i] ^ keyBytes[i];
-            }}
-            
-            // Decode UTF-8
-            const decoder = new TextDecoder();
-            return decoder.decode(decryptedBytes);
-        }}
-        
-        // Allow Enter key
-        document.getElementById('pin-input').addEventListener('keypress', function (e) {{
-            if (e.key === 'Enter') {{
-                unlock();
-            }}
-        }});
-    </script>
-</body>
 </html>
     """
     return html_template
@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+import config
+
+# Point-in-time returns / RS / ranking.
+# ReturnIndex precomputes each ticker's cumulative log return on the trading calendar,
+# so "return as of date D over lookback L" is a searchsorted on the dates plus two
+# array lookups and a subtraction, for any D and L.
+
+
+def score_returns(returns_df, benchmark="SPY", tickers=None):
+    """
+    RS vs the benchmark for every period column, a composite Score (average of the
+    4w / 12w RS) and the ranking: the table analyzer.rank_sectors returns.
+    """
+    tickers = list(tickers) if tickers is not None else [t for t in returns_df.index if t != benchmark]
+    bench = returns_df.loc[benchmark]
+    df = returns_df.loc[tickers].copy()
+
+    df['RS_4w'] = df['4w'] - bench['4w']
+    df['RS_12w'] = df['12w'] - bench['12w']
+    # Composite Score: Simple average of the two RS metrics
+    df['Score'] = (df['RS_4w'] + df['RS_12w']) / 2
+
+    return df.sort_values(by='Score', ascending=False)
+
+
+class ReturnIndex:
+    """
+    Cumulative log returns of a price panel (dates x tickers, e.g. Close prices).
+
+        index = ReturnIndex(close)
+        index.returns("2025-06-30", 20)            # 20-bar returns as of a date
+        index.returns("2025-06-30", "12W")         # calendar lookback
+        index.rank("2025-06-30", sectors=config.SECTORS)
+
+    Dates between bars resolve to the last bar on or before them. A return is NaN when
+    the price at either end of its window is missing (no stale price is carried forward).
+    """
+    def __init__(self, prices):
+        if not prices.index.is_monotonic_increasing:
+            prices = prices.sort_index()
+        self.dates = prices.index.to_numpy(dtype="datetime64[ns]")
+        self.tickers = prices.columns.tolist()
+        self._index = pd.Index(self.tickers)
+        self._columns = {t: i for i, t in enumerate(self.tickers)}
+
+        log_prices = np.log(prices.to_numpy(dtype=float))
+        first = np.where(np.isnan(log_prices).all(axis=0), 0, np.argmax(~np.isnan(log_prices), axis=0))
+        # log(P_t / P_first): the cumulative log return since each ticker's first bar
+        self.cum = log_prices - log_prices[first, np.arange(log_prices.shape[1])]
+
+    def __len__(self):
+        return len(self.dates)
+
+    def row(self, date=None):
+        """
+        Row of the last bar on or before `date` (None = the last bar).
+        """
+        if date is None:
+            return len(self.dates) - 1
+        row = int(np.searchsorted(self.dates, np.datetime64(pd.Timestamp(date), "ns"), side="right")) - 1
+        if row < 0:
+            raise KeyError(f"{date} is before the first bar ({pd.Timestamp(self.dates[0]).date()})")
+        return row
+
+    def _start_row(self, end_row, lookback):
+        # int = bars back; anything else ('12W', '30D', pd.DateOffset(months=3)...) = calendar lookback
+        if isinstance(lookback, (int, np.integer)):
+            return end_row - int(lookback)
+        if isinstance(lookback, str):
+            try:
+                lookback = pd.Timedelta(lookback)
+            except ValueError:
+                lookback = pd.tseries.frequencies.to_offset(lookback)
+        start_date = pd.Timestamp(self.dates[end_row]) - lookback
+        return self.row(start_date) if start_date >= pd.Timestamp(self.dates[0]) else -1
+
+    def _cols(self, tickers):
+        if tickers is None:
+            return slice(None), self._index
+        tickers = list(tickers)
+        return [self._columns[t] for t in tickers], pd.Index(tickers)
+
+    def _log_returns(self, as_of, lookback, cols):
+        # The whole query: two rows of the index and a subtraction (None if the history is too short)
+        end = self.row(as_of)
+        start = self._start_row(end, lookback)
+        if start < 0:
+            return None
+        return self.cum[end, cols] - self.cum[start, cols]
+
+    def log_returns(self, as_of=None, lookback=20, tickers=None):
+        """
+        Log returns over `lookback` as of `as_of` (NaN where the history is too short).
+        """
+        cols, names = self._cols(tickers)
+        values = self._log_returns(as_of, lookback, cols)
+        return pd.Series(np.nan if values is None else values, index=names)
+
+    def returns(self, as_of=None, lookback=20, tickers=None):
+        """
+        Simple returns over `lookback` (bars, or a calendar offset like '4W') as of `as_of`.
+        """
+        return np.expm1(self.log_returns(as_of, lookback, tickers))
+
+    def returns_table(self, as_of=None, periods=None, tickers=None):
+        """
+        One column of returns per period ({name: lookback}, default config.PERIODS),
+        indexed by ticker. Periods without enough history are None.
+        """
+        periods = periods or config.PERIODS
+        cols, names = self._cols(tickers)
+        table = {}
+        for name, lookback in periods.items():
+            values = self._log_returns(as_of, lookback, cols)
+            table[name] = np.expm1(values) if values is not None else None
+        return pd.DataFrame(table, index=names)
+
+    def relative_strength(self, as_of=None, lookback=20, benchmark="SPY", tickers=None):
+        """
+        Return minus the benchmark's return over the same window.
+        """
+        bench = self.returns(as_of, lookback, [benchmark]).iloc[0]
+        return self.returns(as_of, lookback, tickers) - bench
+
+    def rank(self, as_of=None, periods=None, benchmark="SPY", sectors=None):
+        """
+        The sector ranking (see score_returns) as of any date.
+        """
+        sectors = list(sectors) if sectors is not None else [t for t in self.tickers if t != benchmark]
+        returns = self.returns_table(as_of, periods, sectors + [benchmark])
+        return score_returns(returns, benchmark, sectors)
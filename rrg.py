@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+# Relative Rotation Graph (JdK-style RS-Ratio / RS-Momentum).
+#
+#   rs          = 100 * sector / benchmark
+#   RS-Ratio    = 100 + rolling z-score of rs over `window` bars (trend of relative strength)
+#   RS-Momentum = 100 + rolling z-score of the `momentum`-bar rate of change of RS-Ratio
+#
+# Both are computed for every sector and every date at once on the (dates x sectors)
+# array. Above 100 on both axes is "leading", then clockwise: weakening, lagging, improving.
+
+WINDOW = 50
+MOMENTUM = 10
+TAIL_WEEKS = 8
+
+
+def _rolling_zscore(values, window):
+    """
+    Rolling (value - mean) / std over `window` rows of a 2-D array, via cumulative sums.
+    Rows without a full window are NaN.
+    """
+    n = values.shape[0]
+    out = np.full(values.shape, np.nan)
+    if n < window:
+        return out
+    filled = np.nan_to_num(values)
+    c1 = np.vstack([np.zeros(values.shape[1]), np.cumsum(filled, axis=0)])
+    c2 = np.vstack([np.zeros(values.shape[1]), np.cumsum(filled * filled, axis=0)])
+    counts = np.vstack([np.zeros(values.shape[1]), np.cumsum(~np.isnan(values), axis=0)])
+    s1 = c1[window:] - c1[:-window]
+    s2 = c2[window:] - c2[:-window]
+    k = counts[window:] - counts[:-window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = s1 / k
+        std = np.sqrt(np.maximum(s2 / k - mean * mean, 0))
+        z = (values[window - 1:] - mean) / std
+    z[k < window] = np.nan
+    out[window - 1:] = z
+    return out
+
+
+def compute_rrg(close, benchmark="SPY", sectors=None, window=WINDOW, momentum=MOMENTUM):
+    """
+    RS-Ratio and RS-Momentum of every sector vs the benchmark over the whole history.
+    close: Close prices (dates x tickers), including the benchmark.
+    Returns (rs_ratio, rs_momentum) DataFrames (dates x sectors).
+    """
+    sectors = list(sectors) if sectors is not None else [t for t in close.columns if t != benchmark]
+    prices = close[sectors].to_numpy(dtype=float)
+    bench = close[benchmark].to_numpy(dtype=float)[:, None]
+
+    rs = 100 * prices / bench
+    ratio = 100 + _rolling_zscore(rs, window)
+
+    roc = np.full(ratio.shape, np.nan)
+    roc[momentum:] = ratio[momentum:] / ratio[:-momentum] - 1
+    mom = 100 + _rolling_zscore(roc, window)
+
+    return (pd.DataFrame(ratio, index=close.index, columns=sectors),
+            pd.DataFrame(mom, index=close.index, columns=sectors))
+
+
+def quadrant(ratio, mom):
+    if ratio >= 100:
+        return "leading" if mom >= 100 else "weakening"
+    return "improving" if mom >= 100 else "lagging"
+
+
+def rrg_tails(close, benchmark="SPY", sectors=None, tail=TAIL_WEEKS, freq="W-FRI", **kwargs):
+    """
+    The last `tail` weekly points of every sector, compact enough to embed in the report:
+    {
+        'dates': ['2026-08-28', ...],
+        'tails': {'XLK': [[101.23, 99.87], ...], ...},   # [RS-Ratio, RS-Momentum], oldest first
+        'quadrants': {'XLK': 'leading', ...}             # of the latest point
+    }
+    Sectors without enough history are left out.
+    """
+    ratio, mom = compute_rrg(close, benchmark, sectors, **kwargs)
+    # Weekly points: the last bar of each week (the newest, possibly partial week included)
+    weeks = close.index.to_period(freq)
+    rows = np.append(np.nonzero(weeks[1:] != weeks[:-1])[0], len(weeks) - 1)[-tail:]
+    ratio_w = ratio.to_numpy()[rows]
+    mom_w = mom.to_numpy()[rows]
+
+    tails, quadrants = {}, {}
+    for i, ticker in enumerate(ratio.columns):
+        points = np.column_stack([ratio_w[:, i], mom_w[:, i]])
+        points = points[~np.isnan(points).any(axis=1)]
+        if not len(points):
+            continue
+        tails[ticker] = np.round(points, 2).tolist()
+        quadrants[ticker] = quadrant(*points[-1])
+    return {
+        "dates": [d.strftime("%Y-%m-%d") for d in close.index[rows]],
+        "tails": tails,
+        "quadrants": quadrants,
+    }
@@ -0,0 +1,270 @@
+"""
+Streaming stock screen for large universes.
+
+Tickers flow through fetch -> validate (validation.py) -> indicators -> score one chunk at a time:
+each chunk's price frame is dropped as soon as it has been scored, so peak memory
+depends on the chunk size (derived from a memory budget), not on the universe size.
+Only a compact result dict per ticker is kept.
+
+    python screener.py --tickers-file universe.txt --period 10y --budget-mb 256 --out screen.csv
+    python screener.py --synthetic 5000 --period 10y      # offline, synthetic prices
+
+With --store, every chunk is written into a memory-mapped price store (price_store.py)
+instead, and the screen then runs across worker processes that map the store
+read-only; without a ticker source it re-screens the stored universe:
+
+    python screener.py --tickers-file universe.txt --store .state/prices --workers 4
+    python screener.py --store .state/prices --workers 4
+"""
+import argparse
+import csv
+import gc
+import sys
+import time
+
+import config
+import instrumentation
+
+# Bytes held per price value while a chunk is processed: the downloaded frame, the
+# per-ticker slice and the indicator columns are all alive at once.
+BYTES_PER_VALUE = 8 * 4
+FIELDS_PER_TICKER = 5  # Open, High, Low, Close, Volume
+
+
+def period_days(period):
+    """
+    Approximate trading days in a yfinance period string ('6mo', '1y', '10y', '30d').
+    """
+    period = period.strip().lower()
+    if period.endswith("mo"):
+        return int(period[:-2]) * 21
+    if period.endswith("y"):
+        return int(period[:-1]) * 252
+    if period.endswith("d"):
+        return int(period[:-1])
+    raise ValueError(f"Unsupported period: {period}")
+
+
+def chunk_size_for_budget(budget_mb, period, max_chunk=500):
+    """
+    How many tickers fit in one chunk for the given memory budget.
+    """
+    per_ticker = period_days(period) * FIELDS_PER_TICKER * BYTES_PER_VALUE
+    return max(1, min(max_chunk, int(budget_mb * 1024 * 1024 // per_ticker)))
+
+
+def fetch_chunks(tickers, period, chunk_size, fetch=None, as_of=None):
+    """
+    Yields (chunk_tickers, frame) with one downloaded and validated frame per chunk.
+    Tickers failing the data checks are re-fetched once, then dropped.
+    """
+    import validation
+
+    if fetch is None:
+        import data_fetcher
+        fetch = data_fetcher.fetch_data
+    for start in range(0, len(tickers), chunk_size):
+        chunk = tickers[start:start + chunk_size]
+        data = fetch(chunk, period=period)
+        if data is not None and not data.empty:
+            data, _ = validation.validate_and_refetch(data, fetch, period, min_bars=50, as_of=as_of, tickers=chunk)
+        yield chunk, data
+        # Let go of the chunk before fetching the next one: the consumer drops its reference
+        # when it is done, and this frame would otherwise stay alive during the next download
+        del data
+
+
+def ticker_frames(chunks):
+    """
+    Yields (ticker, frame, pattern, returns) for every ticker that passed validation,
+    where pattern is its row of vcp.detect_panel and returns its row of
+    analyzer.calculate_returns (each run once per chunk, on the chunk's calendar).
+    The chunk frame is released before the next chunk is fetched.
+    """
+    import analyzer
+    import vcp
+
+    for chunk, data in chunks:
+        if data is None or data.empty:
+            continue
+        patterns = vcp.detect_panel(data)
+        returns = analyzer.calculate_returns(data["Close"])
+        present = set(data.columns.get_level_values(1))
+        for ticker in chunk:
+            if ticker in present:
+                # Drop the rows before the ticker's first bar (the panel spans every ticker's calendar)
+                yield (ticker, data.xs(ticker, axis=1, level=1).dropna(subset=["Close"]), patterns.loc[ticker],
+                       returns.loc[ticker])
+        del data, patterns, returns
+        gc.collect()
+
+
+def _compact(res):
+    # Plain Python scalars only: a few hundred bytes per ticker
+    return {k: v.item() if hasattr(v, "item") else v for k, v in res.items()}
+
+
+def screen_frames(frames):
+    """
+    Yields (ticker, result) with the technical setup and the 4w / 12w returns of every frame.
+    """
+    for ticker, df, pattern, returns in frames:
+        try:
+            res = _score_frame(df, pattern, returns)
+        except Exception as e:
+            print(f"  Error analyzing {ticker}: {e}")
+            continue
+        if res:
+            instrumentation.count("tickers_processed")
+            yield ticker, res
+
+
+def _score_frame(df, pattern, returns):
+    # returns: the ticker's row of analyzer.calculate_returns, computed on the panel the
+    # same way as for the report (NaN across a gap at either end of a period)
+    import analyzer
+    import pandas as pd
+
+    res = analyzer.check_technical_setup(df, pattern)
+    if not res:
+        return None
+    for period_name in config.PERIODS:
+        value = returns[period_name]
+        res[period_name] = None if pd.isna(value) else value
+    return _compact(res)
+
+
+def _screen_chunk(store, start, stop):
+    # Runs in a worker process: the chunk's arrays are views of the mapped store
+    import pandas as pd
+    import analyzer
+    import vcp
+
+    arrays = store.arrays(start, stop)
+    found = vcp.detect(arrays["High"], arrays["Low"], arrays["Volume"])
+    returns = analyzer.calculate_returns(pd.DataFrame(arrays["Close"], index=store.dates,
+                                                      columns=store.tickers[start:stop]))
+    results = {}
+    for i, ticker in enumerate(store.tickers[start:stop]):
+        df = pd.DataFrame({name: arrays[name][:, i] for name in store.fields}, index=store.dates)
+        df = df.dropna(subset=["Close"])
+        if df.empty:
+            continue
+        try:
+            res = _score_frame(df, vcp.pattern_at(found, i), returns.loc[ticker])
+        except Exception as e:
+            print(f"  Error analyzing {ticker}: {e}")
+            continue
+        if res:
+            results[ticker] = res
+    return results
+
+
+def screen_store(path, workers=None, chunk_size=500, tickers=None):
+    """
+    Screens the tickers of the price store at `path` across `workers` processes
+    (only those in `tickers`, if given). Returns {ticker: result} like stream_screen.
+    """
+    import price_store
+
+    results = {}
+    for chunk in price_store.map_chunks(path, _screen_chunk, chunk_size=chunk_size, workers=workers):
+        results.update(chunk)
+    if tickers is not None:
+        tickers = set(tickers)
+        results = {t: res for t, res in results.items() if t in tickers}
+    instrumentation.count("tickers_processed", len(results))
+    return results
+
+
+def stream_screen(tickers, period="1y", budget_mb=None, chunk_size=None, fetch=None, as_of=None, store=None,
+                  workers=None):
+    """
+    Screens `tickers` in chunks sized for budget_mb (default config.SCREEN_MEMORY_BUDGET_MB).
+    as_of: date the newest bars are checked against (see validation.validate_panel).
+    store: price store directory; the chunks are written there (new bars appended in
+    place) and screened from it across `workers` processes.
+    Returns {ticker: result}, where result holds check_technical_setup's fields plus
+    the '4w' / '12w' returns.
+    """
+    budget_mb = budget_mb or config.SCREEN_MEMORY_BUDGET_MB
+    chunk_size = chunk_size or chunk_size_for_budget(budget_mb, period)
+    tickers = list(tickers)
+    print(f"Streaming screen of {len(tickers)} tickers ({period}) in chunks of {chunk_size} "
+          f"(budget {budget_mb} MB)...")
+
+    if store:
+        import price_store
+
+        # Tickers failing validation this time are not screened on their older stored bars
+        fetched = []
+        for chunk, data in fetch_chunks(tickers, period, chunk_size, fetch, as_of):
+            if data is None or data.empty:
+                continue
+            price_store.write_panel(store, data, tickers=tickers)
+            fetched.extend(set(data.columns.get_level_values(1)))
+            del data
+        return screen_store(store, workers, tickers=fetched)
+
+    results = {}
+    pipeline = screen_frames(ticker_frames(fetch_chunks(tickers, period, chunk_size, fetch, as_of)))
+    for ticker, res in pipeline:
+        results[ticker] = res
+    return results
+
+
+def write_results(results, path):
+    """
+    Writes the results sorted by Score (then 12w return) to CSV.
+    """
+    fields = sorted({k for res in results.values() for k in res})
+    rows = sorted(results.items(), key=lambda kv: (kv[1]["Score"], kv[1].get("12w") or 0), reverse=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Ticker"] + fields)
+        for ticker, res in rows:
+            writer.writerow([ticker] + [res.get(k) for k in fields])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bounded-memory stock screen over a large universe")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--tickers-file", help="File with one ticker per line")
+    source.add_argument("--synthetic", type=int, metavar="N", help="Screen N synthetic tickers (offline)")
+    parser.add_argument("--period", default="1y", help="History to fetch (yfinance period, e.g. 1y, 10y)")
+    parser.add_argument("--budget-mb", type=float, default=config.SCREEN_MEMORY_BUDGET_MB,
+                        help="Memory budget for price data in flight")
+    parser.add_argument("--chunk-size", type=int, help="Tickers per chunk (overrides the budget)")
+    parser.add_argument("--out", default="screen.csv", help="CSV output path")
+    parser.add_argument("--store", help="Price store directory (see price_store.py); alone, re-screens it")
+    parser.add_argument("--workers", type=int, help="Worker processes for --store (default: one per CPU)")
+    args = parser.parse_args(argv)
+    if not (args.tickers_file or args.synthetic or args.store):
+        parser.error("one of --tickers-file, --synthetic or --store is required")
+
+    fetch, as_of = None, time.strftime("%Y-%m-%d")
+    start = time.perf_counter()
+    if not (args.tickers_file or args.synthetic):
+        import price_store
+        tickers = price_store.open_store(args.store).tickers
+        results = screen_store(args.store, args.workers)
+    elif args.synthetic:
+        import synthetic
+        tickers = synthetic.make_tickers(args.synthetic)[:-1]  # without SPY
+        fetch, as_of = synthetic.fetch_data, None
+    else:
+        with open(args.tickers_file, encoding="utf-8") as f:
+            tickers = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    if args.tickers_file or args.synthetic:
+        results = stream_screen(tickers, args.period, args.budget_mb, args.chunk_size, fetch, as_of, args.store,
+                                args.workers)
+    write_results(results, args.out)
+    passed = sum(1 for res in results.values() if res["Score"] >= 2)
+    print(f"Screened {len(results)}/{len(tickers)} tickers in {time.perf_counter() - start:.1f}s, "
+          f"{passed} with Score >= 2. Peak RSS {instrumentation.peak_rss_mb()} MB. Results: {args.out}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
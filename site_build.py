@@ -0,0 +1,244 @@
+"""
+Build directory for the published site (config.SITE_DIR) and its manifest.
+
+Data files get content-hashed names (data/report.3f2a9c0d1b7e.txt): a new version is a
+new URL, so browsers and proxies can cache them forever. HTML pages keep stable names
+(they are linked from notifications and bookmarks) and are only rewritten when their
+content changed. manifest.json maps every logical name to its file and sha256, so a
+deploy or a consumer only has to transfer the entries whose hash changed:
+
+    python site_build.py diff old_manifest.json site/manifest.json
+    python site_build.py pull https://xzonisy.github.io/stock_watch_tower/ mirror/
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import secrets
+import sys
+import urllib.request
+
+import config
+
+MANIFEST_NAME = "manifest.json"
+HASH_LENGTH = 12
+
+
+def content_hash(content):
+    return hashlib.sha256(content).hexdigest()
+
+
+def hashed_path(logical, content):
+    """
+    'data/report.txt' -> 'data/report.<first 12 hex of sha256>.txt'
+    """
+    stem, ext = os.path.splitext(logical)
+    return f"{stem}.{content_hash(content)[:HASH_LENGTH]}{ext}"
+
+
+def _write_atomic(path, content):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def write_hashed(site_dir, logical, content):
+    """
+    Writes content under its content-hashed name (once: the file is immutable).
+    Returns the path relative to site_dir.
+    """
+    rel_path = hashed_path(logical, content)
+    path = os.path.join(site_dir, rel_path)
+    if not os.path.exists(path):
+        _write_atomic(path, content)
+    return rel_path
+
+
+def write_file(site_dir, rel_path, content):
+    """
+    Writes a stable-named file only if its content changed. Returns True if written.
+    """
+    path = os.path.join(site_dir, rel_path)
+    try:
+        with open(path, "rb") as f:
+            if f.read() == content:
+                return False
+    except FileNotFoundError:
+        pass
+    _write_atomic(path, content)
+    return True
+
+
+def load_secret(path=None):
+    """
+    The site secret (hex string) from path (default config.SITE_SECRET_PATH), created on
+    first use. Losing it only renames and re-keys the detail pages once.
+    """
+    path = path or config.SITE_SECRET_PATH
+    try:
+        with open(path, encoding="utf-8") as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+    except FileNotFoundError:
+        pass
+    secret = secrets.token_hex(32)
+    _write_atomic(path, secret.encode("utf-8"))
+    return secret
+
+
+def load_manifest(path):
+    """
+    Reads a manifest (a site directory or the manifest file itself). Missing -> empty manifest.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, MANIFEST_NAME)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"files": {}}
+
+
+def build_manifest(site_dir, files):
+    """
+    files: {logical name: path relative to site_dir}.
+    Returns {'generated_at': ..., 'files': {logical: {'path', 'sha256', 'size'}}}.
+    """
+    entries = {}
+    for logical, rel_path in sorted(files.items()):
+        with open(os.path.join(site_dir, rel_path), "rb") as f:
+            content = f.read()
+        entries[logical] = {"path": rel_path.replace(os.sep, "/"), "sha256": content_hash(content), "size": len(content)}
+    return {"generated_at": datetime.datetime.now().isoformat(timespec="seconds"), "files": entries}
+
+
+def diff_manifests(old, new):
+    """
+    Logical names added / changed / removed between two manifests, plus the unchanged count
+    and the bytes a deploy has to transfer.
+    """
+    old_files, new_files = old.get("files", {}), new.get("files", {})
+    added = [k for k in new_files if k not in old_files]
+    changed = [k for k in new_files if k in old_files and new_files[k]["sha256"] != old_files[k]["sha256"]]
+    removed = [k for k in old_files if k not in new_files]
+    return {
+        "added": added,
+        "changed": changed,
+        "removed": removed,
+        "unchanged": len(new_files) - len(added) - len(changed),
+        "transfer_bytes": sum(new_files[k]["size"] for k in added + changed),
+    }
+
+
+def prune(site_dir, manifest, previous=None):
+    """
+    Deletes files no manifest entry points to. The previous manifest's hashed data files
+    are kept one more run, so a page loaded before the deploy can still fetch its data.
+    Returns the removed paths.
+    """
+    keep = {MANIFEST_NAME}
+    keep.update(e["path"] for e in manifest["files"].values())
+    for logical, entry in (previous or {}).get("files", {}).items():
+        if entry["path"] != logical:  # hashed name
+            keep.add(entry["path"])
+
+    removed = []
+    for root, _, names in os.walk(site_dir):
+        for name in names:
+            rel_path = os.path.relpath(os.path.join(root, name), site_dir).replace(os.sep, "/")
+            if rel_path not in keep:
+                os.remove(os.path.join(root, name))
+                removed.append(rel_path)
+    return removed
+
+
+def finalize(site_dir, files):
+    """
+    Writes the manifest for `files` ({logical: path}), prunes stale files and returns
+    the diff against the previous build.
+    """
+    previous = load_manifest(site_dir)
+    manifest = build_manifest(site_dir, files)
+    _write_atomic(os.path.join(site_dir, MANIFEST_NAME), json.dumps(manifest, indent=1).encode("utf-8"))
+    removed = prune(site_dir, manifest, previous)
+    changes = diff_manifests(previous, manifest)
+    print(f"Site: {len(changes['added'])} added, {len(changes['changed'])} changed, "
+          f"{len(changes['removed'])} removed, {changes['unchanged']} unchanged "
+          f"({changes['transfer_bytes'] / 1024:.0f} KB to transfer, {len(removed)} stale files deleted).")
+    return changes
+
+
+def _local_path(dest_dir, rel_path):
+    """
+    dest_dir/rel_path for a path read from a manifest. Absolute paths and paths that
+    resolve outside dest_dir (../) raise ValueError.
+    """
+    if os.path.isabs(rel_path) or os.path.splitdrive(rel_path)[0] or rel_path.startswith(("/", "\\")):
+        raise ValueError(f"Manifest path is absolute: {rel_path!r}")
+    root = os.path.realpath(dest_dir)
+    path = os.path.realpath(os.path.join(root, rel_path))
+    if os.path.commonpath([root, path]) != root or path == root:
+        raise ValueError(f"Manifest path leaves {dest_dir}: {rel_path!r}")
+    return path
+
+
+def pull(base_url, dest_dir):
+    """
+    Mirrors a published site into dest_dir, downloading only the files whose hash
+    differs from the local copy's manifest. Returns the diff.
+    Only files the previous local manifest listed are ever deleted, so pulling into a
+    directory that holds other files leaves them alone.
+    """
+    base_url = base_url.rstrip("/") + "/"
+    with urllib.request.urlopen(base_url + MANIFEST_NAME, timeout=30) as resp:
+        remote = json.loads(resp.read().decode("utf-8"))
+    local = load_manifest(dest_dir)
+    # Every path is checked before anything is written
+    targets = {logical: _local_path(dest_dir, entry["path"]) for logical, entry in remote["files"].items()}
+    stale = {_local_path(dest_dir, e["path"]) for e in local.get("files", {}).values()} - set(targets.values())
+
+    changes = diff_manifests(local, remote)
+    for logical in changes["added"] + changes["changed"]:
+        entry = remote["files"][logical]
+        with urllib.request.urlopen(base_url + entry["path"], timeout=30) as resp:
+            content = resp.read()
+        if content_hash(content) != entry["sha256"]:
+            raise ValueError(f"Hash mismatch for {entry['path']}")
+        _write_atomic(targets[logical], content)
+    _write_atomic(os.path.join(dest_dir, MANIFEST_NAME), json.dumps(remote, indent=1).encode("utf-8"))
+    for path in stale:
+        if os.path.isfile(path):
+            os.remove(path)
+    return changes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Content-addressed site manifest tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("diff", help="Show what changed between two manifests")
+    p.add_argument("old")
+    p.add_argument("new", nargs="?", default=config.SITE_DIR)
+    p = sub.add_parser("pull", help="Mirror a published site, fetching only changed files")
+    p.add_argument("url")
+    p.add_argument("dest")
+    args = parser.parse_args(argv)
+
+    if args.command == "diff":
+        changes = diff_manifests(load_manifest(args.old), load_manifest(args.new))
+    else:
+        changes = pull(args.url, args.dest)
+    for key in ("added", "changed", "removed"):
+        for name in changes[key]:
+            print(f"{key:8s} {name}")
+    print(f"{changes['unchanged']} unchanged, {changes['transfer_bytes'] / 1024:.0f} KB to transfer")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,228 @@
+import numpy as np
+import pandas as pd
+import config
+
+# Deterministic synthetic market data for benchmarks and offline runs.
+# The same (n_tickers, years, seed) always produces the same panel.
+
+TRADING_DAYS_PER_YEAR = 252
+END_DATE = "2025-12-31"
+
+
+def trading_days(years):
+    """
+    Business-day index of `years` x 252 days ending on END_DATE.
+    """
+    return pd.bdate_range(end=END_DATE, periods=int(years * TRADING_DAYS_PER_YEAR))
+
+
+def make_tickers(n_tickers):
+    """
+    Ticker names for a universe of n_tickers. 11 gives the real sector ETFs; SPY is always included.
+    """
+    if n_tickers <= len(config.SECTORS):
+        return config.SECTORS[:n_tickers] + ["SPY"]
+    return [f"S{i:04d}" for i in range(n_tickers)] + ["SPY"]
+
+
+def close_panel(n_tickers, years, seed=0):
+    """
+    Close prices (dates x tickers): geometric random walks, float64.
+    """
+    rng = np.random.default_rng(seed)
+    index = trading_days(years)
+    tickers = make_tickers(n_tickers)
+    drift = rng.normal(0.0003, 0.0002, len(tickers))
+    vol = rng.uniform(0.008, 0.03, len(tickers))
+    log_ret = rng.standard_normal((len(index), len(tickers))) * vol + drift
+    close = 100 * np.exp(np.cumsum(log_ret, axis=0))
+    return pd.DataFrame(close, index=index, columns=tickers)
+
+
+def ohlcv_panel(n_tickers, years, seed=0):
+    """
+    OHLCV panel with yfinance's layout: MultiIndex columns (Price, Ticker).
+    """
+    rng = np.random.default_rng(seed + 1)
+    close = close_panel(n_tickers, years, seed)
+    values = close.to_numpy()
+    spread = rng.uniform(0.002, 0.03, values.shape)
+    high = values * (1 + spread * rng.uniform(0.3, 1.0, values.shape))
+    low = values * (1 - spread * rng.uniform(0.3, 1.0, values.shape))
+    open_ = low + (high - low) * rng.uniform(0, 1, values.shape)
+    volume = rng.lognormal(13, 0.5, values.shape).round()
+
+    fields = {"Close": values, "High": high, "Low": low, "Open": open_, "Volume": volume}
+    columns = pd.MultiIndex.from_product([list(fields), close.columns], names=["Price", "Ticker"])
+    data = np.concatenate(list(fields.values()), axis=1)
+    return pd.DataFrame(data, index=close.index, columns=columns)
+
+
+def ticker_frame(panel, ticker):
+    """
+    Single-ticker OHLCV frame (as check_technical_setup expects) from an ohlcv_panel.
+    """
+    return panel.xs(ticker, axis=1, level=1).copy()
+
+
+def fetch_data(tickers, period="1y", end=END_DATE):
+    """
+    Offline stand-in for data_fetcher.fetch_data: an OHLCV panel for exactly these tickers,
+    with `period` of business days up to `end`.
+    Each ticker's series depends only on its name, so results do not change with how a
+    universe is split into chunks.
+    """
+    import zlib
+    from screener import period_days
+
+    index = pd.bdate_range(end=end, periods=period_days(period))
+    fields = {name: np.empty((len(index), len(tickers))) for name in ("Close", "High", "Low", "Open", "Volume")}
+    for i, ticker in enumerate(tickers):
+        rng = np.random.default_rng(zlib.crc32(ticker.encode()))
+        drift, vol = rng.normal(0.0003, 0.0002), rng.uniform(0.008, 0.03)
+        close = 100 * np.exp(np.cumsum(rng.standard_normal(len(index)) * vol + drift))
+        spread = rng.uniform(0.002, 0.03, len(index))
+        fields["Close"][:, i] = close
+        fields["High"][:, i] = close * (1 + spread * rng.uniform(0.3, 1.0, len(index)))
+        fields["Low"][:, i] = close * (1 - spread * rng.uniform(0.3, 1.0, len(index)))
+        fields["Open"][:, i] = fields["Low"][:, i] + (fields["High"][:, i] - fields["Low"][:, i]) * rng.uniform(0, 1, len(index))
+        fields["Volume"][:, i] = rng.lognormal(13, 0.5, len(index)).round()
+
+    columns = pd.MultiIndex.from_product([list(fields), list(tickers)], names=["Price", "Ticker"])
+    return pd.DataFrame(np.concatenate(list(fields.values()), axis=1), index=index, columns=columns)
+
+
+class SyntheticMarket:
+    """
+    A deterministic synthetic market for end-to-end runs (see loadtest.py): n_sectors
+    sector ETFs plus SPY / QQQ, holdings_per_sector stocks per ETF ('XLK-007') and
+    `years` of OHLCV history ending on `end`.
+
+    Prices come from a factor model, so stocks move with their sector and sectors with
+    the market: log return = beta x (market + sector factor) + the stock's own noise.
+    Like real downloads, the data has problems:
+      gap_rate     share of days with an overnight gap (4-12%)
+      halt_rate    share of tickers with one trading halt of 1-9 days (missing bars)
+      split_rate   share of tickers with a split; the first download of such a ticker
+                   is unadjusted, a re-fetch returns the adjusted series (as Yahoo does
+                   once the adjustment lands), so validation's re-fetch path is exercised
+    Every ticker's series depends only on the seed and its name, not on how the
+    universe is split into downloads. fetch_data / fetch_all_etf_holdings are drop-ins
+    for data_fetcher's.
+    """
+    def __init__(self, n_sectors=11, holdings_per_sector=10, years=2, seed=0, end=END_DATE,
+                 gap_rate=0.002, halt_rate=0.02, split_rate=0.01):
+        import threading
+
+        if n_sectors <= len(config.SECTORS):
+            self.sectors = config.SECTORS[:n_sectors]
+        else:
+            self.sectors = [f"XS{i:04d}" for i in range(n_sectors)]
+        self.holdings_per_sector = holdings_per_sector
+        self.seed = seed
+        self.gap_rate = gap_rate
+        self.halt_rate = halt_rate
+        self.split_rate = split_rate
+        self.index = pd.bdate_range(end=end, periods=int(years * TRADING_DAYS_PER_YEAR))
+
+        rng = np.random.default_rng(seed)
+        self._market = rng.standard_normal(len(self.index)) * 0.01 + 0.0003
+        self._sector_factors = {}
+        self._served = set()  # tickers downloaded at least once (their splits are adjusted from now on)
+        self._lock = threading.Lock()
+
+    def _rng(self, name):
+        import zlib
+        return np.random.default_rng([self.seed, zlib.crc32(name.encode())])
+
+    def holdings_of(self, etf):
+        return [f"{etf}-{j:03d}" for j in range(self.holdings_per_sector)]
+
+    def _sector_factor(self, sector):
+        with self._lock:
+            if sector not in self._sector_factors:
+                self._sector_factors[sector] = self._rng(sector).standard_normal(len(self.index)) * 0.008
+            return self._sector_factors[sector]
+
+    def _log_returns(self, ticker, rng):
+        n = len(self.index)
+        if ticker == "SPY":
+            return self._market
+        if ticker == "QQQ":
+            return 1.15 * self._market + rng.standard_normal(n) * 0.004
+        if ticker in self.sectors:
+            return self._market + self._sector_factor(ticker) + rng.standard_normal(n) * 0.003
+        sector = ticker.rpartition("-")[0]
+        common = self._market + (self._sector_factor(sector) if sector in self.sectors else 0)
+        return rng.uniform(0.7, 1.4) * common + rng.standard_normal(n) * rng.uniform(0.008, 0.025)
+
+    def _series(self, ticker):
+        """
+        (full calendar x 5) adjusted OHLCV of a ticker, and its split (day, ratio) or None.
+        """
+        rng = self._rng(ticker)
+        n = len(self.index)
+        log_ret = self._log_returns(ticker, rng)
+
+        # Overnight moves, including the occasional gap; the rest of the day's move is intraday
+        overnight = rng.standard_normal(n) * 0.003
+        gaps = rng.random(n) < self.gap_rate
+        overnight[gaps] += rng.choice([-1, 1], gaps.sum()) * rng.uniform(0.04, 0.12, gaps.sum())
+        log_ret = log_ret + overnight
+
+        close = rng.uniform(20, 300) * np.exp(np.cumsum(log_ret))
+        open_ = np.concatenate([[close[0]], close[:-1]]) * np.exp(overnight)
+        spread = rng.uniform(0.002, 0.02, n)
+        high = np.maximum(open_, close) * (1 + spread * rng.uniform(0.2, 1.0, n))
+        low = np.minimum(open_, close) * (1 - spread * rng.uniform(0.2, 1.0, n))
+        volume = (rng.lognormal(13, 0.4, n) * (1 + 20 * np.abs(log_ret))).round()
+        values = np.column_stack([close, high, low, open_, volume])
+
+        # A halt: no bars for a few days, then the price reopens wherever the returns took it
+        if rng.random() < self.halt_rate:
+            start = rng.integers(0, n)
+            values[start:start + rng.integers(1, 10)] = np.nan
+
+        split = None
+        if rng.random() < self.split_rate:
+            split = (int(rng.integers(n // 2, n)), float(rng.choice([2, 3, 4, 0.1])))
+        return values, split
+
+    def fetch_data(self, tickers, period="1y", retries=3):
+        """
+        OHLCV panel with (Price, Ticker) columns, like data_fetcher.fetch_data.
+        """
+        from screener import period_days
+
+        days = min(period_days(period), len(self.index))
+        tickers = list(dict.fromkeys(tickers))
+        data = np.empty((days, 5, len(tickers)))
+        for i, ticker in enumerate(tickers):
+            values, split = self._series(ticker)
+            with self._lock:
+                first_download = ticker not in self._served
+                self._served.add(ticker)
+            if split and first_download:
+                day, ratio = split
+                values[:day, :4] *= ratio
+                values[:day, 4] /= ratio
+            data[:, :, i] = values[-days:]
+
+        fields = ["Close", "High", "Low", "Open", "Volume"]
+        columns = pd.MultiIndex.from_product([fields, tickers], names=["Price", "Ticker"])
+        df = pd.DataFrame(data.reshape(days, -1), index=self.index[-days:], columns=columns)
+        # Like yf.download: dates on which no ticker traded are not in the panel
+        return df.dropna(how="all")
+
+    def fetch_all_etf_holdings(self, tickers):
+        """
+        {etf: [{'symbol', 'name', 'percent'}]} like data_fetcher.fetch_all_etf_holdings.
+        Weights fall off as 1 / rank and add up to 60% (top holdings, not the whole fund).
+        """
+        weights = 1 / np.arange(1, self.holdings_per_sector + 1)
+        weights = weights / weights.sum() * 0.6
+        return {
+            etf: [{"symbol": symbol, "name": symbol, "percent": float(w)}
+                  for symbol, w in zip(self.holdings_of(etf), weights)] if etf in self.sectors else []
+            for etf in tickers
+        }
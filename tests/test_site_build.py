@@ -0,0 +1,61 @@
+import os
+
+import analyzer
+import config
+import main
+import report_model
+import synthetic
+
+
+def _model():
+    close = synthetic.close_panel(11, 1)
+    sectors = [t for t in close.columns if t != "SPY"]
+    ranked = analyzer.rank_sectors(analyzer.calculate_returns(close), config.BENCHMARKS, sectors=sectors)
+    panel = synthetic.ohlcv_panel(4, 1)
+    tickers = [t for t in panel.columns.levels[1] if t != "SPY"]
+    sector_results = {
+        ranked.index[0]: [{"ticker": t, "results": analyzer.check_technical_setup(synthetic.ticker_frame(panel, t))}
+                          for t in tickers]
+    }
+    model = report_model.build_report_model(ranked, sector_results, generated_at="2026-01-05T08:00:00")
+    holdings = {ranked.index[0]: [{"symbol": t, "name": t, "percent": 0.1} for t in tickers]}
+    return model, holdings
+
+
+def _render(model, holdings):
+    pages = main.write_detail_pages(model, holdings, {}, [])
+    index = main.write_index(model, "report", pages["page_keys"], pages["stock_pages"])
+    changes = main.finalize_site(pages["page_files"], index["index_files"])
+    return pages, index, changes
+
+
+def _snapshot(site_dir):
+    files = {}
+    for root, _, names in os.walk(site_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, site_dir).replace(os.sep, "/")] = f.read()
+    return files
+
+
+def test_rerender_only_rewrites_index_and_manifest(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SITE_DIR", str(tmp_path / "site"))
+    monkeypatch.setattr(config, "SITE_SECRET_PATH", str(tmp_path / "data" / "site_secret"))
+    monkeypatch.setattr(config, "PAGE_WORKERS", 1)
+    model, holdings = _model()
+    assert model["stocks"]
+
+    first_pages, _, _ = _render(model, holdings)
+    before = _snapshot(config.SITE_DIR)
+    pages, index, changes = _render(model, holdings)
+    after = _snapshot(config.SITE_DIR)
+
+    assert pages["page_summary"] == {"written": 0, "unchanged": len(first_pages["page_files"]), "failed": 0}
+    assert pages["page_files"] == first_pages["page_files"]
+    assert changes["added"] == [] and changes["removed"] == []
+    assert set(changes["changed"]) <= {"index.html", "data/report.txt"}
+
+    # Every run has a new PIN, so the index data is new; nothing else may be rewritten
+    rewritten = {path for path, content in after.items() if before.get(path) != content}
+    assert rewritten <= {"index.html", "manifest.json", index["index_files"]["data/report.txt"]}
@@ -0,0 +1,63 @@
+import asyncio
+import email.utils
+
+import yahoo_async
+
+
+def test_retry_after_seconds_forms():
+    now = 1_800_000_000
+    assert yahoo_async.retry_after_seconds("3") == 3.0
+    assert yahoo_async.retry_after_seconds("1.5") == 1.5
+    assert yahoo_async.retry_after_seconds(email.utils.formatdate(now + 7, usegmt=True), now=now) == 7.0
+    # A date in the past means "now"; a far one is capped
+    assert yahoo_async.retry_after_seconds(email.utils.formatdate(now - 30, usegmt=True), now=now) == 0.0
+    assert yahoo_async.retry_after_seconds(email.utils.formatdate(now + 3600, usegmt=True),
+                                           now=now) == yahoo_async.MAX_RETRY_AFTER
+    for value in (None, "", "soon", "nan"):
+        assert yahoo_async.retry_after_seconds(value) is None
+
+
+class _FakeTransport:
+    # 429 with the given headers, then 200
+    def __init__(self, headers):
+        self.headers = headers
+        self.calls = 0
+
+    async def get(self, url, params=None):
+        self.calls += 1
+        if self.calls == 1:
+            return 429, yahoo_async._lower_keys(self.headers), b""
+        return 200, {}, b"ok"
+
+
+def _request_with(headers, monkeypatch):
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(yahoo_async.asyncio, "sleep", fake_sleep)
+    monkeypatch.setattr(yahoo_async.random, "uniform", lambda a, b: 0.0)
+
+    async def run():
+        client = yahoo_async.YahooClient(base_url="http://stand.in", concurrency=1, retries=2)
+        client._transport = _FakeTransport(headers)
+        client._semaphore = asyncio.Semaphore(1)
+        return await client._request("/x", {})
+
+    assert asyncio.run(run()) == b"ok"
+    return delays
+
+
+def test_request_honours_retry_after_seconds_any_case(monkeypatch):
+    assert _request_with({"retry-after": "2"}, monkeypatch) == [2.0]
+
+
+def test_request_honours_retry_after_http_date(monkeypatch):
+    monkeypatch.setattr(yahoo_async.time, "time", lambda: 1_800_000_000)
+    date = email.utils.formatdate(1_800_000_000 + 4, usegmt=True)
+    assert _request_with({"Retry-After": date}, monkeypatch) == [4.0]
+
+
+def test_request_falls_back_to_backoff_on_bad_retry_after(monkeypatch):
+    assert _request_with({"Retry-After": "whenever"}, monkeypatch) == [0.5]
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+import instrumentation
+
+# Data-quality checks for downloaded price panels. Everything is computed on the
+# whole (dates x tickers) array at once, so a 5000-ticker panel takes milliseconds.
+
+PRICE_FIELDS = ["Open", "High", "Low", "Close"]
+
+# A bar-to-bar price ratio close to one of these is an unadjusted split / reverse split
+SPLIT_RATIOS = [1 / 2, 1 / 3, 1 / 4, 1 / 5, 1 / 10, 2 / 3, 3 / 2, 2, 3, 4, 5, 10]
+SPLIT_TOLERANCE = 0.06     # allows for the day's own move on top of the split
+SPLIT_MIN_LOG_MOVE = 0.4    # ignore ratios near 2/3 or 3/2 unless the move is this large
+OUTLIER_LOG_MOVE = 0.7      # |log return| above this (about -50% / +100% in a day) is an outlier
+SPLIT_CONFIRM_BARS = 3      # a split-like jump is a split if the next bars hold the new level
+
+MAX_MISSING_FRAC = 0.02     # share of bars a ticker may be missing within its own history
+MAX_STALE_BUSINESS_DAYS = 3  # the newest bar may be this many business days old
+MAX_FILL_BARS = MAX_STALE_BUSINESS_DAYS  # clean_panel fills gaps up to this long; longer ones stay NaN
+
+
+def _as_panel(data, tickers=None):
+    """
+    Returns a (Price, Ticker) MultiIndex panel. yf.download returns flat columns for a
+    single ticker; a frame of Close prices (tickers as columns) is accepted as well.
+    """
+    if isinstance(data.columns, pd.MultiIndex):
+        return data
+    if "Close" in data.columns and tickers and len(tickers) == 1:
+        return pd.concat({tickers[0]: data}, axis=1).swaplevel(0, 1, axis=1)
+    return pd.concat({"Close": data}, axis=1)
+
+
+def _tickers(panel):
+    return panel.columns.unique(level=1).tolist()
+
+
+def validate_panel(data, min_bars=0, as_of=None, max_missing_frac=MAX_MISSING_FRAC,
+                   max_stale_days=MAX_STALE_BUSINESS_DAYS, tickers=None):
+    """
+    Checks every ticker of a price panel and returns a quality DataFrame indexed by ticker:
+      bars         bars the ticker has (from its first bar on)
+      missing      bars missing inside its history (NaN gaps from yf.download aligning calendars)
+      stale        its last bar is older than the panel's last bar (or than as_of, see below)
+      nonpositive  any zero / negative price
+      splits       confirmed unadjusted splits: a jump by a split ratio that the next
+                   SPLIT_CONFIRM_BARS bars hold (a bad tick reverts)
+      outliers     other jumps larger than OUTLIER_LOG_MOVE, split-like ones included
+                   while unconfirmed: flagged only, they do not fail the ticker
+      ok           passes every check
+      reason       comma-separated failed checks
+    The trading calendar is the union of the panel's dates. With as_of (a date), the
+    whole panel is stale when its newest bar is more than max_stale_days business days old.
+    tickers: the requested tickers, so a flat single-ticker download (OHLCV columns) is
+    read as that ticker's panel.
+    """
+    panel = _as_panel(data, tickers)
+    tickers = _tickers(panel)
+    if not len(panel) or not tickers:
+        return pd.DataFrame(columns=["bars", "missing", "stale", "nonpositive", "splits", "outliers", "ok", "reason"])
+
+    close = panel["Close"].reindex(columns=tickers).to_numpy(dtype=float)
+    n = close.shape[0]
+    valid = ~np.isnan(close)
+    has_data = valid.any(axis=0)
+
+    # Missing bars: NaN after the ticker's first bar (leading NaN = not listed yet)
+    first = np.where(has_data, valid.argmax(axis=0), n)
+    bars = n - first
+    active = np.arange(n)[:, None] >= first[None, :]
+    missing = (active & ~valid).sum(axis=0)
+
+    # Stale: no bar on the last date(s) of the calendar
+    last = np.where(has_data, n - 1 - valid[::-1].argmax(axis=0), -1)
+    stale = last < n - 1
+    if as_of is not None:
+        newest = panel.index[-1]
+        age = np.busday_count(np.datetime64(pd.Timestamp(newest).date()), np.datetime64(pd.Timestamp(as_of).date()))
+        if age > max_stale_days:
+            stale[:] = True
+
+    # Zero / negative prices in any price field
+    nonpositive = np.zeros(len(tickers), dtype=bool)
+    for field in PRICE_FIELDS:
+        if field in panel.columns.get_level_values(0):
+            values = panel[field].reindex(columns=tickers).to_numpy(dtype=float)
+            nonpositive |= (values <= 0).any(axis=0)
+
+    # Jumps, measured across gaps (forward-filled log prices) so a NaN does not hide one
+    with np.errstate(divide="ignore", invalid="ignore"):
+        log_close = np.log(np.where(close > 0, close, np.nan))
+    if not valid.all():
+        log_close = pd.DataFrame(log_close).ffill().to_numpy()
+    moves = np.abs(np.diff(log_close, axis=0))
+    # Only the (few) large moves need the split-ratio test
+    rows, cols = np.nonzero(moves > SPLIT_MIN_LOG_MOVE)
+    signed = log_close[rows + 1, cols] - log_close[rows, cols]
+    ratio = np.exp(signed)[:, None]
+    split_like = (np.abs(ratio / np.array(SPLIT_RATIOS)[None, :] - 1) < SPLIT_TOLERANCE).any(axis=1)
+    # Confirmed when the following bars stay nearer the new level than the old one and the
+    # preceding bars nearer the old one (the jump back after a one-bar spike is no split)
+    steps = np.arange(SPLIT_CONFIRM_BARS)[None, :]
+    after, before = rows[:, None] + 2 + steps, rows[:, None] - 1 - steps
+    has_after, has_before = after < n, before >= 0
+    following = log_close[np.minimum(after, n - 1), cols[:, None]]
+    preceding = log_close[np.maximum(before, 0), cols[:, None]]
+    new_level, old_level = log_close[rows + 1, cols][:, None], log_close[rows, cols][:, None]
+    holds = np.abs(following - new_level) < np.abs(following - old_level)
+    held = np.abs(preceding - old_level) < np.abs(preceding - new_level)
+    confirmed = (split_like & has_after.any(axis=1) & (holds | ~has_after).all(axis=1)
+                 & (held | ~has_before).all(axis=1))
+    splits = np.bincount(cols[confirmed], minlength=len(tickers))
+    outliers = np.bincount(cols[~confirmed & ((np.abs(signed) > OUTLIER_LOG_MOVE) | split_like)],
+                           minlength=len(tickers))
+
+    too_short = bars < max(min_bars, 1)
+    too_many_missing = missing > np.maximum(bars, 1) * max_missing_frac
+
+    checks = {
+        "short": too_short,
+        "missing": too_many_missing,
+        "stale": stale,
+        "nonpositive": nonpositive,
+        "split": splits > 0,
+    }
+    failed = np.column_stack(list(checks.values()))
+    names = np.array(list(checks))
+    ok = ~failed.any(axis=1)
+    reason = np.full(len(tickers), "", dtype=object)
+    for i in np.nonzero(~ok)[0]:
+        reason[i] = ",".join(names[failed[i]])
+
+    return pd.DataFrame({
+        "bars": bars,
+        "missing": missing,
+        "stale": stale,
+        "nonpositive": nonpositive,
+        "splits": splits,
+        "outliers": outliers,
+        "ok": ok,
+        "reason": reason,
+    }, index=pd.Index(tickers, name="Ticker"))
+
+
+def clean_panel(data, quality):
+    """
+    Drops the tickers that failed validation and forward-fills short gaps of the rest
+    (at most MAX_FILL_BARS bars, never before a ticker's first bar). A longer gap stays
+    NaN, so a halted series is not read as a flat one: returns across it are NaN
+    (return_index.ReturnIndex) and the indicators skip it.
+    """
+    panel = _as_panel(data, quality.index.tolist())
+    bad = quality.index[~quality["ok"]].tolist()
+    if bad:
+        panel = panel.drop(columns=bad, level=1)
+    return panel.ffill(limit=MAX_FILL_BARS)
+
+
+def validate_and_refetch(data, fetch, period, min_bars=0, as_of=None, retries=1, tickers=None):
+    """
+    Validates a panel and re-downloads only the failing tickers (up to `retries` times),
+    splicing the fresh data in. Returns (clean panel, quality); the tickers still failing
+    are dropped from the panel and listed with their reason. tickers: the requested
+    tickers (see validate_panel).
+    """
+    panel = _as_panel(data, tickers)
+    quality = validate_panel(panel, min_bars=min_bars, as_of=as_of)
+
+    for attempt in range(retries):
+        failing = quality.index[~quality["ok"]].tolist()
+        if not failing:
+            break
+        shown = ", ".join(f"{t}: {quality.loc[t, 'reason']}" for t in failing[:5])
+        if len(failing) > 5:
+            shown += ", ..."
+        print(f"  Data check failed for {len(failing)} ticker(s) ({shown}); re-fetching them...")
+        instrumentation.count("tickers_refetched", len(failing))
+        fresh = fetch(failing, period=period)
+        if fresh is None or fresh.empty:
+            continue
+        fresh = _as_panel(fresh, failing)
+        replaced = [t for t in failing if t in _tickers(fresh)]
+        panel = pd.concat([panel.drop(columns=replaced, level=1), fresh[[c for c in fresh.columns if c[1] in replaced]]],
+                          axis=1).sort_index()
+        quality = validate_panel(panel, min_bars=min_bars, as_of=as_of)
+
+    flagged = quality[quality["ok"] & (quality["outliers"] > 0)]
+    if len(flagged):
+        print(f"  Kept {len(flagged)} ticker(s) with unconfirmed large moves: {', '.join(flagged.index[:10])}"
+              + (", ..." if len(flagged) > 10 else ""))
+    bad = quality[~quality["ok"]]
+    if len(bad):
+        instrumentation.count("tickers_failed_validation", len(bad))
+        for ticker, row in bad.iterrows():
+            print(f"  ⚠️  Dropping {ticker}: failed data checks ({row['reason']})")
+    return clean_panel(panel, quality), quality
@@ -0,0 +1,149 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+import config
+
+# Volatility contraction pattern (VCP) detector for a whole price panel at once.
+#
+# A contraction is a pullback from a swing high to the lowest low before the next swing
+# high (the last one is still in progress). A VCP is a run of 2-4 successive contractions
+# that each get shallower (depth <= VCP_TIGHTENING x the previous one), with the volume
+# drying up from the first to the latest and a shallow final contraction.
+#
+# Every step works on (dates x tickers) arrays: the pivots come from sliding-window
+# views, and the contractions of all tickers from one reduceat over the column-major
+# flattened panel (each swing high starts a segment), so there is no per-ticker loop.
+
+
+def swing_highs(high, bars=None):
+    """
+    (dates x tickers) bool: the bar's high is above the `bars` highs before it and at
+    least the `bars` highs after it. The last `bars` bars can't be confirmed yet.
+    """
+    bars = bars or config.VCP_PIVOT_BARS
+    pivots = np.zeros(high.shape, dtype=bool)
+    if len(high) < 2 * bars + 1:
+        return pivots
+    window = sliding_window_view(high, 2 * bars + 1, axis=0)  # (dates - 2 bars, tickers, 2 bars + 1)
+    center = high[bars:len(high) - bars]
+    with np.errstate(invalid="ignore"):
+        pivots[bars:len(high) - bars] = (center > window[..., :bars].max(axis=-1)) & \
+                                        (center >= window[..., bars + 1:].max(axis=-1))
+    return pivots
+
+
+def contractions(high, low, volume, bars=None, lookback=None, max_count=None):
+    """
+    The latest max_count contractions of every ticker, newest first.
+    Returns (depths, volumes): (tickers x max_count) arrays of the pullback depth
+    (1 - low / swing high) and the average daily volume; NaN where a ticker has fewer.
+    """
+    lookback = lookback or config.VCP_LOOKBACK
+    max_count = max_count or config.VCP_MAX_CONTRACTIONS
+    n_dates, n_tickers = high.shape
+    pivots = swing_highs(high, bars)
+    pivots[:max(n_dates - lookback, 0)] = False
+
+    # Column-major flattening: each ticker's bars are contiguous, so segments are slices
+    flat_pivots = pivots.T.ravel()
+    starts = np.flatnonzero(flat_pivots)
+    bounds = np.union1d(starts, np.arange(n_tickers) * n_dates)
+    # The swing high bar's own low is not part of its pullback
+    flat_low = np.where(flat_pivots, np.nan, low.T.ravel())
+    flat_volume = volume.T.ravel()
+    valid_volume = np.isfinite(flat_volume)
+
+    seg_low = np.fmin.reduceat(flat_low, bounds)
+    seg_volume = np.add.reduceat(np.where(valid_volume, flat_volume, 0), bounds)
+    seg_bars = np.add.reduceat(valid_volume, bounds)
+
+    # Keep the segments that start at a swing high (not the bars before a ticker's first one)
+    keep = flat_pivots[bounds]
+    start = bounds[keep]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        depth = 1 - seg_low[keep] / high.T.ravel()[start]
+        avg_volume = seg_volume[keep] / seg_bars[keep]
+
+    # Position from the end within each ticker: 0 = latest contraction
+    ticker = start // n_dates
+    last = np.cumsum(np.bincount(ticker, minlength=n_tickers)) - 1
+    order = last[ticker] - np.arange(len(start))
+    recent = order < max_count
+
+    depths = np.full((n_tickers, max_count), np.nan)
+    volumes = np.full((n_tickers, max_count), np.nan)
+    depths[ticker[recent], order[recent]] = depth[recent]
+    volumes[ticker[recent], order[recent]] = avg_volume[recent]
+    return depths, volumes
+
+
+def detect(high, low, volume):
+    """
+    VCP flags for (dates x tickers) arrays. Returns a dict of per-ticker arrays:
+      contractions   successive tightening contractions ending with the latest (0-max)
+      depths         (tickers x VCP_MAX_CONTRACTIONS) contraction depths, newest first
+      final_depth    depth of the latest contraction
+      volume_dry_up  volume lower in the latest contraction than in the first of the run
+      vcp            the pattern: enough contractions, volume dry-up and a shallow final one
+    """
+    high, low, volume = (np.asarray(a, dtype=float) for a in (high, low, volume))
+    depths, volumes = contractions(high, low, volume)
+    n_tickers = depths.shape[0]
+
+    with np.errstate(invalid="ignore"):
+        tighter = depths[:, :-1] <= depths[:, 1:] * config.VCP_TIGHTENING
+    # The run stops at the first contraction that is not tighter than the one before it
+    count = np.where(np.isfinite(depths[:, 0]), 1 + np.cumprod(tighter, axis=1).sum(axis=1), 0)
+    first = volumes[np.arange(n_tickers), np.maximum(count - 1, 0)]
+    with np.errstate(invalid="ignore"):
+        dry_up = (count >= 2) & (volumes[:, 0] < first)
+        shallow = depths[:, 0] <= config.VCP_MAX_FINAL_DEPTH
+
+    return {
+        "contractions": count,
+        "depths": depths,
+        "final_depth": depths[:, 0],
+        "volume_dry_up": dry_up,
+        "vcp": (count >= config.VCP_MIN_CONTRACTIONS) & dry_up & shallow,
+    }
+
+
+def detect_panel(data):
+    """
+    VCP fields of every ticker in an OHLCV panel with (Price, Ticker) columns.
+    Returns a DataFrame indexed by ticker with the columns VCP, Contractions,
+    Final Depth, Volume Dry-Up and Depths (list, oldest contraction first).
+    """
+    import pandas as pd
+
+    tickers = data["Close"].columns
+    fields = [data[f].reindex(columns=tickers).to_numpy(dtype=float) for f in ("High", "Low", "Volume")]
+    found = detect(*fields)
+    count = found["contractions"]
+    return pd.DataFrame({
+        "VCP": found["vcp"],
+        "Contractions": count,
+        "Final Depth": found["final_depth"],
+        "Volume Dry-Up": found["volume_dry_up"],
+        "Depths": [[float(d) for d in row[:n][::-1]] for row, n in zip(found["depths"], count)],
+    }, index=tickers)
+
+
+def pattern_at(found, i):
+    """
+    One ticker's fields from detect()'s output, as detect_panel's row (a dict).
+    """
+    n = int(found["contractions"][i])
+    return {
+        "VCP": bool(found["vcp"][i]),
+        "Contractions": n,
+        "Final Depth": float(found["final_depth"][i]),
+        "Volume Dry-Up": bool(found["volume_dry_up"][i]),
+        "Depths": [float(d) for d in found["depths"][i, :n][::-1]],
+    }
+
+
+def detect_frame(df):
+    """
+    detect_panel's row for a single-ticker OHLCV frame, as a dict.
+    """
+    return pattern_at(detect(*(df[[f]].to_numpy(dtype=float) for f in ("High", "Low", "Volume"))), 0)
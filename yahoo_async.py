@@ -0,0 +1,394 @@
+"""
+Asyncio market-data transport: Yahoo's chart and quoteSummary endpoints, requested
+directly over one pooled keep-alive client.
+
+- Bounded concurrency: at most `concurrency` requests in flight (one semaphore).
+- Request coalescing: identical requests in flight at the same time share one response.
+- Retries with backoff on 429 / 5xx (Retry-After is honoured).
+- Uses aiohttp when it is installed, otherwise a pooled requests.Session driven from
+  a thread pool; both keep connections alive across requests.
+
+Selected with DATA_TRANSPORT=async (data_fetcher then delegates here). Point
+YAHOO_BASE_URL at yahoo_standin.py to run offline against recorded responses:
+
+    python yahoo_standin.py --port 8766 --synthetic
+    DATA_TRANSPORT=async YAHOO_BASE_URL=http://127.0.0.1:8766 python main.py
+    python yahoo_async.py --tickers 1500 --base-url http://127.0.0.1:8766   # load run
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import datetime
+import email.utils
+import json
+import math
+import os
+import random
+import sys
+import time
+
+import config
+import instrumentation
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) "
+                  "Chrome/124.0 Safari/537.36",
+    "Accept": "application/json,text/plain,*/*",
+}
+RETRY_STATUS = {429, 500, 502, 503, 504}
+# Longest Retry-After honoured; a longer one waits this long
+MAX_RETRY_AFTER = 60
+# Price fields in the order yf.download returns them
+PRICE_FIELDS = ["Close", "High", "Low", "Open", "Volume"]
+
+
+class YahooError(Exception):
+    """
+    A request that failed for good (after retries), with the HTTP status if there was one.
+    """
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def _lower_keys(headers):
+    # Header names are case-insensitive: the transports hand them over lower-cased
+    return {k.lower(): v for k, v in headers.items()}
+
+
+def retry_after_seconds(value, now=None):
+    """
+    Seconds to wait from a Retry-After header: delay-seconds ("120") or an HTTP date
+    ("Wed, 21 Oct 2026 07:28:00 GMT"), capped at MAX_RETRY_AFTER. None when the value
+    is missing or neither form.
+    """
+    if value is None:
+        return None
+    try:
+        delay = float(value)
+    except (TypeError, ValueError):
+        try:
+            when = email.utils.parsedate_to_datetime(str(value))
+        except (TypeError, ValueError, IndexError):
+            return None
+        if when is None:
+            return None
+        if when.tzinfo is None:  # an HTTP date is always GMT
+            when = when.replace(tzinfo=datetime.timezone.utc)
+        delay = when.timestamp() - (time.time() if now is None else now)
+    if not math.isfinite(delay):
+        return None
+    return min(max(delay, 0.0), MAX_RETRY_AFTER)
+
+
+class _AiohttpTransport:
+    def __init__(self, concurrency, timeout):
+        import aiohttp
+
+        self._aiohttp = aiohttp
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=concurrency, keepalive_timeout=30),
+            timeout=aiohttp.ClientTimeout(total=timeout),
+            headers=HEADERS,
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+        )
+
+    async def get(self, url, params=None):
+        async with self.session.get(url, params=params) as resp:
+            return resp.status, _lower_keys(resp.headers), await resp.read()
+
+    async def close(self):
+        await self.session.close()
+
+
+class _ThreadedTransport:
+    """
+    Fallback without aiohttp: a requests.Session whose connection pool is as large as
+    the concurrency limit, called from a thread pool of the same size.
+    """
+    def __init__(self, concurrency, timeout):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=concurrency)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=concurrency)
+
+    def _get(self, url, params):
+        resp = self.session.get(url, params=params, timeout=self.timeout)
+        return resp.status_code, _lower_keys(resp.headers), resp.content
+
+    async def get(self, url, params=None):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._get, url, params)
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+
+def _make_transport(concurrency, timeout):
+    try:
+        return _AiohttpTransport(concurrency, timeout)
+    except ImportError:
+        return _ThreadedTransport(concurrency, timeout)
+
+
+class YahooClient:
+    """
+        async with YahooClient() as client:
+            frames = await client.charts(["AAPL", "MSFT"], period="1y")
+            holdings = await client.top_holdings("XLK")
+
+    record_dir: also save every JSON response there (the layout yahoo_standin.py serves).
+    """
+    def __init__(self, base_url=None, concurrency=None, timeout=30, retries=3, record_dir=None):
+        self.base_url = (base_url or config.YAHOO_BASE_URL).rstrip("/")
+        self.concurrency = concurrency or config.YAHOO_CONCURRENCY
+        self.timeout = timeout
+        self.retries = retries
+        self.record_dir = record_dir
+        self._transport = None
+        self._semaphore = None
+        self._inflight = {}
+        self._crumb = None
+        self._crumb_lock = None
+
+    async def __aenter__(self):
+        self._transport = _make_transport(self.concurrency, self.timeout)
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._crumb_lock = asyncio.Lock()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._transport.close()
+
+    async def _request(self, path, params):
+        url = self.base_url + path
+        for attempt in range(self.retries + 1):
+            async with self._semaphore:
+                try:
+                    status, headers, body = await self._transport.get(url, params)
+                except Exception as e:
+                    status, headers, body, error = None, {}, b"", e
+                else:
+                    error = None
+            instrumentation.count("http_requests")
+            if status == 200:
+                instrumentation.count("bytes_downloaded", len(body))
+                return body
+            if attempt < self.retries and (status is None or status in RETRY_STATUS):
+                instrumentation.count("retries")
+                delay = retry_after_seconds(headers.get("retry-after"))
+                if delay is None:
+                    delay = 0.5 * 2 ** attempt
+                await asyncio.sleep(delay + random.uniform(0, 0.1))
+                continue
+            if error is not None:
+                raise YahooError(f"{path}: {type(error).__name__}: {error}")
+            raise YahooError(f"{path}: HTTP {status}", status)
+
+    async def get(self, path, params=None):
+        """
+        GET base_url + path. Concurrent identical requests are coalesced into one.
+        """
+        params = dict(params or {})
+        key = (path, tuple(sorted(params.items())))
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._request(path, params))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            instrumentation.count("requests_coalesced")
+        # shield: one caller giving up must not cancel the request for the others
+        return await asyncio.shield(task)
+
+    async def get_json(self, path, params=None, record_as=None):
+        body = await self.get(path, params)
+        if self.record_dir and record_as:
+            path_on_disk = os.path.join(self.record_dir, record_as)
+            os.makedirs(os.path.dirname(path_on_disk), exist_ok=True)
+            with open(path_on_disk, "wb") as f:
+                f.write(body)
+        return json.loads(body)
+
+    async def crumb(self):
+        # quoteSummary needs a cookie + crumb pair; fetched once per client
+        async with self._crumb_lock:
+            if self._crumb is None:
+                if self.base_url == config.YAHOO_DEFAULT_BASE_URL:
+                    try:
+                        await self._transport.get(config.YAHOO_COOKIE_URL)
+                    except Exception:
+                        pass
+                self._crumb = (await self.get("/v1/test/getcrumb")).decode("utf-8").strip()
+            return self._crumb
+
+    async def chart(self, symbol, period="6mo"):
+        """
+        Daily OHLCV of one symbol as a DataFrame (auto-adjusted, like yf.download(auto_adjust=True)).
+        """
+        payload = await self.get_json(
+            f"/v8/finance/chart/{symbol}",
+            {"range": period, "interval": "1d", "includeAdjustedClose": "true", "events": "div,splits"},
+            record_as=os.path.join("chart", f"{symbol}_{period}.json"),
+        )
+        return chart_frame(payload)
+
+    async def charts(self, symbols, period="6mo"):
+        """
+        {symbol: DataFrame or the exception it failed with}, all symbols requested concurrently.
+        """
+        results = await asyncio.gather(*(self.chart(s, period) for s in symbols), return_exceptions=True)
+        return dict(zip(symbols, results))
+
+    async def top_holdings(self, symbol):
+        """
+        An ETF's top holdings: [{'symbol', 'name', 'percent'}, ...] (like data_fetcher.fetch_etf_holdings).
+        """
+        payload = await self.get_json(
+            f"/v10/finance/quoteSummary/{symbol}",
+            {"modules": "topHoldings", "crumb": await self.crumb()},
+            record_as=os.path.join("quoteSummary", f"{symbol}.json"),
+        )
+        return holdings_list(payload)
+
+
+def chart_frame(payload):
+    """
+    Parses a v8 chart response into an OHLCV DataFrame indexed by (exchange-local) date.
+    """
+    import numpy as np
+    import pandas as pd
+
+    chart = payload.get("chart") or {}
+    if chart.get("error"):
+        raise YahooError(str(chart["error"].get("description") or chart["error"]))
+    result = (chart.get("result") or [None])[0]
+    if not result or not result.get("timestamp"):
+        raise YahooError("No price data")
+
+    quote = result["indicators"]["quote"][0]
+    offset = result.get("meta", {}).get("gmtoffset", 0)
+    # Local midnight of each bar, in numpy (cheaper than DatetimeIndex.normalize per ticker)
+    days = (np.asarray(result["timestamp"], dtype="int64") + offset) // 86400 * 86400
+    values = {field: np.asarray(quote[field.lower()], dtype=float) for field in PRICE_FIELDS}
+
+    adjclose = (result["indicators"].get("adjclose") or [{}])[0].get("adjclose")
+    if adjclose is not None:
+        ratio = np.asarray(adjclose, dtype=float) / values["Close"]
+        for field in ("Open", "High", "Low", "Close"):
+            values[field] = values[field] * ratio
+
+    # A partial bar for today can repeat the last date
+    keep = np.append(days[1:] != days[:-1], True)
+    index = pd.DatetimeIndex(days[keep].astype("datetime64[s]").astype("datetime64[ns]"), name="Date")
+    return pd.DataFrame({field: v[keep] for field, v in values.items()}, index=index)
+
+
+def holdings_list(payload):
+    result = ((payload.get("quoteSummary") or {}).get("result") or [None])[0]
+    if not result:
+        return []
+    holdings = []
+    for h in result.get("topHoldings", {}).get("holdings", []):
+        percent = h.get("holdingPercent")
+        percent = percent.get("raw") if isinstance(percent, dict) else percent
+        holdings.append({
+            "symbol": h.get("symbol"),
+            "name": h.get("holdingName") or "Unknown",
+            "percent": float(percent) if percent is not None else 0.0,
+        })
+    return holdings
+
+
+def _panel(frames):
+    # (Price, Ticker) columns like yf.download with several tickers
+    import pandas as pd
+
+    if not frames:
+        return pd.DataFrame()
+    panel = pd.concat(frames, axis=1, names=["Ticker", "Price"]).swaplevel(0, 1, axis=1)
+    return panel[PRICE_FIELDS].sort_index(axis=1, level=0, sort_remaining=False)
+
+
+async def _fetch_data(tickers, period, **client_args):
+    async with YahooClient(**client_args) as client:
+        results = await client.charts(list(dict.fromkeys(tickers)), period)
+    frames = {t: r for t, r in results.items() if not isinstance(r, Exception)}
+    failed = {t: r for t, r in results.items() if isinstance(r, Exception)}
+    return frames, failed
+
+
+@instrumentation.timed_call
+def fetch_data(tickers, period="6mo", retries=3, **client_args):
+    """
+    Drop-in for data_fetcher.fetch_data: an OHLCV panel with (Price, Ticker) columns.
+    Tickers that fail are left out (and listed); an empty DataFrame if all fail.
+    """
+    print(f"Fetching data for {len(tickers)} tickers (async, {client_args.get('concurrency') or config.YAHOO_CONCURRENCY} "
+          f"concurrent)...")
+    frames, failed = asyncio.run(_fetch_data(tickers, period, retries=retries, **client_args))
+    if failed:
+        shown = ", ".join(f"{t} ({e})" for t, e in list(failed.items())[:5])
+        print(f"  Failed to fetch {len(failed)} ticker(s): {shown}{', ...' if len(failed) > 5 else ''}")
+    instrumentation.count("tickers_fetched", len(frames))
+    return _panel(frames)
+
+
+async def _fetch_holdings(tickers, **client_args):
+    async with YahooClient(**client_args) as client:
+        results = await asyncio.gather(*(client.top_holdings(t) for t in tickers), return_exceptions=True)
+    return dict(zip(tickers, results))
+
+
+def fetch_all_etf_holdings(tickers, **client_args):
+    """
+    Drop-in for data_fetcher.fetch_all_etf_holdings: {ticker: [holdings]} ([] on failure).
+    """
+    print(f"Fetching holdings for {len(tickers)} ETFs (async)...")
+    results = {}
+    for ticker, holdings in asyncio.run(_fetch_holdings(list(tickers), **client_args)).items():
+        if isinstance(holdings, Exception):
+            print(f"Exception for {ticker}: {holdings}")
+            holdings = []
+        results[ticker] = holdings
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch prices with the async Yahoo transport (load run)")
+    parser.add_argument("--tickers", type=int, default=1500, help="Number of synthetic ticker symbols to fetch")
+    parser.add_argument("--tickers-file", help="File with one ticker per line (instead of --tickers)")
+    parser.add_argument("--period", default="1y")
+    parser.add_argument("--base-url", help="Defaults to YAHOO_BASE_URL")
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--record-dir", help="Save every response here (for yahoo_standin.py)")
+    args = parser.parse_args(argv)
+
+    if args.tickers_file:
+        with open(args.tickers_file, encoding="utf-8") as f:
+            tickers = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    else:
+        import synthetic
+        tickers = synthetic.make_tickers(args.tickers)
+
+    instrumentation.reset()
+    start = time.perf_counter()
+    panel = fetch_data(tickers, period=args.period, base_url=args.base_url, concurrency=args.concurrency,
+                       record_dir=args.record_dir)
+    elapsed = time.perf_counter() - start
+    counters = instrumentation.run_report()["counters"]
+    fetched = len(panel.columns.unique(level=1)) if not panel.empty else 0
+    print(f"Fetched {fetched}/{len(tickers)} tickers ({panel.shape[0]} bars) in {elapsed:.2f}s: "
+          f"{counters.get('http_requests', 0)} requests, {counters.get('retries', 0)} retries, "
+          f"{counters.get('bytes_downloaded', 0) / 1e6:.1f} MB.")
+    return 0 if fetched else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Local stand-in for Yahoo's chart / quoteSummary endpoints, for tests and load runs of
+the async transport (yahoo_async.py) without touching the network.
+
+    python yahoo_standin.py --port 8766 --record-dir recordings          # recorded responses only
+    python yahoo_standin.py --port 8766 --synthetic --latency-ms 80      # synthesize the rest
+
+Recorded responses are the files yahoo_async saves with --record-dir:
+    <record-dir>/chart/<SYMBOL>_<range>.json
+    <record-dir>/quoteSummary/<SYMBOL>.json
+With --synthetic, symbols without a recording get deterministic synthetic prices
+(synthetic.fetch_data, ending today) and ETFs get their config.SECTOR_HOLDINGS.
+It can also be started in-process:
+
+    with YahooStandInServer(synthetic=True) as server:
+        yahoo_async.fetch_data(tickers, base_url=server.url)
+"""
+import argparse
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import config
+
+# Yahoo stamps daily bars with the session open (09:30 New York, UTC-4 in summer)
+GMT_OFFSET = -4 * 3600
+OPEN_SECONDS = 9 * 3600 + 30 * 60
+
+
+@functools.lru_cache(maxsize=4096)
+def synthetic_chart(symbol, period):
+    """
+    A v8 chart response (encoded JSON) for a synthetic symbol. Cached, so repeated
+    load runs measure the client rather than the synthesis.
+    """
+    import synthetic
+
+    df = synthetic.fetch_data([symbol], period=period, end=datetime.date.today()).xs(symbol, axis=1, level=1)
+    days = df.index.values.astype("datetime64[s]").astype("int64")
+    quote = {field.lower(): df[field].round(4).tolist() for field in ("Open", "High", "Low", "Close", "Volume")}
+    return json.dumps({"chart": {"result": [{
+        "meta": {"symbol": symbol, "currency": "USD", "gmtoffset": GMT_OFFSET, "range": period},
+        "timestamp": (days + OPEN_SECONDS - GMT_OFFSET).tolist(),
+        "indicators": {"quote": [quote], "adjclose": [{"adjclose": quote["close"]}]},
+    }], "error": None}}).encode()
+
+
+def synthetic_holdings(symbol):
+    holdings = config.SECTOR_HOLDINGS.get(symbol)
+    if holdings is None:
+        return None
+    return {"quoteSummary": {"result": [{"topHoldings": {"holdings": [
+        {"symbol": h, "holdingName": h, "holdingPercent": {"raw": round(0.12 - 0.01 * i, 4), "fmt": ""}}
+        for i, h in enumerate(holdings)
+    ]}}], "error": None}}
+
+
+def _not_found(kind, symbol):
+    description = f"No data found, symbol may be delisted: {symbol}"
+    return {kind: {"result": None, "error": {"code": "Not Found", "description": description}}}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is observable
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _reply(self, status, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if status == 429:
+            self.send_header("Retry-After", "1")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        server = self.server
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        parts = url.path.strip("/").split("/")
+
+        with server.lock:
+            server.requests += 1
+            status = server.fail_with.pop(0) if server.fail_with else None
+        if server.latency:
+            time.sleep(server.latency)
+        if status:
+            self._reply(status, {"error": "Injected failure"})
+            return
+
+        if url.path == "/v1/test/getcrumb":
+            self._reply(200, b"standin-crumb", "text/plain")
+        elif parts[:3] == ["v8", "finance", "chart"] and len(parts) == 4:
+            period = query.get("range", ["1mo"])[0]
+            body = server.recorded("chart", f"{parts[3]}_{period}.json")
+            if body is None and server.synthetic:
+                try:
+                    body = synthetic_chart(parts[3], period)
+                except ValueError as e:
+                    self._reply(400, {"chart": {"result": None, "error": {"code": "Bad Request", "description": str(e)}}})
+                    return
+            self._reply(200, body) if body is not None else self._reply(404, _not_found("chart", parts[3]))
+        elif parts[:3] == ["v10", "finance", "quoteSummary"] and len(parts) == 4:
+            body = server.recorded("quoteSummary", f"{parts[3]}.json")
+            if body is None and server.synthetic:
+                body = synthetic_holdings(parts[3])
+            self._reply(200, body) if body is not None else self._reply(404, _not_found("quoteSummary", parts[3]))
+        else:
+            self._reply(404, {"error": f"Unknown endpoint {url.path}"})
+
+
+class YahooStandInServer(ThreadingHTTPServer):
+    """
+    Threaded HTTP server answering chart / quoteSummary / getcrumb requests.
+
+    record_dir: directory of recorded responses (served as-is).
+    synthetic: synthesize responses for symbols without a recording.
+    latency: seconds to sleep before answering each request.
+    fail_with: status codes returned for the first requests (e.g. [429, 503]).
+    """
+    daemon_threads = True
+    request_queue_size = 256
+
+    def __init__(self, host="127.0.0.1", port=0, record_dir=None, synthetic=False, latency=0.0,
+                 fail_with=None, verbose=False):
+        super().__init__((host, port), _Handler)
+        self.record_dir = record_dir
+        self.synthetic = synthetic
+        self.latency = latency
+        self.fail_with = list(fail_with or [])
+        self.verbose = verbose
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+        self._thread = None
+
+    def recorded(self, kind, name):
+        if not self.record_dir:
+            return None
+        try:
+            with open(os.path.join(self.record_dir, kind, name), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for Yahoo's chart / quoteSummary endpoints")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--record-dir", help="Directory of recorded responses")
+    parser.add_argument("--synthetic", action="store_true", help="Synthesize responses for unrecorded symbols")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay before each response")
+    args = parser.parse_args()
+
+    server = YahooStandInServer(args.host, args.port, args.record_dir, args.synthetic, args.latency_ms / 1000)
+    print(f"Yahoo stand-in listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Served {server.requests} requests over {server.connections} connections.")
+        server.server_close()